@@ -1,36 +1,55 @@
 from .sp import SPModule
 from .sb import SBModule
 from .sd import SDModule
+from .executor import DEFAULT_BACKEND
+from .writer import DEFAULT_OUTPUT_FORMAT
 
 class AutomationAdjustment:
     """Main class for handling automated adjustments across different advertising modules"""
     
-    def __init__(self, file_path):
+    def __init__(self, file_path, params=None, backend=DEFAULT_BACKEND, output_format=DEFAULT_OUTPUT_FORMAT,
+                 progress=None):
         """Initialize adjustment modules
         
         Args:
             file_path (str): Path to the input file for processing
+            params (config.ScreenParams, optional): Thresholds and SKU list of this run
+            backend (str): Chunk execution backend: thread, process or inline
+            output_format (str): Result file format: xlsx, csv or parquet
+            progress (callable, optional): Stage progress callback, see SPModule
         """
-        self.sp = SPModule(file_path)
-        self.sb = SBModule()
-        self.sd = SDModule()
+        self.sp = SPModule(file_path, params, backend, output_format, progress)
+        self.sb = SBModule(file_path, params, backend, output_format, progress)
+        self.sd = SDModule(file_path, params, backend, output_format, progress)
 
-    def adjust_all(self, sp_function=None, file_path_old=None, file_path_new=None):
+    def adjust_all(self, sp_function=None, file_path_old=None, file_path_new=None, sb_function=None,
+                   sd_function=None):
         """Execute adjustments across all modules
         
         Args:
             sp_function (str, optional): Specific SP function to call
             file_path_old (str, optional): Path to the old file for comparison
             file_path_new (str, optional): Path to the new file for comparison
+            sb_function (str, optional): SB screen method to call
+            sd_function (str, optional): SD screen method to call
+            
+        Returns:
+            list: Paths of the written result files, SP first
         """
+        # The SD sheet is parsed in another process while SP screens run
+        if sp_function and sd_function:
+            self.sd.start_prefetch()
+
         # Execute SP module adjustments
-        if sp_function == 'sp_descent_screen' and file_path_old and file_path_new:
-            self.sp.sp_descent_screen(file_path_old, file_path_new)
+        result_path = None
+        if sp_function == 'sp_descent_screen':
+            result_path = self.sp.sp_descent_screen(file_path_old, file_path_new)
         elif sp_function:
-            self.sp.call_function(sp_function)
+            result_path = self.sp.call_function(sp_function)
         else:
             self.sp.adjust_bid()  # Default function
             
         # Execute other module adjustments
-        self.sb.adjust_sb()
-        self.sd.adjust_sd()
\ No newline at end of file
+        sb_result_path = self.sb.adjust_sb(sb_function)
+        sd_result_path = self.sd.adjust_sd(sd_function)
+        return [path for path in (result_path, sb_result_path, sd_result_path) if path]
\ No newline at end of file
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import os
+import uuid
+import importlib.util
+from auto_adjust.sheet_cache import load_chunk
+
+ENGINES = ('auto', 'pandas', 'dask')
+DEFAULT_ENGINE = 'auto'
+# Bulk files at least this large are filtered out of core by the auto engine
+DASK_FILE_SIZE_THRESHOLD = int(os.environ.get('DASK_FILE_SIZE_THRESHOLD', 200 * 1024 ** 2))
+
+# ChunkExecutor backend -> Dask local scheduler
+DASK_SCHEDULERS = {
+    'thread': 'threads',
+    'process': 'processes',
+    'inline': 'synchronous',
+}
+
+def dask_available():
+    """Whether the optional dask package can be imported"""
+    return importlib.util.find_spec('dask') is not None
+
+def use_dask(engine, file_path):
+    """Decide whether a bulk file is filtered with the Dask engine
+
+    Args:
+        engine (str): One of ENGINES
+        file_path (str): Path of the bulk file
+
+    Returns:
+        bool: True for 'dask', and for 'auto' on files above DASK_FILE_SIZE_THRESHOLD
+    """
+    if engine not in ENGINES:
+        raise ValueError("Unknown engine: {0}".format(engine))
+    if engine == 'dask':
+        return True
+    if engine == 'pandas':
+        return False
+    return os.path.getsize(file_path) >= DASK_FILE_SIZE_THRESHOLD and dask_available()
+
+def _load_and_apply(entry, columns, chunk_number, chunk_meta, func, args):
+    """Dask task: load one partition from disk and apply func to it"""
+    return func(load_chunk(entry, columns, chunk_number, chunk_meta), *args)
+
+def map_partitions(entry, meta, func, args=(), backend='thread', max_workers=None, on_result=None):
+    """Apply func(partition, *args) to every chunk of a sheet cache entry with Dask
+
+    Each partition is loaded from its memory-mapped column files inside
+    the task that filters it and dropped once the task returns, so at most
+    max_workers partitions are in memory however large the sheet is. Only
+    the results are kept until the graph finishes.
+
+    Args:
+        entry (str): Cache entry directory from SheetCache.read_entry
+        meta (dict): Meta dict of the entry
+        func (callable): Module-level function (must be picklable for processes)
+        args (tuple): Extra arguments passed to every call
+        backend (str): ChunkExecutor backend, mapped to a Dask scheduler
+        max_workers (int, optional): Tasks running at the same time
+        on_result (callable, optional): Called as on_result(chunk_number, result)
+            in the calling process whenever a partition finishes
+
+    Returns:
+        list: Result of each call, in chunk order
+    """
+    try:
+        import dask
+        from dask.callbacks import Callback
+    except ImportError:
+        raise ImportError("The dask engine requires the dask package")
+
+    name = 'partition-' + uuid.uuid4().hex
+    tasks = [
+        dask.delayed(_load_and_apply, pure=False)(
+            entry, meta['columns'], chunk_number, chunk_meta, func, args, dask_key_name=(name, chunk_number)
+        )
+        for chunk_number, chunk_meta in enumerate(meta['chunks'])
+    ]
+
+    class PartitionDone(Callback):
+        def _posttask(self, key, result, dsk, state, worker_id):
+            if on_result is not None and isinstance(key, tuple) and key[0] == name:
+                on_result(key[1], result)
+
+    with PartitionDone():
+        return list(dask.compute(*tasks, scheduler=DASK_SCHEDULERS[backend], num_workers=max_workers))
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+import os
+import multiprocessing
+from collections import deque
+from multiprocessing import shared_memory
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+EXECUTION_BACKENDS = ('thread', 'process', 'inline')
+DEFAULT_BACKEND = 'thread'
+THREAD_WORKERS = 16  # Threads filtering chunks concurrently
+PENDING_PER_WORKER = 2  # Chunks allowed to wait for each worker
+PENDING_BYTES = 256 * 1024 * 1024  # Memory budget of the chunks in flight, at least one is always allowed
+# Worker processes are started from job threads while other threads hold
+# locks; forking would copy those locks held forever, so workers are
+# started from a clean process instead
+PROCESS_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+def default_worker_count(backend):
+    """Number of workers for a backend, sized from the CPU count for processes"""
+    if backend == 'process':
+        return max(1, os.cpu_count() or 1)
+    if backend == 'thread':
+        return THREAD_WORKERS
+    return 1
+
+def process_pool(max_workers):
+    """ProcessPoolExecutor whose workers are started with PROCESS_START_METHOD"""
+    return ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context(PROCESS_START_METHOD)
+    )
+
+def _pack_frame(chunk_df):
+    """Copy a chunk into one shared memory block
+
+    Numeric, boolean and datetime columns are copied as raw bytes. Text and
+    categorical columns are reduced to integer codes, so only the codes go
+    to shared memory and the distinct values travel with the layout.
+
+    Returns:
+        tuple: (SharedMemory block, layout dict passed to the worker)
+    """
+    columns = []
+    arrays = []
+    offset = 0
+    for name in chunk_df.columns:
+        series = chunk_df[name]
+        values = series.to_numpy()
+        column = {'name': name}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            values = series.cat.codes.to_numpy().astype(np.int32)
+            column['dtype'] = values.dtype.str
+            column['uniques'] = np.asarray(series.cat.categories, dtype=object)
+            column['categorical'] = True
+        elif values.dtype.kind in 'biufcmM':
+            column['dtype'] = values.dtype.str
+        else:
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            values = codes.astype(np.int32)
+            column['dtype'] = values.dtype.str
+            column['uniques'] = np.asarray(uniques, dtype=object)
+            column['categorical'] = False
+        values = np.ascontiguousarray(values)
+        column['offset'] = offset
+        offset += values.nbytes
+        columns.append(column)
+        arrays.append(values)
+
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for column, values in zip(columns, arrays):
+        target = np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf, offset=column['offset'])
+        target[...] = values
+
+    layout = {
+        'name': block.name,
+        'rows': len(chunk_df),
+        'start': int(chunk_df.index[0]) if len(chunk_df) else 0,
+        'columns': columns,
+    }
+    return block, layout
+
+def _unpack_frame(layout):
+    """Rebuild a chunk in the worker from its shared memory layout"""
+    block = shared_memory.SharedMemory(name=layout['name'])
+    try:
+        rows = layout['rows']
+        data = {}
+        for column in layout['columns']:
+            values = np.ndarray((rows,), dtype=column['dtype'], buffer=block.buf, offset=column['offset']).copy()
+            if 'uniques' in column:
+                uniques = column['uniques']
+                if column['categorical']:
+                    values = pd.Categorical.from_codes(values, categories=uniques)
+                else:
+                    lookup = np.empty(len(uniques) + 1, dtype=object)
+                    lookup[:-1] = uniques
+                    lookup[-1] = None  # Code -1 marks a missing value
+                    values = lookup[values]
+            data[column['name']] = values
+        chunk_df = pd.DataFrame(data, columns=[column['name'] for column in layout['columns']])
+        chunk_df.index = pd.RangeIndex(layout['start'], layout['start'] + rows)
+        return chunk_df
+    finally:
+        block.close()
+
+def _run_shared(layout, func, args):
+    """Worker entry point for the process backend"""
+    return func(_unpack_frame(layout), *args)
+
+class ChunkExecutor:
+    """Run a function over a stream of chunks on a selectable backend
+
+    Backends:
+        thread: ThreadPoolExecutor, cheap to start, shares the GIL
+        process: ProcessPoolExecutor, chunks handed over in shared memory
+        inline: run in the calling thread, useful for debugging
+
+    Results are yielded in the order the chunks were read, whatever order
+    the workers finish in. A new chunk is only submitted once the chunks
+    in flight number fewer than PENDING_PER_WORKER per worker and, together
+    with it, fit in max_pending_bytes, so memory stays bounded by the byte
+    budget rather than by the worker count.
+    """
+
+    def __init__(self, backend=DEFAULT_BACKEND, max_workers=None, max_pending_bytes=PENDING_BYTES):
+        """Initialize executor
+
+        Args:
+            backend (str): One of EXECUTION_BACKENDS
+            max_workers (int, optional): Worker count, derived from backend if omitted
+            max_pending_bytes (int): Memory budget of the chunks in flight
+        """
+        if backend not in EXECUTION_BACKENDS:
+            raise ValueError("Unknown execution backend: {0}".format(backend))
+        self.backend = backend
+        self.max_workers = max_workers or default_worker_count(backend)
+        self.max_pending_bytes = max_pending_bytes
+
+    def map(self, func, chunks, *args):
+        """Apply func(chunk, *args) to every chunk
+
+        Args:
+            func (callable): Module-level function (must be picklable for processes)
+            chunks (iterable): DataFrame chunks
+            *args: Extra arguments passed to every call
+
+        Yields:
+            object: Result of each call, in input order
+        """
+        if self.backend == 'inline':
+            for chunk_df in chunks:
+                yield func(chunk_df, *args)
+            return
+
+        if self.backend == 'process':
+            pool = process_pool(self.max_workers)
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        pending = deque()
+        max_pending = self.max_workers * PENDING_PER_WORKER
+        pending_bytes = 0
+        try:
+            for chunk_df in chunks:
+                chunk_bytes = int(chunk_df.memory_usage(index=False).sum())
+                while pending and (len(pending) >= max_pending
+                                   or pending_bytes + chunk_bytes > self.max_pending_bytes):
+                    entry = pending.popleft()
+                    pending_bytes -= entry[2]
+                    yield self._result(entry)
+                pending.append(self._submit(pool, func, chunk_df, args) + (chunk_bytes,))
+                pending_bytes += chunk_bytes
+            while pending:
+                yield self._result(pending.popleft())
+        finally:
+            while pending:
+                self._release(pending.popleft())
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _submit(self, pool, func, chunk_df, args):
+        if self.backend != 'process':
+            return pool.submit(func, chunk_df, *args), None
+        block, layout = _pack_frame(chunk_df)
+        try:
+            return pool.submit(_run_shared, layout, func, args), block
+        except Exception:
+            self._release((None, block))
+            raise
+
+    def _result(self, entry):
+        future, block = entry[:2]
+        try:
+            return future.result()
+        finally:
+            self._release((None, block))
+
+    def _release(self, entry):
+        """Cancel an unfinished call and free its shared memory block
+
+        Unlinking is safe while a worker still has the block mapped; the
+        memory is reclaimed once the last mapping is closed.
+        """
+        future, block = entry[:2]
+        if future is not None:
+            future.cancel()
+        if block is not None:
+            block.close()
+            block.unlink()
@@ -1,70 +1,91 @@
 # -*- coding: utf-8 -*-
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
-from queue import Queue
+from auto_adjust.sheet_index import cached, entity_rows, group_index, portfolio_index, parse_sku_list
+from auto_adjust.rules import Predicate, equals, compiler_for
+from auto_adjust.metrics import stage_timer
 
+# Status and entity rules shared by every screen; the rule compiler
+# evaluates each of them once per parsed chunk
+CAMPAIGN_ENABLED = equals("广告活动状态（仅供参考）", "已启用")
+AD_GROUP_ENABLED = equals("广告组状态（仅供参考）", "已启用")
+STATUS_ENABLED = equals("状态", "已启用")
+ENABLED = CAMPAIGN_ENABLED & AD_GROUP_ENABLED & STATUS_ENABLED
 
-def filter_data_helper(data, sku_filter, conditions, entity_level=None, is_sp_pos=False, is_sp_word=False, is_sp_invalid=False):
-    """Filter data based on given conditions, SKU filter, and entity level
+
+def entity(entity_level):
+    """Rule matching rows of the given 实体层级"""
+    return equals("实体层级", entity_level)
+
+
+def enabled_rows(data, entity_level):
+    """Rows of one entity level whose campaign, ad group and own status are enabled
+    
+    Built from the entity-level partition once per parsed frame, so screens
+    on enabled rows never scan rows of other levels.
     
     Args:
         data (pd.DataFrame): DataFrame containing advertising data
-        sku_filter (list): Optional list of SKUs to filter specific ad combinations
-        conditions (pd.Series): Boolean conditions for filtering data
+        entity_level (str): Entity level like "商品广告" or "商品定向"
+        
+    Returns:
+        pd.DataFrame: Enabled rows at that entity level, with data's row labels
+    """
+    return cached(
+        entity_rows(data, entity_level), 'enabled_rows',
+        lambda rows: rows.take(np.flatnonzero(compiler_for(rows).mask(ENABLED)))
+    )
+
+
+def base_rule(entity_level=None, is_sp_pos=False, is_sp_word=False, is_sp_invalid=False):
+    """Status and entity-level rule applied before a screen's own conditions
+    
+    Args:
         entity_level (str, optional): Entity level like "商品广告" or "商品定向"
         is_sp_pos (bool): Whether this is a sp_pos function call
         is_sp_word (bool): Whether this is a sp_word function call
         is_sp_invalid (bool): Whether this is a sp_invalid function call
         
     Returns:
-        pd.DataFrame: Filtered data meeting all conditions
+        Rule or None: Rule to combine with the conditions, None if there is none
     """
-    try:
-        if is_sp_pos:
-            base_conditions = (
-                (data["实体层级"] == entity_level) &
-                conditions
-            )
-        elif is_sp_word:
-            base_conditions = conditions
-        elif is_sp_invalid:
-            base_conditions = (
-                (data["广告活动状态（仅供参考）"] == "已启用") &
-                (data["实体层级"] == entity_level) &
-                conditions
-            )
-        else:
-            base_conditions = (
-                (data["广告活动状态（仅供参考）"] == "已启用") &
-                (data["广告组状态（仅供参考）"] == "已启用") &
-                (data["状态"] == "已启用") &
-                (data["实体层级"] == entity_level) &
-                conditions
-            )
-
-        if sku_filter:
-            return data[base_conditions & data['广告组合名称（仅供参考）'].isin(sku_filter)]
-        return data[base_conditions]
-    except KeyError as e:
-        raise KeyError("Column name error: {0}".format(e))
+    if is_sp_pos:
+        return entity(entity_level)
+    if is_sp_word:
+        return None
+    if is_sp_invalid:
+        return CAMPAIGN_ENABLED & entity(entity_level)
+    return ENABLED & entity(entity_level)
 
 
-def worker(data, sku_sub_list, conditions, entity_level, result_queue, is_sp_pos, is_sp_word, is_sp_invalid):
-    """Worker thread function to process data subset and put results in queue
+def filter_data_helper(data, sku_filter, conditions, entity_level=None, is_sp_pos=False, is_sp_word=False, is_sp_invalid=False):
+    """Filter data based on given conditions, SKU filter, and entity level
     
     Args:
         data (pd.DataFrame): DataFrame containing advertising data
-        sku_sub_list (list): Subset of SKUs to process
-        conditions (pd.Series): Boolean conditions for filtering
-        entity_level (str): Entity level for filtering
-        result_queue (Queue): Queue to store results
+        sku_filter (list): Optional list of SKUs to filter specific ad combinations
+        conditions (Rule): Screening rule rows must match
+        entity_level (str, optional): Entity level like "商品广告" or "商品定向"
         is_sp_pos (bool): Whether this is a sp_pos function call
         is_sp_word (bool): Whether this is a sp_word function call
         is_sp_invalid (bool): Whether this is a sp_invalid function call
+        
+    Returns:
+        pd.DataFrame: Filtered data meeting all conditions
     """
-    result = filter_data_helper(data, sku_sub_list, conditions, entity_level, is_sp_pos, is_sp_word, is_sp_invalid)
-    result_queue.put(result)
+    try:
+        rule = base_rule(entity_level, is_sp_pos, is_sp_word, is_sp_invalid)
+        rule = conditions if rule is None else rule & conditions
+        mask = compiler_for(data).mask(rule)
+
+        if sku_filter:
+            with stage_timer('sku_filter', rows_in=int(mask.sum())) as timer:
+                mask = mask & portfolio_index(data).mask_for(sku_filter)
+                timer.rows_out = int(mask.sum())
+        return data[mask]
+    except KeyError as e:
+        raise KeyError("Column name error: {0}".format(e))
 
 
 def apply_filters(data, conditions, sku_str, entity_level=None, is_sp_pos=False, is_sp_word=False, is_sp_invalid=False):
@@ -72,7 +93,7 @@ def apply_filters(data, conditions, sku_str, entity_level=None, is_sp_pos=False,
     
     Args:
         data (pd.DataFrame): DataFrame containing advertising data
-        conditions (pd.Series): Boolean conditions for filtering
+        conditions (Rule): Screening rule rows must match
         sku_str (str): Comma-separated SKU values from frontend form
         entity_level (str, optional): Entity level for filtering
         is_sp_pos (bool): Whether this is a sp_pos function call
@@ -82,24 +103,8 @@ def apply_filters(data, conditions, sku_str, entity_level=None, is_sp_pos=False,
     Returns:
         pd.DataFrame: Filtered data meeting all conditions
     """
-    sku_list = [sku.strip() for sku in sku_str.split(",")] if sku_str else None
-
-    if sku_list:
-        num_threads = min(len(sku_list), 8)  # Use up to 8 threads
-        chunked_sku_lists = [sku_list[i::num_threads] for i in range(num_threads)]
-
-        result_queue = Queue()
-        with ThreadPoolExecutor(max_workers=num_threads) as executor:
-            for sku_sub_list in chunked_sku_lists:
-                executor.submit(worker, data, sku_sub_list, conditions, entity_level, result_queue, is_sp_pos, is_sp_word, is_sp_invalid)
-
-        results = []
-        while not result_queue.empty():
-            results.append(result_queue.get())
-
-        return pd.concat(results) if results else pd.DataFrame()
-    
-    return filter_data_helper(data, None, conditions, entity_level, is_sp_pos, is_sp_word, is_sp_invalid)
+    sku_list = parse_sku_list(sku_str)
+    return filter_data_helper(data, sku_list, conditions, entity_level, is_sp_pos, is_sp_word, is_sp_invalid)
 
 
 def sp_product(data, click, order, acos, conversion, sku_str):
@@ -116,17 +121,20 @@ def sp_product(data, click, order, acos, conversion, sku_str):
     Returns:
         pd.DataFrame: Filtered data with updated status
     """
-    condition1 = (data["点击量"] > click) & (data["订单数量"] == 0)
-    condition2 = (data["订单数量"] < order) & (data["ACOS"] > acos) & (data["转化率"] < conversion)
+    condition1 = Predicate("点击量", ">", click) & equals("订单数量", 0)
+    condition2 = Predicate("订单数量", "<", order) & Predicate("ACOS", ">", acos) & Predicate("转化率", "<", conversion)
     conditions = condition1 | condition2
     entity_level = "商品广告"
 
-    to_pause = apply_filters(data, conditions, sku_str, entity_level)
+    rows = enabled_rows(data, entity_level)
+    to_pause = apply_filters(rows, conditions, sku_str, entity_level)
 
     if not to_pause.empty:
-        data.loc[to_pause.index, "操作"] = "Update"
-        data.loc[to_pause.index, "状态"] = "已暂停"
-        return data.loc[to_pause.index]
+        # Edit a copy: the partition is cached and shared by later screens
+        paused = rows.loc[to_pause.index].copy()
+        paused.loc[:, "操作"] = "Update"
+        paused.loc[:, "状态"] = "已暂停"
+        return paused
     return None
 
 
@@ -144,27 +152,35 @@ def sp_ad(data, spend, order, acos, conversion, sku_str):
     Returns:
         pd.DataFrame: Filtered data with updated bids
     """
-    condition1 = (data["花费"] > spend) & (data["订单数量"] == 0)
-    condition2 = (data["转化率"] < conversion) & (data["花费"] > spend) & (data["ACOS"] > acos)
-    condition3 = (data["转化率"] > conversion) & (data["ACOS"] < 0.30)
+    condition1 = Predicate("花费", ">", spend) & equals("订单数量", 0)
+    condition2 = Predicate("转化率", "<", conversion) & Predicate("花费", ">", spend) & Predicate("ACOS", ">", acos)
+    condition3 = Predicate("转化率", ">", conversion) & Predicate("ACOS", "<", 0.30)
     conditions = condition1 | condition2 | condition3
     entity_level = "商品定向"
 
-    to_pause = apply_filters(data, conditions, sku_str, entity_level)
+    rows = enabled_rows(data, entity_level)
+    to_pause = apply_filters(rows, conditions, sku_str, entity_level)
 
     if not to_pause.empty:
-        for index, row in to_pause.iterrows():
-            if condition1.loc[index]:
-                data.loc[index, "操作"] = "Update"
-                data.loc[index, "状态"] = "已暂停"
-            elif condition2.loc[index]:
-                data.loc[index, "操作"] = "Update"
-                data.loc[index, '竞价'] = row['竞价'] - 0.02
-            elif condition3.loc[index]:
-                data.loc[index, "操作"] = "Update"
-                data.loc[index, '竞价'] = row['竞价'] + 0.03
-
-        return data.loc[to_pause.index]
+        # Every selected row meets at least one condition; np.select keeps
+        # the first matching condition, like an if/elif chain per row
+        compiler = compiler_for(rows)
+        index = to_pause.index
+        positions = rows.index.get_indexer(index)
+        is_pause = compiler.mask(condition1)[positions]
+        adjusted = rows.loc[index].copy()
+        bid = adjusted['竞价'].to_numpy()
+        new_bid = np.select(
+            [is_pause, compiler.mask(condition2)[positions], compiler.mask(condition3)[positions]],
+            [bid, bid - 0.02, bid + 0.03],
+            default=bid
+        )
+
+        adjusted.loc[:, "操作"] = "Update"
+        adjusted.loc[index[is_pause], "状态"] = "已暂停"
+        adjusted['竞价'] = new_bid
+
+        return adjusted
     return None
 
 
@@ -182,23 +198,31 @@ def sp_pos(data, spend, order, acos, conversion, sku_str):
     Returns:
         pd.DataFrame: Filtered data with updated bid percentages
     """
-    condition1 = (data["花费"] > spend) & (data["转化率"] < conversion) & (data["ACOS"] > acos)
-    condition2 = (data["花费"] > spend) & (data["转化率"] > conversion) & (data["ACOS"] < 0.25)
+    condition1 = Predicate("花费", ">", spend) & Predicate("转化率", "<", conversion) & Predicate("ACOS", ">", acos)
+    condition2 = Predicate("花费", ">", spend) & Predicate("转化率", ">", conversion) & Predicate("ACOS", "<", 0.25)
     conditions = condition1 | condition2
     entity_level = "竞价调整"
 
-    to_pause = apply_filters(data, conditions, sku_str, entity_level, is_sp_pos=True)
+    rows = entity_rows(data, entity_level)
+    to_pause = apply_filters(rows, conditions, sku_str, entity_level, is_sp_pos=True)
 
     if not to_pause.empty:
-        for index, row in to_pause.iterrows():
-            if condition1.loc[index]:
-                data.loc[index, "操作"] = "Update"
-                data.loc[index, "百分比"] = max(row['百分比'] - 5.00, 0)
-            elif condition2.loc[index]:
-                data.loc[index, "操作"] = "Update"
-                data.loc[index, '百分比'] = row['百分比'] + 10.00
-
-        return data.loc[to_pause.index]
+        # First matching condition wins, like an if/elif chain per row
+        compiler = compiler_for(rows)
+        index = to_pause.index
+        positions = rows.index.get_indexer(index)
+        adjusted = rows.loc[index].copy()
+        percentage = adjusted['百分比'].to_numpy()
+        new_percentage = np.select(
+            [compiler.mask(condition1)[positions], compiler.mask(condition2)[positions]],
+            [np.maximum(percentage - 5.00, 0), percentage + 10.00],
+            default=percentage
+        )
+
+        adjusted.loc[:, "操作"] = "Update"
+        adjusted['百分比'] = new_percentage
+
+        return adjusted
     return None
 
 
@@ -217,11 +241,11 @@ def sp_word(data, click, click_rate, order, conversion, sku_str):
         pd.DataFrame: Filtered search terms
     """
     conditions = (
-        (data["点击量"] > click) & 
-        (data["点击率"] > click_rate) & 
-        (data["订单数量"] > order) & 
-        (data["转化率"] > conversion) & 
-        (data["ACOS"] < 0.25)
+        Predicate("点击量", ">", click) &
+        Predicate("点击率", ">", click_rate) &
+        Predicate("订单数量", ">", order) &
+        Predicate("转化率", ">", conversion) &
+        Predicate("ACOS", "<", 0.25)
     )
 
     to_pause = apply_filters(data, conditions, sku_str, is_sp_word=True)
@@ -243,16 +267,17 @@ def sp_keyword(data, click, click_rate, order, conversion, sku_str):
         pd.DataFrame: Filtered keywords
     """
     conditions = (
-        (data["点击量"] > click) & 
-        (data["点击率"] > click_rate) & 
-        (data["订单数量"] > order) & 
-        (data["转化率"] > conversion) & 
-        (data["ACOS"] < 0.30)
+        Predicate("点击量", ">", click) &
+        Predicate("点击率", ">", click_rate) &
+        Predicate("订单数量", ">", order) &
+        Predicate("转化率", ">", conversion) &
+        Predicate("ACOS", "<", 0.30)
     )
     entity_level = "关键词"
 
-    to_pause = apply_filters(data, conditions, sku_str, entity_level)
-    return data.loc[to_pause.index] if not to_pause.empty else None
+    rows = enabled_rows(data, entity_level)
+    to_pause = apply_filters(rows, conditions, sku_str, entity_level)
+    return rows.loc[to_pause.index] if not to_pause.empty else None
 
 
 def sp_invalid(data, click, sku_str):
@@ -267,33 +292,33 @@ def sp_invalid(data, click, sku_str):
         pd.DataFrame: Filtered data with updated bids
     """
     # Filter for campaign level
-    campaign_data = data[data["实体层级"] == "广告活动"].copy()
+    campaign_data = entity_rows(data, "广告活动").copy()
     
     # Calculate days since start
     campaign_data["开始日期"] = pd.to_datetime(campaign_data["开始日期"])
-    days_since_start = (datetime.now() - campaign_data["开始日期"]).dt.days
+    campaign_data["投放天数"] = (datetime.now() - campaign_data["开始日期"]).dt.days
     
     # Define conditions based on campaign age
-    condition1 = (days_since_start <= 7) & (campaign_data["点击量"] < 5)
-    condition2 = (days_since_start > 7) & (campaign_data["点击量"] < 10)
+    condition1 = Predicate("投放天数", "<=", 7) & Predicate("点击量", "<", 5)
+    condition2 = Predicate("投放天数", ">", 7) & Predicate("点击量", "<", 10)
     conditions = condition1 | condition2
     
-    # Get invalid campaigns
-    invalid_campaigns = apply_filters(campaign_data, conditions, sku_str, is_sp_invalid=True)
+    # Get invalid campaigns among the enabled 广告活动 rows
+    invalid_campaigns = apply_filters(campaign_data, conditions, sku_str, "广告活动", is_sp_invalid=True)
     
     if not invalid_campaigns.empty:
         # Get campaign names
         campaign_names = invalid_campaigns["广告活动名称"].unique()
         
-        # Filter related keywords and targets
-        related_data = data[
-            (data["广告活动名称"].isin(campaign_names)) &
-            (data["实体层级"].isin(["关键词", "商品定向"]))
-        ].copy()
+        # Look up related keywords and targets in their entity partitions
+        related_parts = []
+        for entity_level in ("关键词", "商品定向"):
+            rows = entity_rows(data, entity_level)
+            related_parts.append(rows.take(group_index(rows, "广告活动名称").positions_for(campaign_names)))
+        related_data = pd.concat(related_parts).sort_index()
         
         # Adjust bids
-        related_data.loc[related_data["实体层级"] == "关键词", "竞价"] *= 0.8
-        related_data.loc[related_data["实体层级"] == "商品定向", "竞价"] *= 0.8
+        related_data["竞价"] *= 0.8
         
         return related_data
     return None
@@ -318,7 +343,21 @@ def sp_descent(old_data, new_data, spend, sku_str):
         on="广告活动名称",
         suffixes=("_old", "_new")
     )
+    return spend_descent(merged_data, spend, sku_str)
+
+
+def spend_descent(merged_data, spend, sku_str):
+    """Select campaigns whose spend dropped from a period above the threshold
     
+    Args:
+        merged_data (pd.DataFrame): 广告活动名称 with 花费_old and 花费_new
+        spend (float): Spending threshold
+        sku_str (str): Comma-separated SKU values
+        
+    Returns:
+        pd.DataFrame: Data showing spending trends
+    """
+    merged_data = merged_data.copy()
     # Calculate spending change
     merged_data["花费变化"] = merged_data["花费_new"] - merged_data["花费_old"]
     
@@ -328,8 +367,180 @@ def sp_descent(old_data, new_data, spend, sku_str):
         (merged_data["花费变化"] < 0)
     )
     
-    if sku_str:
-        sku_list = [sku.strip() for sku in sku_str.split(",")]
-        conditions &= merged_data["广告活动名称"].isin(sku_list)
+    sku_list = parse_sku_list(sku_str)
+    if sku_list:
+        with stage_timer('sku_filter', rows_in=int(conditions.sum())) as timer:
+            conditions &= merged_data["广告活动名称"].isin(sku_list)
+            timer.rows_out = int(conditions.sum())
+    
+    return merged_data[conditions]
+
+
+SB_TARGET_LEVELS = ("关键词", "商品定向")  # Bid-carrying rows of the Sponsored Brands sheet
+
+
+def _screen_targets(data, entity_levels, conditions, sku_str, update):
+    """Apply conditions to the enabled bid-carrying rows of an SB or SD chunk
+    
+    Args:
+        data (pd.DataFrame): Chunk of the 品牌推广活动 or 展示型推广活动 sheet
+        entity_levels (tuple): Entity levels of the rows to screen
+        conditions (Rule): Screening rule rows must match
+        sku_str (str): Comma-separated SKU values
+        update (callable): Called as update(rows) to edit a copy of the matched rows
+        
+    Returns:
+        pd.DataFrame: Edited rows in sheet order, None when nothing matched
+    """
+    matched_parts = []
+    for entity_level in entity_levels:
+        rows = enabled_rows(data, entity_level)
+        matched = apply_filters(rows, conditions, sku_str, entity_level)
+        if not matched.empty:
+            # The partition is cached and shared by later screens, so only the copy is edited
+            edited = rows.loc[matched.index].copy()
+            update(edited)
+            matched_parts.append(edited)
+    return pd.concat(matched_parts).sort_index() if matched_parts else None
+
+
+def sb_pause(data, spend, sku_str):
+    """Pause SB keywords and targets that spend without orders
+    
+    Args:
+        data (pd.DataFrame): DataFrame containing advertising data
+        spend (float): Spending threshold
+        sku_str (str): Comma-separated SKU values
+        
+    Returns:
+        pd.DataFrame: Filtered data with updated status
+    """
+    conditions = Predicate("花费", ">", spend) & equals("订单数量", 0)
+
+    def pause(rows):
+        rows.loc[:, "操作"] = "Update"
+        rows.loc[:, "状态"] = "已暂停"
+
+    return _screen_targets(data, SB_TARGET_LEVELS, conditions, sku_str, pause)
+
+
+def sb_bid_down(data, spend, acos, sku_str):
+    """Lower bids of SB keywords and targets with high ACOS
+    
+    Args:
+        data (pd.DataFrame): DataFrame containing advertising data
+        spend (float): Spending threshold
+        acos (float): ACOS threshold
+        sku_str (str): Comma-separated SKU values
+        
+    Returns:
+        pd.DataFrame: Filtered data with lowered bids
+    """
+    conditions = Predicate("花费", ">", spend) & Predicate("订单数量", ">", 0) & Predicate("ACOS", ">", acos)
+
+    def lower_bid(rows):
+        rows.loc[:, "操作"] = "Update"
+        rows["竞价"] = np.round(rows["竞价"].to_numpy() * 0.9, 2)
+
+    return _screen_targets(data, SB_TARGET_LEVELS, conditions, sku_str, lower_bid)
+
+
+def sb_promote(data, order, acos, conversion, sku_str):
+    """Raise bids of converting SB keywords and targets with low ACOS
+    
+    Args:
+        data (pd.DataFrame): DataFrame containing advertising data
+        order (int): Order threshold
+        acos (float): ACOS threshold
+        conversion (float): Conversion rate threshold
+        sku_str (str): Comma-separated SKU values
+        
+    Returns:
+        pd.DataFrame: Filtered data with raised bids
+    """
+    conditions = (
+        Predicate("订单数量", ">=", order) &
+        Predicate("ACOS", "<", acos) &
+        Predicate("转化率", ">", conversion)
+    )
+
+    def raise_bid(rows):
+        rows.loc[:, "操作"] = "Update"
+        rows["竞价"] = np.round(rows["竞价"].to_numpy() * 1.1, 2)
+
+    return _screen_targets(data, SB_TARGET_LEVELS, conditions, sku_str, raise_bid)
+
+
+SD_TARGET_LEVELS = ("受众定向", "上下文定向")  # Audience and contextual targeting rows of the Sponsored Display sheet
+SD_VIEWABLE_RATE = 0.5  # Viewable share of impressions below which SD spend counts as wasted
+
+
+def sd_pause(data, spend, click, sku_str):
+    """Pause SD audience and contextual targets that get clicks but no orders
+    
+    Args:
+        data (pd.DataFrame): DataFrame containing advertising data
+        spend (float): Spending threshold
+        click (int): Click threshold
+        sku_str (str): Comma-separated SKU values
+        
+    Returns:
+        pd.DataFrame: Filtered data with updated status
+    """
+    conditions = Predicate("花费", ">", spend) & Predicate("点击量", ">=", click) & equals("订单数量", 0)
+
+    def pause(rows):
+        rows.loc[:, "操作"] = "Update"
+        rows.loc[:, "状态"] = "已暂停"
+
+    return _screen_targets(data, SD_TARGET_LEVELS, conditions, sku_str, pause)
+
+
+def sd_audience_bid_down(data, spend, acos, sku_str):
+    """Lower bids of SD audience targets with high ACOS
     
-    return merged_data[conditions]
\ No newline at end of file
+    Args:
+        data (pd.DataFrame): DataFrame containing advertising data
+        spend (float): Spending threshold
+        acos (float): ACOS threshold
+        sku_str (str): Comma-separated SKU values
+        
+    Returns:
+        pd.DataFrame: Filtered data with lowered bids
+    """
+    conditions = Predicate("花费", ">", spend) & Predicate("订单数量", ">", 0) & Predicate("ACOS", ">", acos)
+
+    def lower_bid(rows):
+        rows.loc[:, "操作"] = "Update"
+        rows["竞价"] = np.round(rows["竞价"].to_numpy() * 0.9, 2)
+
+    return _screen_targets(data, ("受众定向",), conditions, sku_str, lower_bid)
+
+
+def sd_viewable_waste(data, impress, spend, sku_str):
+    """Find SD targets spending on impressions that are mostly not viewable
+    
+    Rows are returned unchanged for review: a low viewable share points
+    at placements rather than at the bid.
+    
+    Args:
+        data (pd.DataFrame): DataFrame containing advertising data
+        impress (int): Impression threshold
+        spend (float): Spending threshold
+        sku_str (str): Comma-separated SKU values
+        
+    Returns:
+        pd.DataFrame: Targets whose 可见展示量 is below SD_VIEWABLE_RATE of 展示量
+    """
+    conditions = Predicate("展示量", ">=", impress) & Predicate("花费", ">", spend)
+    wasted_parts = []
+    for entity_level in SD_TARGET_LEVELS:
+        matched = apply_filters(enabled_rows(data, entity_level), conditions, sku_str, entity_level)
+        if matched.empty:
+            continue
+        viewable = matched["可见展示量"].to_numpy(dtype=float, na_value=0.0)
+        impressions = matched["展示量"].to_numpy(dtype=float, na_value=0.0)
+        wasted = matched[viewable < impressions * SD_VIEWABLE_RATE]
+        if not wasted.empty:
+            wasted_parts.append(wasted)
+    return pd.concat(wasted_parts).sort_index() if wasted_parts else None
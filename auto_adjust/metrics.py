@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+STAGE_LABELS = ('stage', 'screen')
+
+def peak_rss_bytes():
+    """Peak resident set size of this process in bytes, None if unknown"""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def current_rss_bytes():
+    """Current resident set size of this process in bytes, None if unknown"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):  # No procfs, e.g. on macOS or Windows
+        return None
+
+def rss_growth(started_rss):
+    """Growth of the resident set size since started_rss, None if unknown"""
+    rss = current_rss_bytes()
+    if rss is None or started_rss is None:
+        return None
+    return max(rss - started_rss, 0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _label_text(names, values, extra=None):
+    pairs = ['{0}="{1}"'.format(name, _escape(value)) for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value):
+    return '+Inf' if value == float('inf') else repr(float(value))
+
+class _Metric:
+    """Base of the metric types: a family of series keyed by label values"""
+
+    kind = None
+
+    def __init__(self, name, help_text, label_names=STAGE_LABELS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.label_names)
+
+    def render(self):
+        lines = [
+            "# HELP {0} {1}".format(self.name, self.help_text),
+            "# TYPE {0} {1}".format(self.name, self.kind),
+        ]
+        with self._lock:
+            for key in sorted(self._series):
+                lines.extend(self._render_series(key, self._series[key]))
+        return lines
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def _render_series(self, key, value):
+        return ["{0}{1} {2}".format(self.name, _label_text(self.label_names, key), _number(value))]
+
+class Gauge(_Metric):
+    """Gauge keeping the highest value seen per series"""
+
+    kind = 'gauge'
+
+    def set_max(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = max(self._series.get(key, value), value)
+
+    def _render_series(self, key, value):
+        return ["{0}{1} {2}".format(self.name, _label_text(self.label_names, key), _number(value))]
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names=STAGE_LABELS, buckets=DURATION_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._series.get(key, ([0] * len(self.buckets), 0.0))
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[position] += 1
+            self._series[key] = (counts, total + value)
+
+    def _render_series(self, key, value):
+        counts, total = value
+        lines = [
+            "{0}_bucket{1} {2}".format(
+                self.name, _label_text(self.label_names, key, 'le="{0}"'.format(_number(bound))), count
+            )
+            for bound, count in zip(self.buckets, counts)
+        ]
+        lines.append("{0}_sum{1} {2}".format(self.name, _label_text(self.label_names, key), _number(total)))
+        lines.append("{0}_count{1} {2}".format(self.name, _label_text(self.label_names, key), counts[-1]))
+        return lines
+
+STAGE_DURATION = Histogram('sp_stage_duration_seconds', "Duration of a processing stage")
+STAGE_ROWS_IN = Counter('sp_stage_rows_in_total', "Rows entering a processing stage")
+STAGE_ROWS_OUT = Counter('sp_stage_rows_out_total', "Rows produced by a processing stage")
+STAGE_RSS_GROWTH = Gauge('sp_stage_rss_growth_bytes', "Largest growth of the resident set size over one run of a stage")
+REGISTRY = [STAGE_DURATION, STAGE_ROWS_IN, STAGE_ROWS_OUT, STAGE_RSS_GROWTH]
+
+def record_stage(stage, screen, seconds, rows_in=None, rows_out=None, rss_growth=None):
+    """Record one finished stage in the registry
+
+    The process-lifetime peak is exported once by render_metrics; per
+    stage only the growth of the current resident set size is kept, as
+    the lifetime peak says nothing about the stage that just ran.
+    """
+    STAGE_DURATION.observe(seconds, stage=stage, screen=screen)
+    if rows_in is not None:
+        STAGE_ROWS_IN.inc(rows_in, stage=stage, screen=screen)
+    if rows_out is not None:
+        STAGE_ROWS_OUT.inc(rows_out, stage=stage, screen=screen)
+    if rss_growth is not None:
+        STAGE_RSS_GROWTH.set_max(rss_growth, stage=stage, screen=screen)
+
+def replay(records):
+    """Record stages collected by collect_stages, e.g. in a worker process"""
+    for record in records:
+        record_stage(*record)
+
+_local = threading.local()
+
+@contextmanager
+def collect_stages(screen, records=None):
+    """Label the stages timed in this thread with a screen, optionally collecting them
+
+    Chunk filters collect into records so stages timed inside a worker
+    process reach the registry of the web process: the records travel
+    back with the chunk results and are passed to replay.
+
+    Args:
+        screen (str): Screen label of stages that do not name one
+        records (list, optional): Receives (stage, screen, seconds, rows_in,
+            rows_out, rss_growth) tuples instead of the registry
+    """
+    previous = getattr(_local, 'collector', None)
+    _local.collector = (screen, records)
+    try:
+        yield records
+    finally:
+        _local.collector = previous
+
+class StageTimer:
+    """Measures one stage; set rows_out before the with block ends"""
+
+    def __init__(self, stage, screen=None, rows_in=None):
+        self.stage = stage
+        self.screen = screen
+        self.rows_in = rows_in
+        self.rows_out = None
+
+    def __enter__(self):
+        self.started_rss = current_rss_bytes()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.started
+        collector = getattr(_local, 'collector', None)
+        screen = self.screen
+        if screen is None:
+            screen = collector[0] if collector is not None else ''
+        record = (self.stage, screen, seconds, self.rows_in, self.rows_out, rss_growth(self.started_rss))
+        if collector is not None and collector[1] is not None:
+            collector[1].append(record)
+        else:
+            record_stage(*record)
+        return False
+
+def stage_timer(stage, screen=None, rows_in=None):
+    """Time a stage: with stage_timer('write', 'SP商品筛选', rows) as timer: ..."""
+    return StageTimer(stage, screen, rows_in)
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    rss = peak_rss_bytes()
+    if rss is not None:
+        lines.extend([
+            "# HELP process_peak_rss_bytes Peak resident set size of the process",
+            "# TYPE process_peak_rss_bytes gauge",
+            "process_peak_rss_bytes {0}".format(_number(rss)),
+        ])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+import weakref
+import operator
+import threading
+import numpy as np
+from auto_adjust.sheet_index import cached
+
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+class Rule:
+    """Base class of declarative screening rules
+
+    Rules are immutable and hashable, so equal rules built by different
+    screens share one cached mask. They combine with & and |.
+    """
+
+    __slots__ = ()
+
+    def __and__(self, other):
+        return All(self, other)
+
+    def __or__(self, other):
+        return Any(self, other)
+
+    def key(self):
+        raise NotImplementedError
+
+    def __eq__(self, other):
+        return isinstance(other, Rule) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return "{0}{1}".format(type(self).__name__, self.key()[1:])
+
+class Predicate(Rule):
+    """Comparison of one column against a constant, e.g. Predicate('ACOS', '<', 0.30)"""
+
+    __slots__ = ('column', 'op', 'value')
+
+    def __init__(self, column, op, value):
+        """Initialize predicate
+
+        Args:
+            column (str): Column name
+            op (str): One of the OPERATORS keys
+            value: Constant to compare against
+        """
+        if op not in OPERATORS:
+            raise ValueError("Unknown operator: {0}".format(op))
+        self.column = column
+        self.op = op
+        self.value = value
+
+    def key(self):
+        return ('predicate', self.column, self.op, self.value)
+
+    def evaluate(self, compiler):
+        series = compiler.data[self.column]
+        return np.asarray(OPERATORS[self.op](series, self.value), dtype=bool)
+
+class All(Rule):
+    """Rule matching rows that match every sub-rule"""
+
+    __slots__ = ('rules',)
+
+    def __init__(self, *rules):
+        flattened = []
+        for rule in rules:
+            flattened.extend(rule.rules if isinstance(rule, All) else (rule,))
+        self.rules = tuple(flattened)
+
+    def key(self):
+        return ('all',) + tuple(rule.key() for rule in self.rules)
+
+    def evaluate(self, compiler):
+        mask = compiler.mask(self.rules[0]).copy()
+        for rule in self.rules[1:]:
+            mask &= compiler.mask(rule)
+        return mask
+
+class Any(Rule):
+    """Rule matching rows that match at least one sub-rule"""
+
+    __slots__ = ('rules',)
+
+    def __init__(self, *rules):
+        flattened = []
+        for rule in rules:
+            flattened.extend(rule.rules if isinstance(rule, Any) else (rule,))
+        self.rules = tuple(flattened)
+
+    def key(self):
+        return ('any',) + tuple(rule.key() for rule in self.rules)
+
+    def evaluate(self, compiler):
+        mask = compiler.mask(self.rules[0]).copy()
+        for rule in self.rules[1:]:
+            mask |= compiler.mask(rule)
+        return mask
+
+def equals(column, value):
+    """Shorthand for Predicate(column, '==', value)"""
+    return Predicate(column, '==', value)
+
+class RuleCompiler:
+    """Evaluates rules over one DataFrame, computing each distinct rule once
+
+    Masks are cached as read-only boolean arrays aligned with the rows of
+    the frame. Screens edit copies of the rows they select, never the
+    frame or its cached partitions, so every screen run on a shared chunk
+    sees the sheet as it was parsed.
+
+    The compiler lives in the frame cache of its frame and only holds a
+    weak reference to it, so the frame, its cache and the masks are
+    released together once no screen uses the frame any more.
+    """
+
+    def __init__(self, data):
+        """Initialize compiler for a parsed sheet or chunk
+
+        Args:
+            data (pd.DataFrame): Parsed sheet or chunk
+        """
+        self._data = weakref.ref(data)
+        self._masks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def data(self):
+        """The frame the rules are evaluated on"""
+        data = self._data()
+        if data is None:
+            raise ReferenceError("The frame of this rule compiler was released")
+        return data
+
+    def mask(self, rule):
+        """Return the boolean mask of a rule, evaluating it on first use
+
+        Args:
+            rule (Rule): Rule to evaluate
+
+        Returns:
+            np.ndarray: Read-only boolean mask
+        """
+        with self._lock:
+            mask = self._masks.get(rule)
+        if mask is None:
+            mask = rule.evaluate(self)
+            mask.flags.writeable = False
+            with self._lock:
+                mask = self._masks.setdefault(rule, mask)
+        return mask
+
+def compiler_for(data):
+    """Get the rule compiler of a parsed frame, shared by all screens using it"""
+    return cached(data, 'rule_compiler', RuleCompiler)
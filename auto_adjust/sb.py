@@ -1,3 +1,52 @@
-class SBModule:
-    def adjust_sb(self):
-        print("Adjusting Sponsored Brand (SB) campaigns.")
+# -*- coding: utf-8 -*-
+import auto_adjust.filters as filter
+from auto_adjust.sp import ScreenModule, has_sheet
+
+SB_SHEET = '品牌推广活动'
+
+# SB screens: name -> (sheet, filter function, threshold names). The
+# conditions of the three screens exclude each other, so their order
+# does not matter for sb_all_screen.
+SB_SCREENS = {
+    'SB无单暂停': (SB_SHEET, filter.sb_pause, ('spend',)),
+    'SB高ACOS降价': (SB_SHEET, filter.sb_bid_down, ('spend', 'acos')),
+    'SB优胜提价': (SB_SHEET, filter.sb_promote, ('order', 'acos', 'conversion')),
+}
+
+class SBModule(ScreenModule):
+    """Screens over the Sponsored Brands sheet of the bulk file, sharing the SP pipeline"""
+
+    SCREENS = SB_SCREENS
+
+    def sb_pause_screen(self):
+        """Pause keywords and targets that spend without orders"""
+        return self._run_screen('SB无单暂停')
+
+    def sb_bid_down_screen(self):
+        """Lower bids of keywords and targets with high ACOS"""
+        return self._run_screen('SB高ACOS降价')
+
+    def sb_promote_screen(self):
+        """Raise bids of converting keywords and targets with low ACOS"""
+        return self._run_screen('SB优胜提价')
+
+    def sb_all_screen(self):
+        """Run every SB screen on one parse of the sheet and save them as one workbook"""
+        return self._run_all_screens('SB全部筛选')
+
+    def adjust_sb(self, sb_function=None):
+        """Run the selected SB screen
+
+        Args:
+            sb_function (str, optional): Method name of the screen, None to skip SB
+
+        Returns:
+            str: Path to the SB result file, None if nothing was written
+        """
+        if not sb_function:
+            print("No SB screen selected")
+            return None
+        if not has_sheet(self.file_path, SB_SHEET):
+            print("Sheet '{0}' not found, skipping SB screens".format(SB_SHEET))
+            return None
+        return self.call_function(sb_function)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+CATEGORY = 'category'  # Low-cardinality text, stored as categorical codes
+FLOAT32 = 'float32'  # Read-only ratios
+FLOAT64 = 'float64'  # Currency amounts and sales totals, which exceed float32's exact integers
+SMALLEST_INT = 'int'  # Counts, downcast to the smallest integer type that fits
+FLOAT32_EXACT_MAX = 2 ** 24  # Largest integer float32 stores exactly
+
+ENABLED_STATES = ('已启用', '已暂停', '已归档')
+
+# Declared column types of the SP bulk sheets. Categories listed here are
+# always present, so screens can write them (e.g. 状态 = 已暂停) even when
+# no row of the chunk has them yet. Columns edited by the screens with
+# arithmetic (竞价, 百分比) keep float64 so written values stay exact, and so
+# do currency totals: float32 rounds integers above 2**24, which JPY or
+# lifetime campaign figures reach, and thresholds and snapshot sums are
+# computed on the parsed values.
+SP_SCHEMA = {
+    '产品': (CATEGORY, ('商品推广',)),
+    '实体层级': (CATEGORY, ('广告活动', '广告组', '商品广告', '关键词', '否定关键词',
+                         '商品定向', '否定商品定向', '竞价调整')),
+    '操作': (CATEGORY, ('Create', 'Update', 'Delete')),
+    '状态': (CATEGORY, ENABLED_STATES),
+    '广告活动状态（仅供参考）': (CATEGORY, ENABLED_STATES),
+    '广告组状态（仅供参考）': (CATEGORY, ENABLED_STATES),
+    '广告组合名称（仅供参考）': (CATEGORY, ()),
+    '广告活动名称': (CATEGORY, ()),
+    '广告组名称': (CATEGORY, ()),
+    '匹配类型': (CATEGORY, ()),
+    '竞价方案': (CATEGORY, ()),
+    '投放类型': (CATEGORY, ()),
+    '花费': (FLOAT64, None),
+    '销量': (FLOAT64, None),
+    'ACOS': (FLOAT32, None),
+    'ROAS': (FLOAT32, None),
+    'CPC': (FLOAT32, None),
+    '转化率': (FLOAT32, None),
+    '点击率': (FLOAT32, None),
+    '每日预算': (FLOAT64, None),
+    '竞价': (FLOAT64, None),
+    '百分比': (FLOAT64, None),
+    '展示量': (SMALLEST_INT, None),
+    '可见展示量': (SMALLEST_INT, None),
+    '点击量': (SMALLEST_INT, None),
+    '订单数量': (SMALLEST_INT, None),
+}
+
+def _to_category(series, declared):
+    """Convert a column to categorical, keeping declared categories first"""
+    observed = [value for value in pd.unique(series.dropna()) if value not in declared]
+    return series.astype(pd.CategoricalDtype(list(declared) + observed))
+
+def _to_smallest_int(series):
+    """Downcast counts to the smallest integer type
+
+    Counts with missing values become float32, or float64 when they
+    exceed FLOAT32_EXACT_MAX and float32 would round them.
+    """
+    numeric = pd.to_numeric(series, errors='coerce')
+    if numeric.isna().any():
+        if numeric.abs().max() > FLOAT32_EXACT_MAX:
+            return numeric.astype(np.float64)
+        return numeric.astype(np.float32)
+    return pd.to_numeric(numeric, downcast='integer')
+
+def apply_schema(chunk, schema=SP_SCHEMA):
+    """Convert the columns of a parsed chunk to their declared compact types
+
+    Columns missing from the chunk are ignored; numeric columns holding
+    text that cannot be converted are left unchanged.
+
+    Args:
+        chunk (pd.DataFrame): Parsed chunk with default dtypes
+        schema (dict): Column name to (type, categories)
+
+    Returns:
+        pd.DataFrame: The chunk with compact column types
+    """
+    columns = {}
+    for column, (kind, categories) in schema.items():
+        if column not in chunk.columns:
+            continue
+        series = chunk[column]
+        try:
+            if kind == CATEGORY:
+                columns[column] = _to_category(series, categories)
+            elif kind == FLOAT32:
+                columns[column] = pd.to_numeric(series).astype(np.float32)
+            elif kind == FLOAT64:
+                columns[column] = pd.to_numeric(series).astype(np.float64)
+            elif kind == SMALLEST_INT:
+                columns[column] = _to_smallest_int(series)
+        except (ValueError, TypeError):
+            continue
+    if not columns:
+        return chunk
+    return chunk.assign(**columns)
+
+def restore_output_types(frame):
+    """Widen float32 ratios back to float64 before writing results
+
+    Values go through their shortest decimal form, so a metric parsed as
+    0.0395 is written as 0.0395 rather than 0.039500001817941666.
+
+    Args:
+        frame (pd.DataFrame): Screen result with compact column types
+
+    Returns:
+        pd.DataFrame: Result with float32 columns converted to float64
+    """
+    columns = {
+        column: frame[column].astype(str).astype(np.float64)
+        for column in frame.columns if frame[column].dtype == np.float32
+    }
+    return frame.assign(**columns) if columns else frame
+
+class MemoryReport:
+    """Accumulates memory usage of chunks before and after applying the schema"""
+
+    def __init__(self, sheet_name):
+        self.sheet_name = sheet_name
+        self.before = 0
+        self.after = 0
+
+    def add(self, before_chunk, after_chunk):
+        self.before += int(before_chunk.memory_usage(deep=True).sum())
+        self.after += int(after_chunk.memory_usage(deep=True).sum())
+
+    def summary(self):
+        """Human readable memory report for the sheet"""
+        mb = 1024.0 * 1024.0
+        saved = self.before - self.after
+        ratio = self.before / float(self.after) if self.after else 0.0
+        return "Sheet '{0}' memory: {1:.1f} MB -> {2:.1f} MB (saved {3:.1f} MB, {4:.1f}x)".format(
+            self.sheet_name, self.before / mb, self.after / mb, saved / mb, ratio
+        )
+
+def compact_chunks(chunks, sheet_name, schema=SP_SCHEMA):
+    """Apply the schema to each parsed chunk and print the memory saved
+
+    Args:
+        chunks (iterable): Parsed DataFrame chunks
+        sheet_name (str): Name of the sheet, used in the report
+        schema (dict): Column name to (type, categories)
+
+    Yields:
+        pd.DataFrame: Chunks with compact column types
+    """
+    report = MemoryReport(sheet_name)
+    for chunk in chunks:
+        compact = apply_schema(chunk, schema)
+        report.add(chunk, compact)
+        yield compact
+    print(report.summary())
@@ -1,3 +1,52 @@
-class SDModule:
-    def adjust_sd(self):
-        print("Adjusting Sponsored Display (SD) campaigns.")
+# -*- coding: utf-8 -*-
+import auto_adjust.filters as filter
+from auto_adjust.sp import ScreenModule, has_sheet
+
+SD_SHEET = '展示型推广活动'
+
+# SD screens: name -> (sheet, filter function, threshold names).
+# sd_all_screen evaluates them in this order on shared chunks; screens edit
+# copies of their rows, so the order does not change any screen's result.
+SD_SCREENS = {
+    'SD可见展示浪费': (SD_SHEET, filter.sd_viewable_waste, ('impress', 'spend')),
+    'SD无单暂停': (SD_SHEET, filter.sd_pause, ('spend', 'click')),
+    'SD受众降价': (SD_SHEET, filter.sd_audience_bid_down, ('spend', 'acos')),
+}
+
+class SDModule(ScreenModule):
+    """Screens over the Sponsored Display sheet of the bulk file, sharing the SP pipeline"""
+
+    SCREENS = SD_SCREENS
+
+    def sd_pause_screen(self):
+        """Pause audience and contextual targets that get clicks without orders"""
+        return self._run_screen('SD无单暂停')
+
+    def sd_audience_bid_down_screen(self):
+        """Lower bids of audience targets with high ACOS"""
+        return self._run_screen('SD受众降价')
+
+    def sd_viewable_waste_screen(self):
+        """List targets spending on impressions that are mostly not viewable"""
+        return self._run_screen('SD可见展示浪费')
+
+    def sd_all_screen(self):
+        """Run every SD screen on one parse of the sheet and save them as one workbook"""
+        return self._run_all_screens('SD全部筛选')
+
+    def adjust_sd(self, sd_function=None):
+        """Run the selected SD screen
+
+        Args:
+            sd_function (str, optional): Method name of the screen, None to skip SD
+
+        Returns:
+            str: Path to the SD result file, None if nothing was written
+        """
+        if not sd_function:
+            print("No SD screen selected")
+            return None
+        if not has_sheet(self.file_path, SD_SHEET):
+            print("Sheet '{0}' not found, skipping SD screens".format(SD_SHEET))
+            return None
+        return self.call_function(sd_function)
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import shutil
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+
+SHEET_CACHE_DIR = '.sheet_cache'  # Cache directory created inside the upload folder
+HASH_BLOCK_SIZE = 1024 * 1024  # Bytes read at once while hashing uploads
+META_FILE = 'meta.json'
+CACHE_VERSION = 5  # Bump when the stored column layout or dtypes change
+
+_hash_memo = {}
+_hash_lock = threading.Lock()
+_entry_listeners = []
+
+def add_entry_listener(callback):
+    """Register callback(entry_path, created) for cache entry use
+
+    It is called with created=True when an entry is published and with
+    created=False on every cache hit, so storage bookkeeping can follow
+    cache entries without listing the cache directory.
+    """
+    _entry_listeners.append(callback)
+
+def _notify_entry(entry, created):
+    for callback in _entry_listeners:
+        callback(entry, created)
+
+def announce_entry(entry):
+    """Notify listeners of an entry that another process published"""
+    _notify_entry(entry, True)
+
+def file_content_hash(file_path):
+    """Compute the SHA-256 of a file, memoized by path, size and mtime
+
+    Args:
+        file_path (str): Path to the file
+
+    Returns:
+        str: Hex digest of the file content
+    """
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        if key in _hash_memo:
+            return _hash_memo[key]
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+
+    with _hash_lock:
+        _hash_memo[key] = digest.hexdigest()
+    return _hash_memo[key]
+
+def record_content_hash(file_path, digest):
+    """Remember the SHA-256 of a file whose content was hashed while it was saved
+
+    Args:
+        file_path (str): Path to the file
+        digest (str): Hex digest of the file content
+    """
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        _hash_memo[key] = digest
+
+def _column_to_arrays(series):
+    """Encode a column as arrays that can be saved with np.save
+
+    Numeric, boolean and datetime columns are stored as-is (datetimes as
+    int64 nanoseconds). Categorical columns keep their codes and categories;
+    other text columns are factorized into int32 codes plus a JSON list of
+    values, so every stored array can be memory-mapped.
+
+    Returns:
+        tuple: (column metadata dict, array to save, JSON values or None)
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = list(series.cat.categories)
+        if all(isinstance(value, (str, bool, int, float)) for value in categories):
+            return {'kind': 'category'}, series.cat.codes.to_numpy().astype(np.int32), categories
+        return None, None, None
+
+    values = series.to_numpy()
+    if values.dtype.kind in 'biufc':
+        return {'kind': 'plain', 'dtype': values.dtype.str}, values, None
+    if values.dtype.kind == 'M':
+        return {'kind': 'datetime', 'dtype': str(values.dtype)}, values.view('int64'), None
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = list(uniques)
+    if all(isinstance(value, (str, bool, int, float)) for value in uniques):
+        return {'kind': 'codes'}, codes.astype(np.int32), uniques
+    return None, None, None
+
+def _column_from_arrays(column_meta, array, uniques, start, stop):
+    """Rebuild a slice of a column saved by _column_to_arrays
+
+    Plain, datetime and categorical columns stay views of the memory-mapped
+    array, so only the pages a screen reads are loaded; text columns are
+    rebuilt as object arrays.
+    """
+    kind = column_meta['kind']
+    view = np.asarray(array[start:stop])  # Plain ndarray whose base is the np.memmap
+    if kind == 'plain':
+        return view
+    if kind == 'datetime':
+        return view.view(column_meta['dtype'])
+    if kind == 'category':
+        return pd.Categorical.from_codes(view, categories=uniques)
+
+    # Code -1 marks a missing value and picks the trailing None
+    lookup = np.empty(len(uniques) + 1, dtype=object)
+    lookup[:-1] = uniques
+    lookup[-1] = None
+    return lookup[view]
+
+def load_chunk(entry, columns, chunk_number, chunk_meta):
+    """Load one chunk of a cache entry
+
+    Only the chunk's own metadata is needed, so chunks can be loaded in
+    other processes without shipping the meta of the whole sheet.
+
+    Args:
+        entry (str): Entry directory returned by SheetCache.read_entry
+        columns (list): meta['columns'] of the entry
+        chunk_number (int): Position of the chunk in the sheet
+        chunk_meta (dict): meta['chunks'][chunk_number] of the entry
+
+    Returns:
+        pd.DataFrame: The chunk, indexed by sheet row position
+    """
+    chunk_dir = os.path.join(entry, "chunk_{0:05d}".format(chunk_number))
+    rows = chunk_meta['rows']
+    data = {}
+    for position, column_meta in enumerate(chunk_meta['columns']):
+        array = np.load(os.path.join(chunk_dir, "c{0}.npy".format(position)), mmap_mode='r')
+        data[column_meta['name']] = _column_from_arrays(
+            column_meta, array, column_meta.get('values'), 0, rows
+        )
+    # copy=False keeps the memory-mapped columns instead of consolidating copies
+    chunk = pd.DataFrame(data, columns=columns, copy=False)
+    chunk.index = pd.RangeIndex(chunk_meta['start'], chunk_meta['start'] + rows)
+    return chunk
+
+class SheetCache:
+    """Content-addressed cache of parsed sheets stored as memory-mapped .npy columns
+
+    Each cache entry is a directory named after the upload's content hash
+    and the sheet name. It holds one sub-directory per parsed chunk with
+    one .npy file per column, plus a meta.json describing the columns.
+    Entries are written to a temporary directory and renamed into place
+    once complete, so a partially parsed sheet is never served.
+
+    Plain .npy files map straight into numpy arrays, so the cache needs
+    nothing beyond numpy. pyarrow is listed in requirements.txt for
+    Parquet output, but the cache does not use it; an install without it
+    keeps caching sheets, and only Parquet output fails, with an ImportError.
+    """
+
+    def __init__(self, cache_root):
+        """Initialize cache rooted at the given directory
+
+        Args:
+            cache_root (str): Directory holding cache entries
+        """
+        self.cache_root = cache_root
+
+    def entry_path(self, file_path, sheet_name):
+        """Return the entry directory for a sheet of the given file"""
+        sheet_key = hashlib.sha1(sheet_name.encode('utf-8')).hexdigest()[:12]
+        name = "{0}_{1}_v{2}".format(file_content_hash(file_path), sheet_key, CACHE_VERSION)
+        return os.path.join(self.cache_root, name)
+
+    def read_chunks(self, file_path, sheet_name):
+        """Yield cached chunks of a sheet, or None if the sheet is not cached
+
+        Args:
+            file_path (str): Path to the uploaded Excel file
+            sheet_name (str): Name of the sheet
+
+        Returns:
+            generator or None: Generator of DataFrame chunks on a cache hit
+        """
+        found = self.read_entry(file_path, sheet_name)
+        if found is None:
+            return None
+        return self._iter_entry(*found)
+
+    def read_entry(self, file_path, sheet_name):
+        """Locate a cached sheet so its chunks can be loaded one at a time with load_chunk
+
+        Args:
+            file_path (str): Path to the uploaded Excel file
+            sheet_name (str): Name of the sheet
+
+        Returns:
+            tuple or None: (entry directory, meta dict) on a cache hit
+        """
+        entry = self.entry_path(file_path, sheet_name)
+        meta_path = os.path.join(entry, META_FILE)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            os.utime(entry)  # Keep frequently reused entries from expiring
+        except (OSError, ValueError):
+            return None
+        _notify_entry(entry, False)
+        return entry, meta
+
+    def _iter_entry(self, entry, meta):
+        for chunk_number, chunk_meta in enumerate(meta['chunks']):
+            yield load_chunk(entry, meta['columns'], chunk_number, chunk_meta)
+
+    def store_chunks(self, file_path, sheet_name, chunks):
+        """Pass chunks through while writing them to the cache
+
+        The entry is only published when the chunk iterator is exhausted.
+        Chunks with a column that cannot be encoded disable caching for
+        this sheet but are still yielded unchanged.
+
+        Args:
+            file_path (str): Path to the uploaded Excel file
+            sheet_name (str): Name of the sheet
+            chunks (iterable): DataFrame chunks parsed from the sheet
+
+        Yields:
+            pd.DataFrame: The same chunks
+        """
+        entry = self.entry_path(file_path, sheet_name)
+        tmp_entry = "{0}.tmp{1}".format(entry, threading.get_ident())
+        meta = {'sheet': sheet_name, 'columns': None, 'chunks': []}
+        caching = True
+        try:
+            os.makedirs(tmp_entry, exist_ok=True)
+        except OSError as e:
+            print("Sheet cache disabled: {0}".format(e))
+            caching = False
+
+        try:
+            for chunk in chunks:
+                if caching:
+                    caching = self._write_chunk(tmp_entry, meta, chunk)
+                yield chunk
+
+            if caching:
+                with open(os.path.join(tmp_entry, META_FILE), 'w', encoding='utf-8') as f:
+                    json.dump(meta, f, ensure_ascii=False)
+                try:
+                    os.rename(tmp_entry, entry)
+                    _notify_entry(entry, True)
+                except OSError:
+                    pass  # Another request published the same entry first
+        finally:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+    def _write_chunk(self, tmp_entry, meta, chunk):
+        """Write one chunk into the temporary entry, return False if not cacheable"""
+        chunk_dir = os.path.join(tmp_entry, "chunk_{0:05d}".format(len(meta['chunks'])))
+        os.makedirs(chunk_dir, exist_ok=True)
+        columns_meta = []
+        for position, name in enumerate(chunk.columns):
+            column_meta, array, uniques = _column_to_arrays(chunk[name])
+            if column_meta is None:
+                return False
+            column_meta['name'] = name
+            if uniques is not None:
+                column_meta['values'] = uniques
+            np.save(os.path.join(chunk_dir, "c{0}.npy".format(position)), array)
+            columns_meta.append(column_meta)
+
+        if meta['columns'] is None:
+            meta['columns'] = list(chunk.columns)
+        meta['chunks'].append({
+            'rows': len(chunk),
+            'start': int(chunk.index[0]) if len(chunk) else 0,
+            'columns': columns_meta,
+        })
+        return True
+
+def remove_expired_entries(cache_root, max_age_seconds, now):
+    """Delete cache entries not used within the retention period
+
+    Args:
+        cache_root (str): Directory holding cache entries
+        max_age_seconds (float): Retention period in seconds
+        now (float): Current timestamp
+    """
+    if not os.path.isdir(cache_root):
+        return
+    for name in os.listdir(cache_root):
+        entry = os.path.join(cache_root, name)
+        if os.path.isdir(entry) and now - os.path.getmtime(entry) > max_age_seconds:
+            shutil.rmtree(entry, ignore_errors=True)
+            print("Deleted expired sheet cache: {0}".format(entry))
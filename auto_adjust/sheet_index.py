@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import weakref
+import threading
+import numpy as np
+import pandas as pd
+
+PORTFOLIO_COLUMN = '广告组合名称（仅供参考）'
+ENTITY_COLUMN = '实体层级'
+
+_frame_caches = {}
+_frame_caches_lock = threading.Lock()
+
+def frame_cache(data):
+    """Return a dict for structures derived from a parsed DataFrame
+
+    The dict lives as long as the DataFrame itself, so indexes and
+    partitions built for a chunk are shared by every screen that filters
+    that chunk and are released together with it.
+
+    Args:
+        data (pd.DataFrame): Parsed sheet or chunk
+
+    Returns:
+        dict: Cache dedicated to this DataFrame
+    """
+    key = id(data)
+    with _frame_caches_lock:
+        cache = _frame_caches.get(key)
+        if cache is None:
+            cache = {}
+            _frame_caches[key] = cache
+            weakref.finalize(data, _frame_caches.pop, key, None)
+    return cache
+
+def cached(data, name, builder):
+    """Get a derived structure from the frame cache, building it on first use
+
+    Args:
+        data (pd.DataFrame): Parsed sheet or chunk
+        name (str): Cache key of the structure
+        builder (callable): Called with data to build the structure
+
+    Returns:
+        object: The cached structure
+    """
+    cache = frame_cache(data)
+    if name not in cache:
+        # Concurrent builders may race; all callers end up with the first result
+        cache.setdefault(name, builder(data))
+    return cache[name]
+
+class GroupIndex:
+    """Row positions of a frame grouped by the values of one column
+
+    Rows are sorted once by value code; each value then owns a contiguous
+    slice of positions, so looking up any set of values costs one
+    dictionary lookup per value plus the number of matching rows.
+    """
+
+    def __init__(self, values):
+        """Build the index from a column
+
+        Args:
+            values (pd.Series): Column to group rows by
+        """
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            categories = values.cat.categories
+        else:
+            codes, categories = pd.factorize(values)
+
+        self.size = len(values)
+        self.categories = pd.Index(categories)
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.categories))
+        # Rows with a missing value have code -1 and sort to the front
+        self.positions = order[self.size - counts.sum():]
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def positions_for(self, names):
+        """Return the sorted row positions holding any of the values
+
+        Args:
+            names (list): Values to look up
+
+        Returns:
+            np.ndarray: Row positions
+        """
+        codes = self.categories.get_indexer(pd.unique(pd.Series(names, dtype=object)))
+        slices = [self.positions[self.offsets[code]:self.offsets[code + 1]] for code in codes if code >= 0]
+        if not slices:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(slices))
+
+    def mask_for(self, names):
+        """Return a boolean mask of the rows holding any of the values"""
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.positions_for(names)] = True
+        return mask
+
+def group_index(data, column):
+    """Get the GroupIndex of a column of a parsed frame, built once per frame"""
+    return cached(data, ('group_index', column), lambda frame: GroupIndex(frame[column]))
+
+def portfolio_index(data):
+    """Get the portfolio (广告组合名称) index of a parsed frame"""
+    return group_index(data, PORTFOLIO_COLUMN)
+
+def entity_rows(data, entity_level):
+    """Get the rows of one 实体层级 as a frame, partitioned once per parsed frame
+
+    The partition keeps the row labels of data and is shared by every
+    screen reading that entity level of the same frame.
+
+    Args:
+        data (pd.DataFrame): Parsed sheet or chunk
+        entity_level (str): Entity level like "商品广告" or "关键词"
+
+    Returns:
+        pd.DataFrame: Rows of data at that entity level
+    """
+    return cached(
+        data, ('entity_rows', entity_level),
+        lambda frame: frame.take(group_index(frame, ENTITY_COLUMN).positions_for([entity_level]))
+    )
+
+def parse_sku_list(sku_str):
+    """Split the comma-separated SKU field of the form into a list
+
+    Args:
+        sku_str (str): Comma-separated SKU values from frontend form
+
+    Returns:
+        list or None: Stripped SKU values, None when no SKU was entered
+    """
+    return [sku.strip() for sku in sku_str.split(",")] if sku_str else None
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+import os
+import config
+import sqlite3
+import threading
+import pandas as pd
+from contextlib import contextmanager
+from auto_adjust.schema import restore_output_types
+
+SNAPSHOT_DB_PATH = os.path.join(config.APP_DIR, 'snapshots', 'campaigns.sqlite3')  # Kept outside the upload folder
+SNAPSHOT_TIMEOUT = 30  # Seconds to wait for a concurrent writer
+
+# Sheet column -> table column of the stored campaign metrics
+SNAPSHOT_COLUMNS = {
+    '广告活动名称': 'campaign',
+    '广告组合名称（仅供参考）': 'portfolio',
+    '状态': 'state',
+    '每日预算': 'budget',
+    '展示量': 'impressions',
+    '点击量': 'clicks',
+    '花费': 'spend',
+    '销量': 'sales',
+    '订单数量': 'orders',
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaign_snapshots (
+    account TEXT NOT NULL,
+    snapshot_date TEXT NOT NULL,
+    campaign TEXT NOT NULL,
+    portfolio TEXT,
+    state TEXT,
+    budget REAL,
+    impressions INTEGER,
+    clicks INTEGER,
+    spend REAL,
+    sales REAL,
+    orders INTEGER,
+    PRIMARY KEY (account, snapshot_date, campaign)
+) WITHOUT ROWID
+"""
+
+class SnapshotStore:
+    """SQLite store of the 广告活动 rows of every parsed bulk file
+
+    Rows are keyed by account, snapshot date and campaign name, so a
+    period-over-period comparison is an indexed join on the primary key
+    instead of re-parsing last period's workbook.
+    """
+
+    _init_lock = threading.Lock()
+
+    def __init__(self, db_path=SNAPSHOT_DB_PATH):
+        """Initialize store, creating the database on first use
+
+        Args:
+            db_path (str): Path of the SQLite database file
+        """
+        self.db_path = db_path
+        with self._init_lock:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._connect() as connection:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection for one transaction; short-lived connections are safe across job threads"""
+        connection = sqlite3.connect(self.db_path, timeout=SNAPSHOT_TIMEOUT)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def save(self, account, snapshot_date, campaigns):
+        """Store the campaign rows of one bulk file, replacing an earlier snapshot of that date
+
+        Args:
+            account (str): Account the bulk file belongs to
+            snapshot_date (str): ISO date of the snapshot
+            campaigns (pd.DataFrame): 广告活动 rows of the bulk file
+
+        Returns:
+            int: Number of stored campaigns
+        """
+        columns = [column for column in SNAPSHOT_COLUMNS if column in campaigns.columns]
+        if '广告活动名称' not in columns:
+            return 0
+        rows = restore_output_types(campaigns[columns].drop_duplicates('广告活动名称', keep='last'))
+        rows = rows.astype(object).where(rows.notna(), None)
+        table_columns = [SNAPSHOT_COLUMNS[column] for column in columns]
+        statement = "INSERT OR REPLACE INTO campaign_snapshots (account, snapshot_date, {0}) VALUES (?, ?, {1})".format(
+            ", ".join(table_columns), ", ".join("?" * len(table_columns))
+        )
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM campaign_snapshots WHERE account = ? AND snapshot_date = ?", (account, snapshot_date)
+            )
+            connection.executemany(
+                statement,
+                ((account, snapshot_date) + row for row in rows.itertuples(index=False, name=None))
+            )
+        return len(rows)
+
+    def previous_date(self, account, snapshot_date):
+        """Latest stored snapshot date of the account before the given date, or None"""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT MAX(snapshot_date) FROM campaign_snapshots WHERE account = ? AND snapshot_date < ?",
+                (account, snapshot_date)
+            ).fetchone()
+        return row[0]
+
+    def campaign_totals(self, account, before_date):
+        """Sum the clicks, orders and sales of every campaign over its earlier snapshots
+
+        Args:
+            account (str): Account to read
+            before_date (str): ISO date; only snapshots before it are summed
+
+        Returns:
+            pd.DataFrame: 广告活动名称, 点击量, 订单数量 and 销量 per campaign
+        """
+        query = (
+            "SELECT campaign, SUM(clicks), SUM(orders), SUM(sales) FROM campaign_snapshots "
+            "WHERE account = ? AND snapshot_date < ? GROUP BY campaign"
+        )
+        with self._connect() as connection:
+            rows = connection.execute(query, (account, before_date)).fetchall()
+        return pd.DataFrame(rows, columns=['广告活动名称', '点击量', '订单数量', '销量'])
+
+    def compare(self, account, old_date, new_date, column='spend'):
+        """Join two snapshots of an account on campaign name
+
+        Args:
+            account (str): Account to compare
+            old_date (str): Date of the earlier snapshot
+            new_date (str): Date of the later snapshot
+            column (str): Metric to compare, a value of SNAPSHOT_COLUMNS
+
+        Returns:
+            pd.DataFrame: 广告活动名称 with <metric>_old and <metric>_new, named
+                after the sheet column of the metric
+        """
+        if column not in SNAPSHOT_COLUMNS.values():
+            raise ValueError("Unknown snapshot column: {0}".format(column))
+        sheet_column = next(name for name, table_column in SNAPSHOT_COLUMNS.items() if table_column == column)
+        query = (
+            "SELECT new.campaign, old.{0}, new.{0} FROM campaign_snapshots AS new "
+            "JOIN campaign_snapshots AS old "
+            "ON old.account = new.account AND old.snapshot_date = ? AND old.campaign = new.campaign "
+            "WHERE new.account = ? AND new.snapshot_date = ? ORDER BY new.campaign"
+        ).format(column)
+        with self._connect() as connection:
+            rows = connection.execute(query, (old_date, account, new_date)).fetchall()
+        return pd.DataFrame(
+            rows, columns=['广告活动名称', sheet_column + '_old', sheet_column + '_new']
+        )
@@ -1,63 +1,398 @@
 # -*- coding: utf-8 -*-
 import os
+import time
 import config
+import numpy as np
 import pandas as pd
+from datetime import date
 import auto_adjust.filters as filter
+from auto_adjust.sheet_cache import (
+    SheetCache, SHEET_CACHE_DIR, file_content_hash, record_content_hash, announce_entry
+)
+from auto_adjust.executor import ChunkExecutor, DEFAULT_BACKEND, process_pool
+from auto_adjust.schema import compact_chunks
+from auto_adjust.sheet_index import entity_rows
+from auto_adjust.snapshots import SnapshotStore, SNAPSHOT_COLUMNS
+from auto_adjust.metrics import stage_timer, collect_stages, record_stage, replay, current_rss_bytes, rss_growth
+from auto_adjust.dask_engine import map_partitions, use_dask, DEFAULT_ENGINE
+from auto_adjust.writer import write_results, output_extension, DEFAULT_OUTPUT_FORMAT
 from openpyxl import load_workbook
 from openpyxl.styles import numbers
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+PAIR_CHUNK_SIZE = 50000  # Chunk size used when loading whole sheets for comparison
+CAMPAIGN_SHEET = '商品推广活动'
+CAMPAIGN_ENTITY = '广告活动'
+PREFETCH_LABEL = 'prefetch'  # Screen label of sheets parsed ahead by start_prefetch
+
+def _sheet_header(header_row):
+    """Build DataFrame column names from the header row of a sheet
+
+    Mirrors the naming used by pd.read_excel: blank headers become
+    "Unnamed: <n>" and repeated headers get a ".<n>" suffix.
+
+    Args:
+        header_row (tuple): Raw cell values of the first row
+
+    Returns:
+        list: Column names with trailing blank headers removed
+    """
+    values = list(header_row)
+    while values and values[-1] is None:
+        values.pop()
+
+    columns = []
+    seen = {}
+    for position, value in enumerate(values):
+        name = "Unnamed: {0}".format(position) if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = "{0}.{1}".format(name, seen[name])
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+def _rows_to_frame(rows, columns, start):
+    """Convert buffered sheet rows into a typed DataFrame chunk
+
+    Args:
+        rows (list): Row tuples already trimmed to the header width
+        columns (list): Column names
+        start (int): Position of the first row in the sheet, used as index origin
+
+    Returns:
+        pd.DataFrame: Chunk indexed by sheet row position
+    """
+    chunk = pd.DataFrame.from_records(rows, columns=columns).infer_objects()
+    chunk.index = pd.RangeIndex(start, start + len(chunk))
+    # Empty cells are NaN and empty columns float64, as pd.read_excel parses them
+    for column in chunk.columns[chunk.dtypes == object]:
+        missing = chunk[column].isna()
+        if missing.all():
+            chunk[column] = np.nan
+        elif missing.any():
+            chunk[column] = chunk[column].where(~missing, np.nan)
+    return chunk
 
 def read_excel_in_chunks(file_path, sheet_name, chunk_size):
-    """Read Excel file in chunks for better memory management
-    
+    """Stream an Excel sheet and yield it in chunks while it is being parsed
+
+    The sheet is read with openpyxl in read-only mode, so only the rows of
+    the current chunk are held in memory. Each chunk keeps the sheet row
+    positions as its index, like slices of a fully loaded sheet would.
+    Blank rows between data rows are kept and trailing ones dropped, as
+    pd.read_excel does.
+
     Args:
         file_path (str): Path to the Excel file
         sheet_name (str): Name of the sheet to read
         chunk_size (int): Number of rows to read at once
-        
+
     Yields:
         pd.DataFrame: Chunks of the Excel file
     """
-    df = pd.read_excel(file_path, sheet_name=sheet_name)
-    for start in range(0, len(df), chunk_size):
-        yield df.iloc[start:start + chunk_size]
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header_row = next(rows, None)
+        if header_row is None:
+            return
+        columns = _sheet_header(header_row)
+        width = len(columns)
+
+        buffer = []
+        start = 0
+        blank_rows = 0  # Blank rows seen since the last data row
+        empty_row = (None,) * width
+        for row in rows:
+            row = row[:width]
+            if all(value is None for value in row):
+                blank_rows += 1
+                continue
+            if len(row) < width:
+                row = row + (None,) * (width - len(row))
+            buffer.extend([empty_row] * blank_rows)
+            blank_rows = 0
+            buffer.append(row)
+            if len(buffer) >= chunk_size:
+                yield _rows_to_frame(buffer, columns, start)
+                start += len(buffer)
+                buffer = []
+
+        if buffer:
+            yield _rows_to_frame(buffer, columns, start)
+    finally:
+        workbook.close()
+
+def has_sheet(file_path, sheet_name):
+    """Check whether a workbook contains a sheet without parsing any rows"""
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        return sheet_name in workbook.sheetnames
+    finally:
+        workbook.close()
+
+def read_sheet_in_chunks(file_path, sheet_name, chunk_size, cache=None):
+    """Read a sheet in chunks, serving it from the parsed-sheet cache when possible
+
+    Freshly parsed chunks are converted to the compact column types of
+    SP_SCHEMA before they are cached, so cache hits load compact columns.
 
-def read_excel_in_chunks_pair(file_path_old, file_path_new, sheet_name):
-    """Read and match data from old and new Excel files
-    
     Args:
-        file_path_old (str): Path to the old Excel file
-        file_path_new (str): Path to the new Excel file
+        file_path (str): Path to the Excel file
         sheet_name (str): Name of the sheet to read
+        chunk_size (int): Number of rows per chunk when parsing the workbook
+        cache (SheetCache, optional): Cache of previously parsed sheets
+
+    Returns:
+        iterable: DataFrame chunks of the sheet
+    """
+    chunks = compact_chunks(read_excel_in_chunks(file_path, sheet_name, chunk_size), sheet_name)
+    if cache is None:
+        return chunks
+    cached = cache.read_chunks(file_path, sheet_name)
+    if cached is not None:
+        print("Loaded sheet '{0}' from cache".format(sheet_name))
+        return cached
+    return cache.store_chunks(file_path, sheet_name, chunks)
+
+def read_campaign_rows(file_path, cache=None):
+    """Read the 广告活动 rows of the campaign sheet of a bulk file
+    
+    Args:
+        file_path (str): Path to the Excel file
+        cache (SheetCache, optional): Cache of previously parsed sheets
         
     Returns:
-        tuple: (matched_old_df, filtered_new_df) DataFrames containing matched data
+        pd.DataFrame: Campaign level rows
     """
-    df_old = pd.read_excel(file_path_old, sheet_name=sheet_name)
-    df_new = pd.read_excel(file_path_new, sheet_name=sheet_name)
+    campaigns = [
+        entity_rows(chunk, CAMPAIGN_ENTITY)
+        for chunk in read_sheet_in_chunks(file_path, CAMPAIGN_SHEET, PAIR_CHUNK_SIZE, cache)
+    ]
+    return pd.concat(campaigns) if campaigns else pd.DataFrame(columns=['广告活动名称', '花费'])
 
-    # Filter new data for campaign level
-    filtered_new = df_new[df_new['实体层级'] == '广告活动']
+# Single-sheet SP screens: name -> (sheet, filter function, threshold names).
+# sp_all_screen evaluates them in this order on shared chunks; screens edit
+# copies of their rows, so the order does not change any screen's result.
+SP_SCREENS = {
+    'SP无效筛选': ('商品推广活动', filter.sp_invalid, ('click',)),
+    'SP投放关键词筛选': ('商品推广活动', filter.sp_keyword, ('click', 'click_rate', 'order', 'conversion')),
+    'SP商品筛选': ('商品推广活动', filter.sp_product, ('click', 'order', 'acos', 'conversion')),
+    'SP投放商品筛选': ('商品推广活动', filter.sp_ad, ('spend', 'order', 'acos', 'conversion')),
+    'SP竞价调整': ('商品推广活动', filter.sp_pos, ('spend', 'order', 'acos', 'conversion')),
+    'SP搜索词筛选': ('商品推广搜索词报告', filter.sp_word, ('click', 'click_rate', 'order', 'conversion')),
+}
 
-    # Match old data with filtered new data
-    matched_old = df_old[df_old['广告活动名称'].isin(filtered_new['广告活动名称'])]
+def _filter_chunk(chunk_df, screens):
+    """Apply each screen's filter function to one chunk, in order
+    
+    Stage timings are collected rather than recorded, as this may run in
+    a worker process; the caller passes them to metrics.replay.
+    
+    Args:
+        chunk_df (pd.DataFrame): Chunk of the sheet
+        screens (list): (name, filter function, filter arguments) tuples
+        
+    Returns:
+        tuple: Screen name to filter result (None when nothing matched),
+            and the stage records of the chunk
+    """
+    results = {}
+    records = []
+    for name, filter_func, filter_args in screens:
+        with collect_stages(name, records):
+            with stage_timer('filter', rows_in=len(chunk_df)) as timer:
+                results[name] = filter_func(chunk_df, **filter_args)
+                timer.rows_out = 0 if results[name] is None else len(results[name])
+    return results, records
 
-    # Align data using campaign names as index
-    filtered_new = filtered_new.set_index('广告活动名称').loc[matched_old['广告活动名称']].reset_index()
-    matched_old = matched_old.set_index('广告活动名称').loc[filtered_new['广告活动名称']].reset_index()
+def _snapshot_rows(chunk_df):
+    """Snapshot columns of the campaign rows of a chunk"""
+    rows = entity_rows(chunk_df, CAMPAIGN_ENTITY)
+    return rows[[column for column in SNAPSHOT_COLUMNS if column in rows.columns]]
 
-    return matched_old, filtered_new
+def _filter_partition(chunk_df, screens, snapshot):
+    """Dask engine task: _filter_chunk plus the snapshot rows of the chunk when requested"""
+    results, records = _filter_chunk(chunk_df, screens)
+    return results, records, _snapshot_rows(chunk_df) if snapshot else None
 
-class SPModule:
-    """Main class for handling SP (Sponsored Products) related operations"""
+def prefetch_sheets(file_path, sheet_names, chunk_size=50000, content_hash=None):
+    """Parse sheets into the sheet cache without keeping their chunks
+    
+    Runs in a separate process started by ScreenModule.start_prefetch.
+    Sheets that are already cached or missing from the workbook are
+    skipped.
+    
+    Args:
+        file_path (str): Path to the Excel file
+        sheet_names (list): Sheets to parse
+        chunk_size (int): Number of rows per chunk
+        content_hash (str, optional): SHA-256 of the file, known to the
+            caller, so the file is not hashed again
+        
+    Returns:
+        tuple: Stage records of the parsing, and the cache entries it published
+    """
+    if content_hash is not None:
+        record_content_hash(file_path, content_hash)
+    cache = SheetCache(os.path.join(os.path.dirname(file_path), SHEET_CACHE_DIR))
+    records = []
+    entries = []
+    with collect_stages(PREFETCH_LABEL, records):
+        for sheet_name in sheet_names:
+            if cache.read_entry(file_path, sheet_name) is not None or not has_sheet(file_path, sheet_name):
+                continue
+            with stage_timer('parse') as timer:
+                timer.rows_out = sum(
+                    len(chunk) for chunk in read_sheet_in_chunks(file_path, sheet_name, chunk_size, cache)
+                )
+                timer.rows_in = timer.rows_out
+            found = cache.read_entry(file_path, sheet_name)
+            if found is not None:
+                entries.append(found[0])
+    return records, entries
+
+class ScreenModule:
+    """Chunked screening of the sheets of a bulk file
+    
+    Subclasses list their screens in SCREENS as name -> (sheet, filter
+    function, threshold names); parsing, the execution backend, the engine
+    and result writing are shared by every ad type.
+    """
+    
+    SCREENS = {}
     
-    def __init__(self, file_path):
-        """Initialize SP module with file path
+    def __init__(self, file_path, params=None, backend=DEFAULT_BACKEND, output_format=DEFAULT_OUTPUT_FORMAT,
+                 progress=None, engine=DEFAULT_ENGINE):
+        """Initialize module with file path
         
         Args:
             file_path (str): Path to the input file
+            params (config.ScreenParams, optional): Thresholds and SKU list of this
+                run, defaults to the values in config
+            backend (str): Chunk execution backend: thread, process or inline
+            output_format (str): Result file format: xlsx, csv or parquet
+            progress (callable, optional): Called as progress(stage, **counters)
+                while sheets are parsed, filtered and written
+            engine (str): pandas streams chunks through the executor; dask
+                filters the cached sheet out of core; auto picks dask for
+                files above DASK_FILE_SIZE_THRESHOLD
         """
         self.file_path = file_path
+        self.params = params if params is not None else config.screen_params()
+        self.output_format = output_format
+        self.progress = progress
+        self.executor = ChunkExecutor(backend)
+        self.engine = engine
+        self.sheet_cache = SheetCache(os.path.join(os.path.dirname(file_path), SHEET_CACHE_DIR))
+        self._snapshots = None  # Opened by the snapshots property, only by runs naming an account
+        self.prefetch = None  # Future of start_prefetch, waited for before the first screen
+
+    @property
+    def snapshots(self):
+        """Snapshot store of the app, opened on first use
+
+        Only runs naming an account read or write snapshots, so other runs
+        never open the database or create its folder.
+        """
+        if self._snapshots is None:
+            self._snapshots = SnapshotStore()
+        return self._snapshots
+
+    @snapshots.setter
+    def snapshots(self, store):
+        self._snapshots = store
+
+    def _report(self, stage, **info):
+        """Forward stage progress to the progress callback, if any"""
+        if self.progress is not None:
+            self.progress(stage, **info)
+
+    def _reported_chunks(self, chunks, sheet_name, label):
+        """Pass chunks through while reporting parse progress and timing the parser
+        
+        Only the time spent producing chunks counts as parse time, not
+        the time the consumer spends between them.
+        """
+        chunks = iter(chunks)
+        started_rss = current_rss_bytes()
+        rows = 0
+        seconds = 0.0
+        number = 0
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            seconds += time.perf_counter() - started
+            if chunk is None:
+                break
+            number += 1
+            rows += len(chunk)
+            self._report('parse', sheet=sheet_name, chunks=number, rows=rows)
+            yield chunk
+        record_stage('parse', label, seconds, rows, rows, rss_growth(started_rss))
+
+    def start_prefetch(self):
+        """Start parsing the sheets of SCREENS into the sheet cache in another process
+        
+        Called while another module screens its own sheets, so both
+        sheets are parsed at the same time; the screens of this module
+        then load their sheet from the cache. Nothing is started with the
+        inline backend, which keeps a run in one process. The process is
+        not forked, as this runs in a job thread while other threads work.
+        """
+        if self.executor.backend == 'inline' or self.prefetch is not None:
+            return
+        sheet_names = list(dict.fromkeys(sheet_name for sheet_name, _, _ in self.SCREENS.values()))
+        pool = process_pool(1)
+        self.prefetch = pool.submit(
+            prefetch_sheets, self.file_path, sheet_names, content_hash=file_content_hash(self.file_path)
+        )
+        pool.shutdown(wait=False)
+
+    def _finish_prefetch(self):
+        """Wait for start_prefetch, recording its stages and registering its cache entries"""
+        if self.prefetch is None:
+            return
+        future, self.prefetch = self.prefetch, None
+        try:
+            records, entries = future.result()
+        except Exception as e:
+            print("Prefetching sheets failed, parsing them now: {0}".format(e))
+            return
+        replay(records)
+        for entry in entries:
+            announce_entry(entry)
+
+    def _read_sheet(self, sheet_name, label):
+        """Chunks of a whole sheet, from the sheet cache when it was parsed before
+        
+        For modules that aggregate over a sheet instead of filtering it
+        chunk by chunk; parse progress and metrics are reported under label.
+        """
+        return self._reported_chunks(
+            read_sheet_in_chunks(self.file_path, sheet_name, PAIR_CHUNK_SIZE, self.sheet_cache), sheet_name, label
+        )
+
+    def _snapshot_date(self):
+        """ISO date the campaign rows of this run are stored under"""
+        return self.params.snapshot_date or date.today().isoformat()
+
+    def _snapshot_chunks(self, chunks, sheet_name):
+        """Pass chunks through, storing the campaign rows of the campaign sheet as a snapshot
+        
+        Snapshots are only stored for runs naming their account, so files
+        of different sellers never end up in one history.
+        """
+        if sheet_name != CAMPAIGN_SHEET or not self.params.account:
+            yield from chunks
+            return
+        campaigns = []
+        for chunk in chunks:
+            campaigns.append(_snapshot_rows(chunk))
+            yield chunk
+        if campaigns:
+            self.snapshots.save(self.params.account, self._snapshot_date(), pd.concat(campaigns))
 
     def _process_chunks(self, sheet_name, filter_func, chunk_size=50000, **filter_args):
         """Process Excel data in chunks using specified filter function
@@ -71,19 +406,119 @@ class SPModule:
         Returns:
             pd.DataFrame: Concatenated results from all chunks
         """
-        condition_chunks = []
-        with ThreadPoolExecutor(max_workers=16) as executor:
-            futures = []
-            for chunk_df in read_excel_in_chunks(self.file_path, sheet_name, chunk_size):
-                future = executor.submit(filter_func, chunk_df, **filter_args)
-                futures.append(future)
+        results = self._process_chunks_multi(
+            sheet_name, [(filter_func.__name__, filter_func, filter_args)], chunk_size
+        )
+        return results[filter_func.__name__]
+
+    def _process_chunks_multi(self, sheet_name, screens, chunk_size=50000, label=None):
+        """Run several filter functions over one pass of the sheet
+        
+        Each chunk is parsed once and handed to every screen in order, so
+        screens share the parsed rows instead of re-reading the workbook.
+        
+        Args:
+            sheet_name (str): Name of the sheet to process
+            screens (list): (name, filter function, filter arguments) tuples
+            chunk_size (int): Size of chunks to process
+            label (str, optional): Screen label of the parse metrics, defaults
+                to the name of the first screen
+            
+        Returns:
+            dict: Screen name to concatenated results from all chunks
+        """
+        label = label or screens[0][0]
+        self._finish_prefetch()
+        if use_dask(self.engine, self.file_path):
+            partition_results = self._filter_partitions(sheet_name, screens, chunk_size, label)
+            if partition_results is not None:
+                return self._concat_results(screens, partition_results)
 
-            for future in as_completed(futures):
-                result = future.result()
+        chunks = self._snapshot_chunks(self._reported_chunks(
+            read_sheet_in_chunks(self.file_path, sheet_name, chunk_size, self.sheet_cache), sheet_name, label
+        ), sheet_name)
+        matched = 0
+        chunk_results = []
+        # Results come back in sheet order regardless of the backend
+        for number, (results, records) in enumerate(self.executor.map(_filter_chunk, chunks, screens), 1):
+            replay(records)
+            chunk_results.append(results)
+            matched += sum(len(result) for result in results.values() if result is not None)
+            self._report('filter', sheet=sheet_name, chunks=number, matched=matched)
+        return self._concat_results(screens, chunk_results)
+
+    def _filter_partitions(self, sheet_name, screens, chunk_size, label):
+        """Dask engine: filter the sheet's cache entry partition by partition
+        
+        A sheet that is not cached yet is converted first: it is parsed
+        into the sheet cache without keeping the chunks, so memory stays
+        bounded by one chunk during parsing and by the running tasks while
+        filtering. Campaign rows for the snapshot are collected by the same
+        tasks.
+        
+        Returns:
+            list: Screen name to result dict of every partition, in sheet
+                order, or None if the sheet cannot be cached
+        """
+        found = self.sheet_cache.read_entry(self.file_path, sheet_name)
+        if found is None:
+            print("Converting sheet '{0}' to partitioned storage".format(sheet_name))
+            chunks = read_sheet_in_chunks(self.file_path, sheet_name, chunk_size, self.sheet_cache)
+            for _ in self._reported_chunks(chunks, sheet_name, label):
+                pass
+            found = self.sheet_cache.read_entry(self.file_path, sheet_name)
+            if found is None:
+                print("Sheet '{0}' could not be cached, filtering it in memory".format(sheet_name))
+                return None
+        entry, meta = found
+
+        progress = {'chunks': 0, 'matched': 0}
+
+        def partition_done(chunk_number, result):
+            results, records, _ = result
+            replay(records)
+            progress['chunks'] += 1
+            progress['matched'] += sum(len(frame) for frame in results.values() if frame is not None)
+            self._report('filter', sheet=sheet_name, **progress)
+
+        snapshot = sheet_name == CAMPAIGN_SHEET and bool(self.params.account)
+        partitions = map_partitions(
+            entry, meta, _filter_partition, (screens, snapshot),
+            self.executor.backend, self.executor.max_workers, partition_done
+        )
+        if snapshot and partitions:
+            self.snapshots.save(
+                self.params.account, self._snapshot_date(), pd.concat([rows for _, _, rows in partitions])
+            )
+        return [results for results, _, _ in partitions]
+
+    def _concat_results(self, screens, chunk_results):
+        """Concatenate the per-chunk results of each screen
+        
+        Args:
+            screens (list): (name, filter function, filter arguments) tuples
+            chunk_results (list): Screen name to result dict of every chunk
+            
+        Returns:
+            dict: Screen name to concatenated results from all chunks
+        """
+        condition_chunks = {name: [] for name, _, _ in screens}
+        for results in chunk_results:
+            for name, result in results.items():
                 if result is not None:
-                    condition_chunks.append(result)
+                    condition_chunks[name].append(result)
+        return {
+            name: pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+            for name, chunks in condition_chunks.items()
+        }
 
-        return pd.concat(condition_chunks, ignore_index=True) if condition_chunks else pd.DataFrame()
+    def _output_path(self, suffix, sheet_count=1):
+        """Build the result file path for the given suffix next to the input file"""
+        upload_dir = os.path.dirname(self.file_path)
+        base_name = os.path.basename(self.file_path).rsplit('.', 1)[0]
+        extension = output_extension(self.output_format, sheet_count)
+        new_file_name = "{0}_{1}.{2}".format(base_name, suffix, extension)
+        return os.path.join(upload_dir, new_file_name)
 
     def _save_results(self, data, suffix):
         """Save processed data to new Excel file
@@ -95,120 +530,103 @@ class SPModule:
         Returns:
             str: Path to saved file
         """
-        upload_dir = os.path.dirname(self.file_path)
-        base_name = os.path.basename(self.file_path).rsplit('.', 1)[0]
-        new_file_name = "{0}_{1}.xlsx".format(base_name, suffix)
-        output_file_path = os.path.join(upload_dir, new_file_name)
+        output_file_path = self._output_path(suffix)
         
         if not data.empty:
-            self.save_modified_rows(data, output_file_path)
+            self.save_modified_sheets({'Sheet1': data}, output_file_path, suffix)
             return output_file_path
         else:
             print("No matching data found for {0}".format(suffix))
             return None
 
-    def sp_product_screen(self):
-        """Screen products based on specified criteria"""
-        data = self._process_chunks(
-            '商品推广活动',
-            filter.sp_product,
-            click=config.click,
-            order=config.order,
-            acos=config.acos,
-            conversion=config.conversion,
-            sku=config.sku
-        )
-        return self._save_results(data, 'SP商品筛选')
-
-    def sp_advertise_screen(self):
-        """Screen advertising campaigns based on specified criteria"""
-        data = self._process_chunks(
-            '商品推广活动',
-            filter.sp_ad,
-            spend=config.spend,
-            order=config.order,
-            acos=config.acos,
-            conversion=config.conversion,
-            sku=config.sku
-        )
-        return self._save_results(data, 'SP投放商品筛选')
+    def _screen_args(self, threshold_names):
+        """Collect filter arguments for a screen from the run parameters
+        
+        Args:
+            threshold_names (tuple): Names of the thresholds the screen uses
+            
+        Returns:
+            dict: Keyword arguments for the filter function
+        """
+        filter_args = {name: getattr(self.params, name) for name in threshold_names}
+        filter_args['sku_str'] = self.params.sku
+        return filter_args
 
-    def sp_pos_screen(self):
-        """Screen and adjust bid positions based on specified criteria"""
-        data = self._process_chunks(
-            '商品推广活动',
-            filter.sp_pos,
-            spend=config.spend,
-            order=config.order,
-            acos=config.acos,
-            conversion=config.conversion,
-            sku=config.sku
-        )
-        return self._save_results(data, 'SP竞价调整')
+    def _run_screen(self, screen_name):
+        """Run a single screen from SCREENS and save its results
+        
+        Args:
+            screen_name (str): Screen name, also used as output file suffix
+            
+        Returns:
+            str: Path to saved file
+        """
+        sheet_name, filter_func, threshold_names = self.SCREENS[screen_name]
+        screens = [(screen_name, filter_func, self._screen_args(threshold_names))]
+        data = self._process_chunks_multi(sheet_name, screens)[screen_name]
+        return self._save_results(data, screen_name)
 
-    def sp_word_screen(self):
-        """Screen search terms based on specified criteria"""
-        data = self._process_chunks(
-            '商品推广搜索词报告',
-            filter.sp_word,
-            click=config.click,
-            click_rate=config.click_rate,
-            order=config.order,
-            conversion=config.conversion,
-            sku=config.sku
-        )
-        return self._save_results(data, 'SP搜索词筛选')
+    def _run_all_screens(self, label):
+        """Run every screen in SCREENS and save them as one workbook
+        
+        Each sheet is parsed once; all screens reading it are evaluated on
+        the same chunks. The workbook gets one sheet per screen.
+        
+        Args:
+            label (str): Output file suffix and metrics label
+            
+        Returns:
+            str: Path to saved file
+        """
+        screens_by_sheet = {}
+        for screen_name, (sheet_name, filter_func, threshold_names) in self.SCREENS.items():
+            screens_by_sheet.setdefault(sheet_name, []).append(
+                (screen_name, filter_func, self._screen_args(threshold_names))
+            )
 
-    def sp_keyword_screen(self):
-        """Screen keywords based on specified criteria"""
-        data = self._process_chunks(
-            '商品推广活动',
-            filter.sp_keyword,
-            click=config.click,
-            click_rate=config.click_rate,
-            order=config.order,
-            conversion=config.conversion,
-            sku=config.sku
-        )
-        return self._save_results(data, 'SP投放关键词筛选')
+        results = {}
+        for sheet_name, screens in screens_by_sheet.items():
+            results.update(self._process_chunks_multi(sheet_name, screens, label=label))
 
-    def sp_invalid_screen(self):
-        """Screen invalid campaigns based on specified criteria"""
-        data = self._process_chunks(
-            '商品推广活动',
-            filter.sp_invalid,
-            click=config.click,
-            sku=config.sku
-        )
-        return self._save_results(data, 'SP无效筛选')
+        sheets = {name: results[name] for name in self.SCREENS if not results[name].empty}
+        if not sheets:
+            print("No matching data found for {0}".format(label))
+            return None
+        output_file_path = self._output_path(label, len(sheets))
+        self.save_modified_sheets(sheets, output_file_path, label)
+        return output_file_path
 
-    def sp_descent_screen(self, file_path_old, file_path_new):
-        """Screen campaigns with decreasing spend
+    def save_modified_rows(self, modified_rows, output_file_path):
+        """Save modified rows to new file in the selected output format
         
         Args:
-            file_path_old (str): Path to old data file
-            file_path_new (str): Path to new data file
+            modified_rows (pd.DataFrame): Data to save
+            output_file_path (str): Path to save file
         """
-        old_chunk, new_chunk = read_excel_in_chunks_pair(file_path_old, file_path_new, '商品推广活动')
-        write_content = filter.sp_descent(old_chunk, new_chunk, config.spend, config.sku)
-        return self._save_results(write_content, 'SP花费下降')
+        self.save_modified_sheets({'Sheet1': modified_rows}, output_file_path)
 
-    def save_modified_rows(self, modified_rows, output_file_path):
-        """Save modified rows to new Excel file
+    def save_modified_sheets(self, sheets, output_file_path, screen=''):
+        """Save several result sets to one file, one sheet each
         
         Args:
-            modified_rows (pd.DataFrame): Data to save
+            sheets (dict): Sheet name to DataFrame
             output_file_path (str): Path to save file
+            screen (str): Screen label of the write metrics
+            
+        Raises:
+            Exception: Whatever the writer raised, so the run is recorded as failed
         """
+        rows = sum(len(frame) for frame in sheets.values())
+        self._report('write', file=os.path.basename(output_file_path), rows=rows, done=False)
         try:
-            modified_rows.to_excel(output_file_path, index=False, engine="openpyxl")
+            with stage_timer('write', screen, rows) as timer:
+                write_results(sheets, output_file_path, self.output_format)
+                timer.rows_out = rows
+            self._report('write', done=True)
             print("Modified data saved to: {0}".format(output_file_path))
         except Exception as e:
             print("Error saving file: {0}".format(e))
-
-    def adjust_bid(self):
-        """Default function for bid adjustment"""
-        print("Running default bid adjustment for SP campaigns")
+            raise
 
     def call_function(self, function_name, *args):
         """Dynamically call specified function with arguments
@@ -219,11 +637,93 @@ class SPModule:
         """
         func = getattr(self, function_name, None)
         if callable(func):
-            if function_name == 'sp_descent_screen':
-                if len(args) == 2:
-                    return func(args[0], args[1])
-                print("Error: sp_descent_screen requires two file paths")
-            else:
-                return func()
+            return func(*args)
         else:
             print("Function '{0}' not found".format(function_name))
+
+class SPModule(ScreenModule):
+    """Main class for handling SP (Sponsored Products) related operations"""
+    
+    SCREENS = SP_SCREENS
+    
+    def sp_product_screen(self):
+        """Screen products based on specified criteria"""
+        return self._run_screen('SP商品筛选')
+
+    def sp_advertise_screen(self):
+        """Screen advertising campaigns based on specified criteria"""
+        return self._run_screen('SP投放商品筛选')
+
+    def sp_pos_screen(self):
+        """Screen and adjust bid positions based on specified criteria"""
+        return self._run_screen('SP竞价调整')
+
+    def sp_word_screen(self):
+        """Screen search terms based on specified criteria"""
+        return self._run_screen('SP搜索词筛选')
+
+    def sp_keyword_screen(self):
+        """Screen keywords based on specified criteria"""
+        return self._run_screen('SP投放关键词筛选')
+
+    def sp_invalid_screen(self):
+        """Screen invalid campaigns based on specified criteria"""
+        return self._run_screen('SP无效筛选')
+
+    def sp_all_screen(self):
+        """Run every single-sheet SP screen and save them as one workbook
+        
+        Returns:
+            str: Path to saved file
+        """
+        return self._run_all_screens('SP全部筛选')
+
+    def sp_descent_screen(self, file_path_old=None, file_path_new=None):
+        """Screen campaigns with decreasing spend
+        
+        When the run names an account, the campaigns of the new file are
+        stored as its snapshot. Without an old file they are compared with
+        the latest earlier snapshot of the account, so only the new file
+        has to be uploaded.
+        
+        Args:
+            file_path_old (str, optional): Path to old data file
+            file_path_new (str, optional): Path to new data file, defaults to the module's file
+            
+        Raises:
+            ValueError: If there is neither an old file nor an account to
+                read snapshots of
+        """
+        account = self.params.account
+        if not file_path_old and not account:
+            raise ValueError("SP花费下降 needs an old file or an account whose snapshots to compare with")
+        new_date = self._snapshot_date()
+        with collect_stages('SP花费下降'):
+            with stage_timer('parse') as timer:
+                new_campaigns = read_campaign_rows(file_path_new or self.file_path, self.sheet_cache)
+                timer.rows_in = timer.rows_out = len(new_campaigns)
+            if account:
+                self.snapshots.save(account, new_date, new_campaigns)
+
+            if file_path_old:
+                with stage_timer('parse') as timer:
+                    old_campaigns = read_campaign_rows(file_path_old, self.sheet_cache)
+                    timer.rows_in = timer.rows_out = len(old_campaigns)
+                with stage_timer('filter', rows_in=len(new_campaigns)) as timer:
+                    write_content = filter.sp_descent(old_campaigns, new_campaigns, self.params.spend, self.params.sku)
+                    timer.rows_out = len(write_content)
+            else:
+                old_date = self.snapshots.previous_date(account, new_date)
+                if old_date is None:
+                    print("No snapshot of account '{0}' before {1}".format(account, new_date))
+                    return None
+                print("Comparing with snapshot of {0}".format(old_date))
+                with stage_timer('filter', rows_in=len(new_campaigns)) as timer:
+                    merged = self.snapshots.compare(account, old_date, new_date, 'spend')
+                    write_content = filter.spend_descent(merged, self.params.spend, self.params.sku)
+                    timer.rows_out = len(write_content)
+        return self._save_results(write_content, 'SP花费下降')
+
+    def adjust_bid(self):
+        """Default function for bid adjustment"""
+        print("Running default bid adjustment for SP campaigns")
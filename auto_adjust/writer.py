@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import os
+import zipfile
+from openpyxl import Workbook
+from auto_adjust.schema import restore_output_types
+
+OUTPUT_FORMATS = ('xlsx', 'csv', 'parquet')
+DEFAULT_OUTPUT_FORMAT = 'xlsx'
+WRITE_BATCH_ROWS = 10000  # Rows converted to cell values at once
+
+def output_extension(output_format, sheet_count=1):
+    """File extension of a result file
+
+    Formats without multiple sheets write one file per sheet, bundled in a
+    zip archive when there is more than one sheet.
+
+    Args:
+        output_format (str): One of OUTPUT_FORMATS
+        sheet_count (int): Number of sheets in the result
+
+    Returns:
+        str: File extension without the dot
+    """
+    if output_format == 'xlsx' or sheet_count == 1:
+        return output_format
+    return 'zip'
+
+def _batches(frame):
+    """Yield consecutive row slices of at most WRITE_BATCH_ROWS rows"""
+    for start in range(0, len(frame), WRITE_BATCH_ROWS):
+        yield frame.iloc[start:start + WRITE_BATCH_ROWS]
+
+def _write_xlsx(sheets, output_path):
+    """Write sheets with openpyxl's write-only mode, which streams rows to disk"""
+    workbook = Workbook(write_only=True)
+    for sheet_name, frame in sheets.items():
+        worksheet = workbook.create_sheet(title=sheet_name)
+        worksheet.append([str(column) for column in frame.columns])
+        for batch in _batches(frame):
+            cells = batch.astype(object).where(batch.notna(), None)
+            for row in cells.itertuples(index=False, name=None):
+                worksheet.append(row)
+    workbook.save(output_path)
+
+def _write_csv(frame, output_path):
+    """Write a frame as CSV batch by batch; utf-8-sig keeps Chinese headers readable in Excel"""
+    with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+        if frame.empty:
+            frame.to_csv(f, index=False)
+        for number, batch in enumerate(_batches(frame)):
+            batch.to_csv(f, index=False, header=number == 0)
+
+def _write_parquet(frame, output_path):
+    """Write a frame as Parquet row group by row group (requires pyarrow)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet output requires the pyarrow package")
+
+    writer = None
+    try:
+        for batch in _batches(frame):
+            table = pa.Table.from_pandas(batch, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema)
+            writer.write_table(table)
+        if writer is None:
+            pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), output_path)
+    finally:
+        if writer is not None:
+            writer.close()
+
+SINGLE_SHEET_WRITERS = {
+    'csv': _write_csv,
+    'parquet': _write_parquet,
+}
+
+def write_results(sheets, output_path, output_format=DEFAULT_OUTPUT_FORMAT):
+    """Write screen results in the requested format
+
+    Args:
+        sheets (dict): Sheet name to DataFrame
+        output_path (str): Path of the result file
+        output_format (str): One of OUTPUT_FORMATS
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError("Unknown output format: {0}".format(output_format))
+    sheets = {name: restore_output_types(frame) for name, frame in sheets.items()}
+
+    if output_format == 'xlsx':
+        _write_xlsx(sheets, output_path)
+        return
+
+    write_sheet = SINGLE_SHEET_WRITERS[output_format]
+    if len(sheets) == 1:
+        write_sheet(next(iter(sheets.values())), output_path)
+        return
+
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for sheet_name, frame in sheets.items():
+            part_path = "{0}.{1}.{2}".format(output_path, sheet_name, output_format)
+            try:
+                write_sheet(frame, part_path)
+                archive.write(part_path, "{0}.{1}".format(sheet_name, output_format))
+            finally:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+
+def bundle_results(paths, output_path):
+    """Bundle result files of several modules into one zip archive
+
+    The bundled files are deleted, so only the archive has to be tracked
+    and downloaded.
+
+    Args:
+        paths (list): Result file paths
+        output_path (str): Path of the zip archive
+
+    Returns:
+        str: output_path
+    """
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for path in paths:
+            archive.write(path, os.path.basename(path))
+    for path in paths:
+        os.remove(path)
+    return output_path
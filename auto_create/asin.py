@@ -1,3 +1,132 @@
-class ASINModule:
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+from auto_adjust.sp import ScreenModule, has_sheet, CAMPAIGN_SHEET
+from auto_adjust.sheet_index import entity_rows, parse_sku_list
+from auto_create.keyword import (
+    SEARCH_TERM_SHEET, GROUP_COLUMNS, HARVEST_MIN_ORDERS, HARVEST_MAX_ACOS, MIN_KEYWORD_BID,
+    join_keys, aggregate_search_terms
+)
+
+ASIN_LABEL = 'ASIN投放'  # Output file suffix and metrics label
+NEGATE_MIN_CLICKS = 10  # Clicks without orders before an ASIN is negated, when the run sets no click threshold
+TARGET_LEVELS = ('商品定向', '否定商品定向')
+EXPRESSION_ASIN_PATTERN = r'asin="?([A-Za-z0-9]{10})'  # ASIN of a 商品投放表达式
+CREATE_COLUMNS = ['产品', '实体层级', '操作', '广告活动编号', '广告组编号', '广告活动名称', '广告组名称',
+                  '状态', '竞价', '商品投放表达式']
+
+def targeted_asins(chunks):
+    """Scan the campaign sheet once for ASIN targets and ad groups
+
+    Args:
+        chunks (iterable): DataFrame chunks of the 商品推广活动 sheet
+
+    Returns:
+        tuple: pd.Index of (campaign, ad group, ASIN) keys of every targeted
+            or negated ASIN, used as a hash set, and the ad groups with
+            their IDs and whether their campaign is manual (手动)
+    """
+    key_parts = []
+    group_parts = []
+    manual_parts = []
+    for chunk in chunks:
+        for entity_level in TARGET_LEVELS:
+            rows = entity_rows(chunk, entity_level)
+            if rows.empty:
+                continue
+            asins = rows['商品投放表达式'].astype(str).str.extract(EXPRESSION_ASIN_PATTERN, expand=False).str.upper()
+            found = asins.notna().to_numpy()
+            if found.any():
+                key_parts.append(join_keys(rows['广告活动名称'][found], rows['广告组名称'][found], asins[found]))
+        groups = entity_rows(chunk, '广告组')
+        group_parts.append(
+            groups[GROUP_COLUMNS + ['广告活动编号', '广告组编号']].astype({name: str for name in GROUP_COLUMNS})
+        )
+        campaigns = entity_rows(chunk, '广告活动')
+        manual_parts.append(campaigns.loc[(campaigns['投放类型'] == '手动').to_numpy(), '广告活动名称'].astype(str))
+
+    keys = pd.Index(np.concatenate(key_parts) if key_parts else np.array([], dtype=object)).unique()
+    if not group_parts:
+        return keys, pd.DataFrame(columns=GROUP_COLUMNS + ['广告活动编号', '广告组编号', '手动'])
+    ad_groups = pd.concat(group_parts).drop_duplicates(GROUP_COLUMNS)
+    ad_groups['手动'] = ad_groups['广告活动名称'].isin(pd.concat(manual_parts)).to_numpy()
+    return keys, ad_groups
+
+def asin_targets(terms, keys, ad_groups, order, acos, click, sku_str):
+    """Turn ASIN search terms into product targeting and negative targeting Create rows
+
+    An ASIN is targeted when its orders and ACOS pass the thresholds, in
+    the ad group it was searched in if that ad group belongs to a manual
+    campaign. An ASIN with click or more clicks and no orders is negated
+    in its ad group. ASINs the ad group already targets or negates are
+    skipped with one hash lookup of their keys.
+
+    Args:
+        terms (pd.DataFrame): Result of aggregate_search_terms for ASIN terms
+        keys (pd.Index): ASIN keys from targeted_asins
+        ad_groups (pd.DataFrame): Ad groups from targeted_asins
+        order (int): Lowest order count of a targeted ASIN
+        acos (float): Highest ACOS of a targeted ASIN
+        click (int): Lowest click count of a negated ASIN
+        sku_str (str): Comma-separated SKU values
+
+    Returns:
+        pd.DataFrame: Bulk rows creating the targets, bid at the ASIN's CPC
+    """
+    clicks = terms['点击量'].to_numpy(dtype=float)
+    orders = terms['订单数量'].to_numpy(dtype=float)
+    spend = terms['花费'].to_numpy(dtype=float)
+    sales = terms['销量'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        term_acos = np.where(sales > 0, spend / sales, np.inf)
+        cpc = np.where(clicks > 0, spend / clicks, 0.0)
+    target = (orders >= order) & (term_acos <= acos)
+    negate = (clicks >= click) & (orders == 0)
+    mask = target | negate
+    sku_list = parse_sku_list(sku_str)
+    if sku_list:
+        mask &= terms['广告组合名称（仅供参考）'].isin(sku_list).to_numpy()
+
+    candidates = terms.loc[mask, GROUP_COLUMNS + ['客户搜索词']].assign(
+        实体层级=np.where(target[mask], '商品定向', '否定商品定向'),
+        竞价=np.where(target[mask], np.maximum(np.round(cpc[mask], 2), MIN_KEYWORD_BID), np.nan),
+    )
+    candidates = candidates.merge(ad_groups, on=GROUP_COLUMNS, how='inner')
+    # Auto campaigns only take negative product targets
+    candidates = candidates[(candidates['实体层级'] == '否定商品定向').to_numpy() | candidates['手动'].to_numpy()]
+    if candidates.empty:
+        return pd.DataFrame(columns=CREATE_COLUMNS)
+    candidate_keys = join_keys(candidates['广告活动名称'], candidates['广告组名称'], candidates['客户搜索词'])
+    created = candidates[~pd.Index(candidate_keys).isin(keys)].assign(
+        产品='商品推广', 操作='Create', 状态='已启用'
+    )
+    created['商品投放表达式'] = 'asin="' + created['客户搜索词'] + '"'
+    return created[CREATE_COLUMNS].sort_values(GROUP_COLUMNS + ['实体层级', '商品投放表达式'], ignore_index=True)
+
+class ASINModule(ScreenModule):
+    """Creates product targets from the ASIN search terms of the bulk file"""
+
     def create_asin_ads(self):
-        print("Creating ads targeting specific ASINs.")
+        """Target converting ASIN search terms and negate ASINs that only cost clicks
+
+        Thresholds come from the order, ACOS and click parameters of the
+        run, falling back to the keyword harvesting defaults and
+        NEGATE_MIN_CLICKS.
+
+        Returns:
+            str: Path to the file of Create rows, None if nothing was created
+        """
+        if not has_sheet(self.file_path, SEARCH_TERM_SHEET):
+            print("Sheet '{0}' not found, skipping ASIN targeting".format(SEARCH_TERM_SHEET))
+            return None
+        keys, ad_groups = targeted_asins(self._read_sheet(CAMPAIGN_SHEET, ASIN_LABEL))
+        terms = aggregate_search_terms(self._read_sheet(SEARCH_TERM_SHEET, ASIN_LABEL), asin_terms=True)
+        created = asin_targets(
+            terms, keys, ad_groups,
+            self.params.order if self.params.order is not None else HARVEST_MIN_ORDERS,
+            self.params.acos if self.params.acos is not None else HARVEST_MAX_ACOS,
+            self.params.click if self.params.click is not None else NEGATE_MIN_CLICKS,
+            self.params.sku
+        )
+        print("Created {0} product targets from {1} ASIN search terms".format(len(created), len(terms)))
+        return self._save_results(created, ASIN_LABEL)
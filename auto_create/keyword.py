@@ -1,3 +1,199 @@
-class KeywordModule:
+# -*- coding: utf-8 -*-
+import importlib.util
+import numpy as np
+import pandas as pd
+from auto_adjust.sp import ScreenModule, has_sheet, CAMPAIGN_SHEET
+from auto_adjust.sheet_index import entity_rows, parse_sku_list
+
+SEARCH_TERM_SHEET = '商品推广搜索词报告'
+HARVEST_LABEL = '关键词收割'  # Output file suffix and metrics label
+HARVEST_MATCH_TYPES = ('精准', '词组')  # Match types each harvested search term is created with
+HARVEST_MIN_ORDERS = 2  # Orders a search term needs when the run sets no order threshold
+HARVEST_MIN_CONVERSION = 0.1  # Conversion rate a search term needs when the run sets none
+HARVEST_MAX_ACOS = 0.3  # Highest ACOS of a harvested search term when the run sets none
+MIN_KEYWORD_BID = 0.02  # Lowest bid accepted by the bulk upload
+ASIN_TERM_PATTERN = r'b0[0-9a-z]{8}'  # Customer search terms that are product ASINs
+KEY_SEPARATOR = '\x1f'
+# Text normalization uses the Arrow string kernels when pyarrow is installed
+TEXT_DTYPE = 'string[pyarrow]' if importlib.util.find_spec('pyarrow') is not None else object
+
+GROUP_COLUMNS = ['广告活动名称', '广告组名称']
+METRIC_COLUMNS = ['点击量', '订单数量', '花费', '销量']
+CREATE_COLUMNS = ['产品', '实体层级', '操作', '广告活动编号', '广告组编号', '广告活动名称', '广告组名称',
+                  '状态', '竞价', '关键词文本', '匹配类型']
+
+def normalize_terms(terms):
+    """Normalize keyword text for deduplication: lower case, trimmed, single spaces
+
+    Args:
+        terms (pd.Series): Keyword or search term text
+
+    Returns:
+        pd.Series: Normalized text, with terms' index
+    """
+    text = terms.fillna('').astype(str).astype(TEXT_DTYPE)
+    return text.str.lower().str.replace(r'\s+', ' ', regex=True).str.strip()
+
+def join_keys(*columns):
+    """Hash keys joining several columns, e.g. ad group and normalized keyword
+
+    Args:
+        *columns (pd.Series): Columns of equal length
+
+    Returns:
+        np.ndarray: One key string per row
+    """
+    keys = columns[0].astype(str)
+    for column in columns[1:]:
+        keys = keys + KEY_SEPARATOR + column.astype(str).to_numpy()
+    return keys.to_numpy()
+
+def existing_keywords(chunks):
+    """Scan the campaign sheet once for its keywords
+
+    Args:
+        chunks (iterable): DataFrame chunks of the 商品推广活动 sheet
+
+    Returns:
+        tuple: pd.Index of the keyword keys, used as a hash set, and the
+            ad groups holding keywords with their campaign and ad group IDs
+    """
+    key_parts = []
+    group_parts = []
+    for chunk in chunks:
+        keywords = entity_rows(chunk, '关键词')
+        if keywords.empty:
+            continue
+        key_parts.append(join_keys(
+            keywords['广告活动名称'], keywords['广告组名称'],
+            normalize_terms(keywords['关键词文本']), keywords['匹配类型']
+        ))
+        group_parts.append(
+            keywords[GROUP_COLUMNS + ['广告活动编号', '广告组编号']].astype({name: str for name in GROUP_COLUMNS})
+            .drop_duplicates(GROUP_COLUMNS)
+        )
+    keys = pd.Index(np.concatenate(key_parts) if key_parts else np.array([], dtype=object)).unique()
+    if group_parts:
+        ad_groups = pd.concat(group_parts).drop_duplicates(GROUP_COLUMNS)
+    else:
+        ad_groups = pd.DataFrame(columns=GROUP_COLUMNS + ['广告活动编号', '广告组编号'])
+    return keys, ad_groups
+
+def aggregate_search_terms(chunks, asin_terms=False):
+    """Sum the metrics of each normalized search term per ad group
+
+    The report lists a term once per keyword that matched it; summing per
+    chunk and then over the chunk sums keeps memory proportional to the
+    distinct terms.
+
+    Args:
+        chunks (iterable): DataFrame chunks of the 商品推广搜索词报告 sheet
+        asin_terms (bool): Keep only the ASIN search terms, upper-cased,
+            instead of only the keyword search terms
+
+    Returns:
+        pd.DataFrame: 广告组合名称, ad group, 客户搜索词 and summed metrics
+    """
+    keys = GROUP_COLUMNS + ['客户搜索词']
+    partials = []
+    for chunk in chunks:
+        # Terms repeat across ad groups and match types, so the string work
+        # runs on the distinct terms only and is mapped back by their codes
+        codes, uniques = pd.factorize(chunk['客户搜索词'], use_na_sentinel=False)
+        unique_terms = normalize_terms(pd.Series(uniques, dtype=object))
+        is_asin = unique_terms.str.fullmatch(ASIN_TERM_PATTERN).to_numpy(dtype=bool)
+        if asin_terms:
+            unique_terms = unique_terms.str.upper()
+        keep = is_asin[codes] if asin_terms else ~is_asin[codes]
+        frame = chunk.loc[keep, ['广告组合名称（仅供参考）'] + GROUP_COLUMNS + METRIC_COLUMNS].astype(
+            {name: str for name in ['广告组合名称（仅供参考）'] + GROUP_COLUMNS}
+        )
+        frame['客户搜索词'] = unique_terms.to_numpy()[codes[keep]]
+        partials.append(_sum_terms(frame, keys))
+    if not partials:
+        return pd.DataFrame(columns=['广告组合名称（仅供参考）'] + keys + METRIC_COLUMNS)
+    return _sum_terms(pd.concat(partials, ignore_index=True), keys)
+
+def _sum_terms(frame, keys):
+    grouped = frame.groupby(keys, sort=False)
+    summed = grouped[METRIC_COLUMNS].sum()
+    summed.insert(0, '广告组合名称（仅供参考）', grouped['广告组合名称（仅供参考）'].first())
+    return summed.reset_index()
+
+def harvest_keywords(terms, keys, ad_groups, order, conversion, acos, sku_str):
+    """Turn converting search terms into keyword Create rows
+
+    Terms are kept when their summed orders, conversion rate and ACOS pass
+    the thresholds. Each is created with every HARVEST_MATCH_TYPES in the
+    ad group it was searched in, unless that ad group already has the
+    keyword; the check is a hash lookup of the normalized key, so the run
+    stays linear in the report size.
+
+    Args:
+        terms (pd.DataFrame): Result of aggregate_search_terms
+        keys (pd.Index): Keyword keys from existing_keywords
+        ad_groups (pd.DataFrame): Ad groups from existing_keywords
+        order (int): Lowest order count
+        conversion (float): Lowest conversion rate
+        acos (float): Highest ACOS
+        sku_str (str): Comma-separated SKU values
+
+    Returns:
+        pd.DataFrame: Bulk rows creating the keywords, bid at the term's CPC
+    """
+    clicks = terms['点击量'].to_numpy(dtype=float)
+    orders = terms['订单数量'].to_numpy(dtype=float)
+    spend = terms['花费'].to_numpy(dtype=float)
+    sales = terms['销量'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        conversion_rate = np.where(clicks > 0, orders / clicks, 0.0)
+        term_acos = np.where(sales > 0, spend / sales, np.inf)
+        cpc = np.where(clicks > 0, spend / clicks, 0.0)
+    mask = (orders >= order) & (conversion_rate >= conversion) & (term_acos <= acos)
+    sku_list = parse_sku_list(sku_str)
+    if sku_list:
+        mask &= terms['广告组合名称（仅供参考）'].isin(sku_list).to_numpy()
+
+    bids = np.maximum(np.round(cpc[mask], 2), MIN_KEYWORD_BID)
+    harvested = terms.loc[mask, GROUP_COLUMNS + ['客户搜索词']].assign(竞价=bids)
+    harvested = harvested.merge(ad_groups, on=GROUP_COLUMNS, how='inner')
+    candidates = pd.concat(
+        [harvested.assign(匹配类型=match_type) for match_type in HARVEST_MATCH_TYPES], ignore_index=True
+    )
+    if candidates.empty:
+        return pd.DataFrame(columns=CREATE_COLUMNS)
+    candidate_keys = join_keys(
+        candidates['广告活动名称'], candidates['广告组名称'], candidates['客户搜索词'], candidates['匹配类型']
+    )
+    created = candidates[~pd.Index(candidate_keys).isin(keys)]
+    created = created.rename(columns={'客户搜索词': '关键词文本'}).assign(
+        产品='商品推广', 实体层级='关键词', 操作='Create', 状态='已启用'
+    )
+    return created[CREATE_COLUMNS].sort_values(GROUP_COLUMNS + ['关键词文本', '匹配类型'], ignore_index=True)
+
+class KeywordModule(ScreenModule):
+    """Creates keywords from the search term report of the bulk file"""
+
     def generate_keywords(self):
-        print("Generating keywords for new ads.")
+        """Harvest converting customer search terms into new exact and phrase keywords
+
+        Thresholds come from the order, conversion and ACOS parameters of
+        the run, falling back to the HARVEST_* defaults.
+
+        Returns:
+            str: Path to the file of Create rows, None if nothing was harvested
+        """
+        if not has_sheet(self.file_path, SEARCH_TERM_SHEET):
+            print("Sheet '{0}' not found, skipping keyword harvesting".format(SEARCH_TERM_SHEET))
+            return None
+        keys, ad_groups = existing_keywords(self._read_sheet(CAMPAIGN_SHEET, HARVEST_LABEL))
+        terms = aggregate_search_terms(self._read_sheet(SEARCH_TERM_SHEET, HARVEST_LABEL))
+        created = harvest_keywords(
+            terms, keys, ad_groups,
+            self.params.order if self.params.order is not None else HARVEST_MIN_ORDERS,
+            self.params.conversion if self.params.conversion is not None else HARVEST_MIN_CONVERSION,
+            self.params.acos if self.params.acos is not None else HARVEST_MAX_ACOS,
+            self.params.sku
+        )
+        print("Harvested {0} keywords from {1} search terms".format(len(created), len(terms)))
+        return self._save_results(created, HARVEST_LABEL)
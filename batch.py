@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""Run SP, SB and SD screens, ad creation and AI bid optimization over many bulk files without the web application
+
+Usage:
+    python batch.py bulk/ --thresholds thresholds.json --screens SP商品筛选 SP无效筛选 --output-dir results
+    python batch.py "bulk/*.xlsx" --jobs 4 --output-dir results --snapshots
+
+The threshold file is a JSON object of config.ScreenParams fields, e.g.
+{"click": 5, "acos": 0.5, "sku": "SKU001,SKU002"}. Campaign snapshots are
+only stored for an "account" named there, or, with --snapshots, under
+each file's name.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import config
+from optimization import (
+    AmazonAdOptimizationSystem, FUNCTION_MAPPING, SB_FUNCTION_MAPPING, SD_FUNCTION_MAPPING, CREATE_FUNCTION_MAPPING,
+    AI_FUNCTION_MAPPING
+)
+from auto_adjust.executor import EXECUTION_BACKENDS
+from auto_adjust.sheet_cache import SHEET_CACHE_DIR, remove_expired_entries
+from auto_adjust.writer import OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT
+
+BULK_EXTENSIONS = ('.xlsx', '.xlsm')
+SUMMARY_FILE = 'summary.json'  # Written to the output directory after every batch
+CACHE_RETENTION_SECONDS = 24 * 3600  # Sheet cache entries of the output directory older than this are deleted
+
+def find_bulk_files(inputs):
+    """Expand directories and glob patterns into bulk file paths
+
+    Args:
+        inputs (list): Directories, files or glob patterns
+
+    Returns:
+        list: Sorted paths of the bulk files, skipping Excel lock files
+    """
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = [os.path.join(item, name) for name in os.listdir(item)]
+        else:
+            matches = glob.glob(item)
+        for path in matches:
+            name = os.path.basename(path)
+            if os.path.isfile(path) and name.lower().endswith(BULK_EXTENSIONS) and not name.startswith('~$'):
+                paths.add(path)
+    return sorted(paths)
+
+def load_thresholds(path):
+    """Read the parameters of every run from a JSON file
+
+    Args:
+        path (str): Path of the JSON file, or None for the config defaults
+
+    Returns:
+        dict: ScreenParams field to value
+    """
+    if path is None:
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        values = json.load(f)
+    unknown = set(values) - set(config.ScreenParams._fields)
+    if unknown:
+        raise ValueError("Unknown parameters in {0}: {1}".format(path, ", ".join(sorted(unknown))))
+    return values
+
+def _stage_input(file_path, output_dir):
+    """Link a bulk file into output_dir, where SPModule writes its results"""
+    target = os.path.join(output_dir, os.path.basename(file_path))
+    if os.path.abspath(target) == os.path.abspath(file_path):
+        return target
+    if os.path.exists(target):
+        os.remove(target)
+    try:
+        os.link(file_path, target)
+    except OSError:
+        shutil.copyfile(file_path, target)  # Output directory on another file system
+    return target
+
+def run_file(file_path, screens, values, output_dir, backend, output_format, snapshots=False):
+    """Run screens on one bulk file; executed in a worker process
+
+    The screens run one after another, so later ones load the sheets
+    parsed by the first from the sheet cache.
+
+    Args:
+        file_path (str): Path of the bulk file
+        screens (list): Names from the function mappings of optimization to run
+        values (dict): Parameters from the threshold file
+        output_dir (str): Directory results are written to
+        backend (str): Chunk execution backend inside the worker
+        output_format (str): Result file format
+        snapshots (bool): Store snapshots under the file name when values name no account
+
+    Returns:
+        list: One summary dict per screen
+    """
+    values = dict(values)
+    if snapshots:
+        values.setdefault('account', os.path.splitext(os.path.basename(file_path))[0])
+    params = config.screen_params(**values)
+    staged = _stage_input(file_path, output_dir)
+    results = []
+    try:
+        for screen in screens:
+            item = {'file': file_path, 'screen': screen, 'result': None, 'error': None}
+            started = time.perf_counter()
+            try:
+                system = AmazonAdOptimizationSystem(staged, params, backend, output_format)
+                if screen in SB_FUNCTION_MAPPING:
+                    item['result'] = system.run_optimization(None, None, staged, screen)
+                elif screen in SD_FUNCTION_MAPPING:
+                    item['result'] = system.run_optimization(None, None, staged, None, screen)
+                elif screen in CREATE_FUNCTION_MAPPING:
+                    item['result'] = system.run_optimization(None, None, staged, None, None, screen)
+                elif screen in AI_FUNCTION_MAPPING:
+                    item['result'] = system.run_optimization(None, None, staged, None, None, None, screen)
+                else:
+                    item['result'] = system.run_optimization(screen, None, staged)
+                item['status'] = 'ok' if item['result'] else 'empty'
+            except Exception as e:
+                item['status'] = 'failed'
+                item['error'] = "{0}: {1}".format(type(e).__name__, e)
+            item['seconds'] = round(time.perf_counter() - started, 3)
+            results.append(item)
+    finally:
+        if os.path.abspath(staged) != os.path.abspath(file_path):
+            os.remove(staged)
+    return results
+
+def run_batch(files, screens, values, output_dir, jobs, backend, output_format, snapshots=False):
+    """Run every file in a pool of jobs worker processes
+
+    Returns:
+        list: Summary dicts of all files and screens, in file order
+    """
+    results = {}
+    if jobs <= 1:
+        for file_path in files:
+            results[file_path] = run_file(file_path, screens, values, output_dir, backend, output_format, snapshots)
+            _print_file(results[file_path])
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {
+                pool.submit(
+                    run_file, file_path, screens, values, output_dir, backend, output_format, snapshots
+                ): file_path
+                for file_path in files
+            }
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    results[file_path] = future.result()
+                except Exception as e:  # Worker process died
+                    results[file_path] = [{
+                        'file': file_path, 'screen': screen, 'status': 'failed', 'result': None,
+                        'error': "{0}: {1}".format(type(e).__name__, e), 'seconds': None,
+                    } for screen in screens]
+                _print_file(results[file_path])
+    return [item for file_path in files for item in results[file_path]]
+
+def _print_file(items):
+    for item in items:
+        detail = item['result'] or item['error'] or "no matching data"
+        print("[{status}] {file} {screen}: {0}".format(detail, **item))
+
+def write_summary(results, output_dir, started):
+    """Save the summary report and print totals
+
+    Returns:
+        str: Path of the summary file
+    """
+    counts = {}
+    for item in results:
+        counts[item['status']] = counts.get(item['status'], 0) + 1
+    summary = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seconds': round(time.perf_counter() - started, 3),
+        'files': len({item['file'] for item in results}),
+        'counts': counts,
+        'results': results,
+    }
+    path = os.path.join(output_dir, SUMMARY_FILE)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print("{0} files, {1} runs in {2:.1f}s: {3} ok, {4} without matches, {5} failed".format(
+        summary['files'], len(results), summary['seconds'],
+        counts.get('ok', 0), counts.get('empty', 0), counts.get('failed', 0)
+    ))
+    print("Summary saved to: {0}".format(path))
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run SP, SB and SD screens and ad creation on a directory of bulk files")
+    parser.add_argument('inputs', nargs='+', help="Bulk files, directories or glob patterns")
+    parser.add_argument('--thresholds', help="JSON file of thresholds, sku and account")
+    screen_choices = (
+        list(FUNCTION_MAPPING) + list(SB_FUNCTION_MAPPING) + list(SD_FUNCTION_MAPPING)
+        + list(CREATE_FUNCTION_MAPPING) + list(AI_FUNCTION_MAPPING)
+    )
+    parser.add_argument('--screens', nargs='+', choices=screen_choices, default=['SP全部筛选'])
+    parser.add_argument('--output-dir', default='batch_results')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Files processed at the same time")
+    parser.add_argument('--backend', choices=EXECUTION_BACKENDS, default='inline', help="Chunk backend inside each job")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default=DEFAULT_OUTPUT_FORMAT)
+    parser.add_argument(
+        '--snapshots', action='store_true',
+        help="Store campaign snapshots of each file under its file name when the thresholds name no account"
+    )
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    values = load_thresholds(args.thresholds)
+    files = find_bulk_files(args.inputs)
+    if not files:
+        print("No bulk files found")
+        return 1
+    names = [os.path.basename(path) for path in files]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        # Results are named after the input file, so they would overwrite each other
+        print("Bulk files with the same name: {0}".format(", ".join(duplicates)))
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    remove_expired_entries(os.path.join(args.output_dir, SHEET_CACHE_DIR), CACHE_RETENTION_SECONDS, time.time())
+    print("Running {0} on {1} files with {2} jobs".format(", ".join(args.screens), len(files), args.jobs))
+    results = run_batch(
+        files, args.screens, values, args.output_dir, max(args.jobs, 1), args.backend, args.output_format,
+        args.snapshots
+    )
+    write_summary(results, args.output_dir, started)
+    return 1 if any(item['status'] == 'failed' for item in results) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+from auto_adjust.writer import write_results
+
+CAMPAIGN_SHEET = '商品推广活动'
+SEARCH_TERM_SHEET = '商品推广搜索词报告'
+
+STATES = np.array(['已启用', '已暂停', '已归档'])
+STATE_WEIGHTS = [0.88, 0.10, 0.02]
+MATCH_TYPES = np.array(['精准', '词组', '广泛'])
+BIDDING_STRATEGIES = np.array(['动态竞价 - 仅降低', '动态竞价 - 提高和降低', '固定竞价'])
+PLACEMENTS = np.array(['广告位：搜索结果顶部（首页）', '广告位：商品页面', '广告位：搜索结果的其余位置'])
+
+# Sort keys that put each campaign's rows in bulk-file order:
+# campaign, bid adjustments, then each ad group with its ads and targets
+_CAMPAIGN, _BID_ADJUSTMENT, _AD_GROUP = 0, 1, 2
+_GROUP_ROW, _AD_ROW, _TARGET_ROW = 0, 1, 2
+
+def _metrics(rng, n_rows):
+    """Performance columns with consistent ratios (clicks <= impressions, ACOS = spend / sales)"""
+    impressions = rng.negative_binomial(1, 1 / 800.0, n_rows)
+    clicks = rng.binomial(impressions, rng.beta(1.2, 250, n_rows))
+    cpc = np.round(rng.gamma(4.0, 0.2, n_rows), 2)
+    orders = rng.binomial(clicks, rng.beta(1.5, 12, n_rows))
+    spend = np.round(clicks * cpc, 2)
+    sales = np.round(orders * rng.uniform(12, 60, n_rows), 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            '展示量': impressions,
+            '点击量': clicks,
+            '点击率': np.round(np.where(impressions > 0, clicks / impressions, 0), 4),
+            '花费': spend,
+            '销量': sales,
+            '订单数量': orders,
+            '转化率': np.round(np.where(clicks > 0, orders / clicks, 0), 4),
+            'ACOS': np.round(np.where(sales > 0, spend / sales, 0), 4),
+            'CPC': np.round(np.where(clicks > 0, spend / clicks, 0), 2),
+            'ROAS': np.round(np.where(spend > 0, sales / spend, 0), 2),
+        }
+
+def _structure(rng, n_rows):
+    """Build campaign / ad group / row structure with at least n_rows rows
+
+    Returns:
+        dict: Per-row arrays of entity level, campaign and ad group numbers and sort keys
+    """
+    n_campaigns = max(n_rows // 30, 1)
+    while True:
+        groups_per_campaign = rng.integers(1, 5, n_campaigns)
+        adjustments_per_campaign = rng.integers(0, 3, n_campaigns)
+        n_groups = int(groups_per_campaign.sum())
+        ads_per_group = rng.integers(1, 4, n_groups)
+        targets_per_group = rng.integers(2, 12, n_groups)
+        total = n_campaigns + adjustments_per_campaign.sum() + n_groups + ads_per_group.sum() + targets_per_group.sum()
+        if total >= n_rows:
+            break
+        n_campaigns = int(n_campaigns * 1.5) + 1
+
+    campaign_ids = np.arange(n_campaigns)
+    group_campaign = np.repeat(campaign_ids, groups_per_campaign)
+    group_ids = np.arange(n_groups)
+
+    def within(counts):
+        # Position of each repeated item inside its parent: 0, 1, ... per parent
+        return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    parts = [
+        (_CAMPAIGN, campaign_ids, np.full(n_campaigns, -1), np.zeros(n_campaigns, dtype=int), 0),
+        (_BID_ADJUSTMENT, np.repeat(campaign_ids, adjustments_per_campaign),
+         np.full(adjustments_per_campaign.sum(), -1), within(adjustments_per_campaign), 0),
+        (_AD_GROUP, group_campaign, group_ids, np.zeros(n_groups, dtype=int), _GROUP_ROW),
+        (_AD_GROUP, np.repeat(group_campaign, ads_per_group), np.repeat(group_ids, ads_per_group),
+         within(ads_per_group), _AD_ROW),
+        (_AD_GROUP, np.repeat(group_campaign, targets_per_group), np.repeat(group_ids, targets_per_group),
+         within(targets_per_group), _TARGET_ROW),
+    ]
+    block = np.concatenate([np.full(len(part[1]), part[0]) for part in parts])
+    campaign = np.concatenate([part[1] for part in parts])
+    group = np.concatenate([part[2] for part in parts])
+    position = np.concatenate([part[3] for part in parts])
+    row_kind = np.concatenate([np.full(len(part[1]), part[4]) for part in parts])
+
+    order = np.lexsort((position, row_kind, group, block, campaign))[:n_rows]
+    return {
+        'block': block[order], 'campaign': campaign[order], 'group': group[order],
+        'position': position[order], 'row_kind': row_kind[order], 'n_campaigns': n_campaigns,
+        'n_groups': n_groups,
+    }
+
+def generate_bulk(n_rows, seed=0):
+    """Generate a multi-level 商品推广活动 sheet
+
+    Each campaign has a campaign row, 0-2 placement bid adjustments and
+    1-4 ad groups. Each ad group has 1-3 product ads and 2-11 keywords
+    (manual campaigns) or product targets. Campaign names only depend on
+    the campaign number, so files generated with different seeds describe
+    the same campaigns in different periods.
+
+    Args:
+        n_rows (int): Number of rows
+        seed (int): Random seed
+
+    Returns:
+        pd.DataFrame: Bulk sheet rows in bulk-file order
+    """
+    rng = np.random.default_rng(seed)
+    structure = _structure(rng, n_rows)
+    n_campaigns, n_groups = structure['n_campaigns'], structure['n_groups']
+    campaign, group = structure['campaign'], structure['group']
+    block, row_kind = structure['block'], structure['row_kind']
+    n = len(campaign)
+
+    manual = rng.random(n_campaigns) < 0.7
+    keyword_targeting = manual & (rng.random(n_campaigns) < 0.75)
+    portfolios = np.array(['SKU{0:03d}'.format(i) for i in range(max(n_campaigns // 20, 5))])
+    campaign_portfolio = portfolios[rng.integers(0, len(portfolios), n_campaigns)]
+    campaign_state = rng.choice(STATES, n_campaigns, p=STATE_WEIGHTS)
+    group_state = rng.choice(STATES, n_groups, p=STATE_WEIGHTS)
+    start_dates = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 900, n_campaigns), unit='D')
+    group_default_bid = np.round(rng.uniform(0.3, 2.5, n_groups), 2)
+
+    is_campaign = block == _CAMPAIGN
+    is_adjustment = block == _BID_ADJUSTMENT
+    is_group = (block == _AD_GROUP) & (row_kind == _GROUP_ROW)
+    is_ad = (block == _AD_GROUP) & (row_kind == _AD_ROW)
+    is_target = (block == _AD_GROUP) & (row_kind == _TARGET_ROW)
+    is_keyword = is_target & keyword_targeting[campaign]
+    in_group = block == _AD_GROUP
+
+    levels = np.select(
+        [is_campaign, is_adjustment, is_group, is_ad, is_keyword],
+        ['广告活动', '竞价调整', '广告组', '商品广告', '关键词'],
+        default='商品定向'
+    )
+    safe_group = np.where(in_group, group, 0)
+
+    def where(mask, values):
+        return pd.Series(values, dtype=object).where(mask, None)
+
+    frame = pd.DataFrame({
+        '产品': '商品推广',
+        '实体层级': levels,
+        '操作': None,
+        '广告活动编号': campaign + 100000000,
+        '广告组编号': where(in_group, group + 200000000),
+        '广告活动名称': np.char.add('SP-', np.char.zfill(campaign.astype(str), 6)),
+        '广告组名称': where(in_group, np.char.add('AG-', safe_group.astype(str))),
+        '广告组合名称（仅供参考）': campaign_portfolio[campaign],
+        '开始日期': start_dates[campaign],
+        '投放类型': where(is_campaign, np.where(manual[campaign], '手动', '自动')),
+        '状态': np.where(is_campaign, campaign_state[campaign],
+                       np.where(is_group, group_state[safe_group], rng.choice(STATES, n, p=STATE_WEIGHTS))),
+        '广告活动状态（仅供参考）': campaign_state[campaign],
+        '广告组状态（仅供参考）': where(in_group, group_state[safe_group]),
+        '每日预算': np.where(is_campaign, np.round(rng.uniform(5, 200, n), 0), np.nan),
+        'SKU': where(is_ad, np.char.add(campaign_portfolio[campaign], np.char.add('-', structure['position'].astype(str)))),
+        '广告组默认竞价': np.where(is_group, group_default_bid[safe_group], np.nan),
+        '竞价': np.where(is_target, np.round(group_default_bid[safe_group] * rng.uniform(0.6, 1.6, n), 2), np.nan),
+        '关键词文本': where(is_keyword, np.char.add('keyword ', np.arange(n).astype(str))),
+        '匹配类型': where(is_keyword, MATCH_TYPES[rng.integers(0, 3, n)]),
+        '商品投放表达式': where(is_target & ~is_keyword, np.char.add('asin="B0', np.char.zfill(np.arange(n).astype(str), 8))),
+        '竞价方案': where(is_campaign, BIDDING_STRATEGIES[rng.integers(0, 3, n)]),
+        '广告位': where(is_adjustment, PLACEMENTS[structure['position'] % 3]),
+        '百分比': np.where(is_adjustment, rng.integers(0, 301, n).astype(float), np.nan),
+    })
+    for column, values in _metrics(rng, n).items():
+        frame[column] = values
+    return frame
+
+def generate_search_terms(n_rows, n_campaigns, seed=0):
+    """Generate a 商品推广搜索词报告 sheet for campaigns SP-000000 .. n_campaigns-1
+
+    Args:
+        n_rows (int): Number of rows
+        n_campaigns (int): Number of campaigns the search terms belong to
+        seed (int): Random seed
+
+    Returns:
+        pd.DataFrame: Search term report rows
+    """
+    rng = np.random.default_rng(seed + 1)
+    campaign = np.sort(rng.integers(0, max(n_campaigns, 1), n_rows))
+    portfolios = np.array(['SKU{0:03d}'.format(i) for i in range(max(n_campaigns // 20, 5))])
+    frame = pd.DataFrame({
+        '广告组合名称（仅供参考）': portfolios[campaign % len(portfolios)],
+        '广告活动名称': np.char.add('SP-', np.char.zfill(campaign.astype(str), 6)),
+        '广告组名称': np.char.add('AG-', rng.integers(0, max(n_campaigns, 1) * 2, n_rows).astype(str)),
+        '匹配类型': MATCH_TYPES[rng.integers(0, 3, n_rows)],
+        '客户搜索词': np.char.add('search term ', rng.integers(0, max(n_rows // 3, 1), n_rows).astype(str)),
+    })
+    for column, values in _metrics(rng, n_rows).items():
+        frame[column] = values
+    return frame
+
+def write_bulk_workbook(path, n_rows, seed=0, search_term_rows=None):
+    """Write a synthetic bulk workbook with both SP sheets
+
+    Args:
+        path (str): Path of the .xlsx file
+        n_rows (int): Rows of the 商品推广活动 sheet
+        seed (int): Random seed
+        search_term_rows (int, optional): Rows of the search term report, default n_rows // 2
+
+    Returns:
+        str: The path
+    """
+    bulk = generate_bulk(n_rows, seed)
+    n_campaigns = int((bulk['实体层级'] == '广告活动').sum())
+    if search_term_rows is None:
+        search_term_rows = max(n_rows // 2, 1)
+    search_terms = generate_search_terms(search_term_rows, n_campaigns, seed)
+    write_results({CAMPAIGN_SHEET: bulk, SEARCH_TERM_SHEET: search_terms}, path, 'xlsx')
+    return path
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""Time parse, filter and write of every SP function on synthetic bulk files
+
+Usage:
+    python -m benchmarks.run --sizes 10000 100000 1000000 --output bench.json
+    python -m benchmarks.run --sizes 10000 --baseline bench.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import pandas as pd
+import auto_adjust.filters as filter
+from auto_adjust.sp import SP_SCREENS, CAMPAIGN_SHEET, CAMPAIGN_ENTITY, PAIR_CHUNK_SIZE, read_sheet_in_chunks, _filter_chunk
+from auto_adjust.sheet_index import entity_rows
+from auto_adjust.executor import ChunkExecutor, EXECUTION_BACKENDS
+from auto_adjust.writer import write_results, output_extension, OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT
+from benchmarks.generator import write_bulk_workbook
+import config
+from optimization import FUNCTION_MAPPING
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+DATA_DIR = os.path.join(tempfile.gettempdir(), 'sp_benchmark_data')
+
+# Thresholds used for every screen, taken from the form presets
+BENCHMARK_PARAMS = config.screen_params(
+    impress=1000, click=5, click_rate=0.002, spend=30, sales=100, order=3,
+    conversion=0.05, acos=0.5, cpc=1.0, roas=2.0
+)
+
+def workbook_path(data_dir, n_rows, seed):
+    """Generate the workbook of a size once and reuse it in later runs"""
+    path = os.path.join(data_dir, "bulk_{0}_{1}.xlsx".format(n_rows, seed))
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        started = time.perf_counter()
+        write_bulk_workbook(path + '.tmp.xlsx', n_rows, seed)
+        os.replace(path + '.tmp.xlsx', path)
+        print("Generated {0} ({1:.1f}s)".format(path, time.perf_counter() - started))
+    return path
+
+def _parse(path, sheet_name):
+    """Parse a sheet into memory, returning (chunks, seconds)"""
+    started = time.perf_counter()
+    chunks = list(read_sheet_in_chunks(path, sheet_name, PAIR_CHUNK_SIZE))
+    return chunks, time.perf_counter() - started
+
+def _screen_args(threshold_names):
+    filter_args = {name: getattr(BENCHMARK_PARAMS, name) for name in threshold_names}
+    filter_args['sku_str'] = BENCHMARK_PARAMS.sku
+    return filter_args
+
+def _write(sheets, output_dir, name, output_format):
+    """Write results like SPModule does, returning seconds"""
+    path = os.path.join(output_dir, "{0}.{1}".format(name, output_extension(output_format, len(sheets))))
+    started = time.perf_counter()
+    if sheets:
+        write_results(sheets, path, output_format)
+    return time.perf_counter() - started
+
+def bench_screens(screen_names, parsed, executor, output_dir, output_format, name):
+    """Benchmark single-sheet screens on already parsed sheets
+
+    Chunks are copied before filtering so indexes cached on them by an
+    earlier function do not make later ones look faster.
+    """
+    screens_by_sheet = {}
+    for screen_name in screen_names:
+        sheet_name, filter_func, threshold_names = SP_SCREENS[screen_name]
+        screens_by_sheet.setdefault(sheet_name, []).append(
+            (screen_name, filter_func, _screen_args(threshold_names))
+        )
+
+    parse_seconds = filter_seconds = 0.0
+    results = {screen_name: [] for screen_name in screen_names}
+    rows = 0
+    for sheet_name, screens in screens_by_sheet.items():
+        chunks, seconds = parsed[sheet_name]
+        parse_seconds += seconds
+        rows += sum(len(chunk) for chunk in chunks)
+        # Copies have empty frame caches, so every run times building its own indexes
+        fresh = [chunk.copy() for chunk in chunks]
+        started = time.perf_counter()
+        for chunk_results, _ in executor.map(_filter_chunk, fresh, screens):
+            for screen_name, result in chunk_results.items():
+                if result is not None:
+                    results[screen_name].append(result)
+        filter_seconds += time.perf_counter() - started
+
+    started = time.perf_counter()
+    sheets = {
+        screen_name: pd.concat(frames, ignore_index=True)
+        for screen_name, frames in results.items() if frames
+    }
+    filter_seconds += time.perf_counter() - started
+
+    return {
+        'input_rows': rows,
+        'output_rows': sum(len(frame) for frame in sheets.values()),
+        'parse_seconds': parse_seconds,
+        'filter_seconds': filter_seconds,
+        'write_seconds': _write(sheets, output_dir, name, output_format),
+    }
+
+def bench_descent(new_path, old_path, parsed, output_dir, output_format):
+    """Benchmark SP花费下降 with an uploaded old file"""
+    new_chunks, new_seconds = parsed[CAMPAIGN_SHEET]
+    old_chunks, old_seconds = _parse(old_path, CAMPAIGN_SHEET)
+    started = time.perf_counter()
+    # Copies, so the partitions are built here rather than served from earlier runs
+    new_campaigns = pd.concat([entity_rows(chunk.copy(), CAMPAIGN_ENTITY) for chunk in new_chunks])
+    old_campaigns = pd.concat([entity_rows(chunk, CAMPAIGN_ENTITY) for chunk in old_chunks])
+    result = filter.sp_descent(old_campaigns, new_campaigns, BENCHMARK_PARAMS.spend, BENCHMARK_PARAMS.sku)
+    filter_seconds = time.perf_counter() - started
+    sheets = {'Sheet1': result} if not result.empty else {}
+    return {
+        'input_rows': sum(len(chunk) for chunk in new_chunks) + sum(len(chunk) for chunk in old_chunks),
+        'output_rows': len(result),
+        'parse_seconds': new_seconds + old_seconds,
+        'filter_seconds': filter_seconds,
+        'write_seconds': _write(sheets, output_dir, 'SP花费下降', output_format),
+    }
+
+def run_size(n_rows, functions, data_dir, backend, output_format, seed):
+    """Benchmark every function on a workbook of n_rows campaign sheet rows
+
+    Each sheet is parsed once per size; functions reading the same sheet
+    report the same parse time.
+    """
+    path = workbook_path(data_dir, n_rows, seed)
+    parsed = {}
+    sheet_names = {CAMPAIGN_SHEET} | {SP_SCREENS[name][0] for name in SP_SCREENS}
+    for sheet_name in sorted(sheet_names):
+        parsed[sheet_name] = _parse(path, sheet_name)
+        print("Parsed '{0}' of {1} rows in {2:.2f}s".format(sheet_name, n_rows, parsed[sheet_name][1]))
+
+    executor = ChunkExecutor(backend)
+    results = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for name_cn, function_name in functions.items():
+            if function_name == 'sp_descent_screen':
+                timing = bench_descent(path, workbook_path(data_dir, n_rows, seed + 1), parsed, output_dir, output_format)
+            elif function_name == 'sp_all_screen':
+                timing = bench_screens(list(SP_SCREENS), parsed, executor, output_dir, output_format, name_cn)
+            elif name_cn in SP_SCREENS:
+                timing = bench_screens([name_cn], parsed, executor, output_dir, output_format, name_cn)
+            else:
+                print("No benchmark for {0}".format(name_cn))
+                continue
+            timing.update({'function': name_cn, 'method': function_name, 'rows': n_rows})
+            timing['total_seconds'] = timing['parse_seconds'] + timing['filter_seconds'] + timing['write_seconds']
+            print("{function} @ {rows}: parse {parse_seconds:.2f}s, filter {filter_seconds:.2f}s, "
+                  "write {write_seconds:.2f}s ({output_rows} rows)".format(**timing))
+            results.append(timing)
+    return results
+
+def compare(results, baseline_path):
+    """Print the change of each timing against an earlier result file"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(item['function'], item['rows']): item for item in json.load(f)['results']}
+    print("\nChange against {0}:".format(baseline_path))
+    for item in results:
+        before = baseline.get((item['function'], item['rows']))
+        if before is None:
+            continue
+        changes = []
+        for stage in ('parse', 'filter', 'write', 'total'):
+            key = stage + '_seconds'
+            if before[key] > 0:
+                changes.append("{0} {1:+.0%}".format(stage, item[key] / before[key] - 1))
+        print("{0} @ {1}: {2}".format(item['function'], item['rows'], ", ".join(changes)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SP screens on synthetic bulk files")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="Campaign sheet rows")
+    parser.add_argument('--functions', nargs='+', help="FUNCTION_MAPPING names, default all")
+    parser.add_argument('--backend', choices=EXECUTION_BACKENDS, default='inline')
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default=DEFAULT_OUTPUT_FORMAT)
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Where generated workbooks are kept")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON result file")
+    parser.add_argument('--baseline', help="Earlier JSON result file to compare with")
+    args = parser.parse_args(argv)
+
+    functions = FUNCTION_MAPPING
+    if args.functions:
+        functions = {name: functions[name] for name in args.functions}
+
+    results = []
+    for n_rows in args.sizes:
+        results.extend(run_size(n_rows, functions, args.data_dir, args.backend, args.output_format, args.seed))
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'backend': args.backend,
+        'output_format': args.output_format,
+        'seed': args.seed,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print("Results saved to: {0}".format(args.output))
+
+    if args.baseline:
+        compare(results, args.baseline)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
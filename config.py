@@ -1,3 +1,9 @@
+import os
+from collections import namedtuple
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))  # Application directory, which data paths are anchored to
+
+# Default thresholds, used for every field a run does not set itself
 impress = None
 click = None
 click_rate = None
@@ -8,4 +14,28 @@ conversion = None
 acos = None
 cpc = None
 roas = None
-sku = None
\ No newline at end of file
+sku = None
+account = None  # Account campaign snapshots are stored under; None stores and reads no snapshots
+snapshot_date = None  # ISO date of the snapshot, None for today
+
+THRESHOLD_NAMES = ('impress', 'click', 'click_rate', 'spend', 'sales', 'order',
+                   'conversion', 'acos', 'cpc', 'roas')
+
+# Thresholds, SKU list and snapshot key of one optimization run. Instances
+# are immutable, so concurrent runs each screen with their own values.
+ScreenParams = namedtuple('ScreenParams', THRESHOLD_NAMES + ('sku', 'account', 'snapshot_date'))
+
+def screen_params(**values):
+    """Build the parameters of a run from the given values and the module defaults
+
+    Args:
+        **values: Thresholds or sku set for this run; None keeps the default
+
+    Returns:
+        ScreenParams: Parameters of the run
+    """
+    current = globals()
+    return ScreenParams(**{
+        name: values[name] if values.get(name) is not None else current[name]
+        for name in ScreenParams._fields
+    })
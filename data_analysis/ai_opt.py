@@ -1,3 +1,182 @@
-class AIOptimization:
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+from auto_adjust.sp import ScreenModule, CAMPAIGN_SHEET
+from auto_adjust.filters import enabled_rows
+from auto_adjust.sheet_index import portfolio_index, parse_sku_list
+from auto_adjust.metrics import stage_timer
+
+AI_LABEL = 'AI竞价优化'  # Output file suffix and metrics label
+TARGET_LEVELS = ('关键词', '商品定向')  # Bid-carrying rows the model recommends bids for
+DEFAULT_TARGET_ACOS = 0.3  # ACOS bids are steered to when the run sets no ACOS threshold
+MIN_CLICKS = 5  # Clicks a target needs before its bid is changed
+PRIOR_CLICKS = 20.0  # Weight, in clicks, of the campaign conversion rate in a target's estimate
+PRIOR_ORDERS = 3.0  # Weight, in orders, of the campaign order value in a target's estimate
+RIDGE_PENALTY = 10.0  # Pull of the fitted CPC elasticity towards PRIOR_ELASTICITY
+PRIOR_ELASTICITY = 1.0  # CPC proportional to bid
+ELASTICITY_RANGE = (0.3, 1.0)  # Elasticities outside this range are clipped
+MAX_BID_CHANGE = 0.3  # Largest relative bid change of one run
+MIN_BID = 0.02  # Lowest bid accepted by the bulk upload
+TOTAL_COLUMNS = ['点击量', '订单数量', '销量']
+
+def _values(frame, column):
+    return frame[column].to_numpy(dtype=float, na_value=np.nan)
+
+def _shrink(successes, trials, prior, weight):
+    """Estimate successes / trials, pulled towards prior with the given weight in trials"""
+    return (successes + weight * prior) / (trials + weight)
+
+class BidModel:
+    """Bid recommender fitted on the targets of a bulk file and the account's snapshots
+
+    Two parts, both fitted in one streaming pass over the sheet:
+    - A ridge regression of log CPC on log bid, weighted by clicks, gives
+      the CPC elasticity of the bid. The penalty pulls the slope towards
+      PRIOR_ELASTICITY, so sparse data cannot produce extreme bid changes.
+    - Conversion rate and order value per click are estimated per target
+      and shrunk towards its campaign, whose own rates come from the
+      current targets plus earlier snapshots and are shrunk towards the
+      account.
+
+    The bid that brings the expected ACOS of a target to the target ACOS is
+    then computed for whole batches of targets with NumPy.
+    """
+
+    def __init__(self, ridge_penalty=RIDGE_PENALTY):
+        self.ridge_penalty = ridge_penalty
+        self.xtx = np.zeros((2, 2))
+        self.xty = np.zeros(2)
+        self.samples = 0
+        self.campaign_parts = []
+        self.coef = None
+
+    def partial_fit(self, targets):
+        """Add a batch of targets to the normal equations and the campaign totals"""
+        bid = _values(targets, '竞价')
+        clicks = _values(targets, '点击量')
+        spend = _values(targets, '花费')
+        valid = (clicks > 0) & (bid > 0) & (spend > 0)
+        x = np.log(bid[valid])
+        y = np.log(spend[valid] / clicks[valid])
+        design = np.column_stack([np.ones_like(x), x])
+        weighted = design * clicks[valid][:, None]
+        self.xtx += weighted.T @ design
+        self.xty += weighted.T @ y
+        self.samples += int(valid.sum())
+        self.campaign_parts.append(
+            targets[TOTAL_COLUMNS].astype(float).groupby(targets['广告活动名称'].astype(str).to_numpy()).sum()
+        )
+
+    def fit(self, history=None):
+        """Solve the regression and compute the campaign priors
+
+        Args:
+            history (pd.DataFrame, optional): Campaign totals of earlier
+                snapshots, from SnapshotStore.campaign_totals
+
+        Returns:
+            BidModel: self
+        """
+        penalty = np.diag([0.0, self.ridge_penalty])
+        prior = np.array([0.0, PRIOR_ELASTICITY])
+        # The small identity term keeps the system solvable without samples
+        self.coef = np.linalg.solve(self.xtx + penalty + 1e-9 * np.eye(2), self.xty + penalty @ prior)
+
+        parts = list(self.campaign_parts)
+        if history is not None and not history.empty:
+            parts.append(history.set_index('广告活动名称')[TOTAL_COLUMNS].astype(float).fillna(0.0))
+        totals = pd.concat(parts).groupby(level=0).sum() if parts else pd.DataFrame(columns=TOTAL_COLUMNS)
+        clicks, orders, sales = (totals[column].sum() for column in TOTAL_COLUMNS)
+        self.account_rate = orders / clicks if clicks > 0 else 0.0
+        self.account_value = sales / orders if orders > 0 else 0.0
+        self.campaign_rate = _shrink(totals['订单数量'], totals['点击量'], self.account_rate, PRIOR_CLICKS)
+        self.campaign_value = _shrink(totals['销量'], totals['订单数量'], self.account_value, PRIOR_ORDERS)
+        return self
+
+    @property
+    def elasticity(self):
+        """Fitted CPC elasticity of the bid, clipped to ELASTICITY_RANGE"""
+        return float(np.clip(self.coef[1], *ELASTICITY_RANGE))
+
+    def recommend(self, targets, target_acos):
+        """Recommended bids of a batch of targets
+
+        Args:
+            targets (pd.DataFrame): Target rows with 竞价 and metrics
+            target_acos (float): ACOS the bids are steered to
+
+        Returns:
+            np.ndarray: New bids, NaN for targets with too few clicks or no bid
+        """
+        campaigns = targets['广告活动名称'].astype(str).to_numpy()
+        prior_rate = self.campaign_rate.reindex(campaigns).fillna(self.account_rate).to_numpy()
+        prior_value = self.campaign_value.reindex(campaigns).fillna(self.account_value).to_numpy()
+        bid = _values(targets, '竞价')
+        clicks = _values(targets, '点击量')
+        orders = _values(targets, '订单数量')
+        spend = _values(targets, '花费')
+        sales = _values(targets, '销量')
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            conversion = _shrink(orders, clicks, prior_rate, PRIOR_CLICKS)
+            order_value = _shrink(sales, orders, prior_value, PRIOR_ORDERS)
+            cpc = spend / clicks
+            target_cpc = target_acos * conversion * order_value
+            new_bid = bid * (target_cpc / cpc) ** (1.0 / self.elasticity)
+        new_bid = np.clip(new_bid, bid * (1 - MAX_BID_CHANGE), bid * (1 + MAX_BID_CHANGE))
+        new_bid = np.round(np.maximum(new_bid, MIN_BID), 2)
+        usable = (clicks >= MIN_CLICKS) & (bid > 0) & (cpc > 0) & np.isfinite(new_bid)
+        return np.where(usable, new_bid, np.nan)
+
+def enabled_targets(chunk, sku_str=None):
+    """Enabled keyword and product target rows of a chunk, optionally of some portfolios"""
+    parts = [enabled_rows(chunk, entity_level) for entity_level in TARGET_LEVELS]
+    targets = pd.concat(parts).sort_index()
+    sku_list = parse_sku_list(sku_str)
+    if sku_list and not targets.empty:
+        targets = targets[portfolio_index(targets).mask_for(sku_list)]
+    return targets
+
+class AIOptimization(ScreenModule):
+    """Model-based bid changes for the keywords and product targets of the bulk file"""
+
     def optimize_ads(self):
-        print("Optimizing ads using AI algorithms.")
+        """Fit a BidModel and write the changed bids as Update rows
+
+        The campaign sheet is read twice: once to fit the model and once,
+        from the sheet cache, to score the targets batch by batch. Earlier
+        snapshots only inform the campaign priors when the run names its
+        account.
+
+        Returns:
+            str: Path to the result file, None if no bid changed
+        """
+        if self.params.account:
+            history = self.snapshots.campaign_totals(self.params.account, self._snapshot_date())
+        else:
+            history = pd.DataFrame(columns=['广告活动名称'] + TOTAL_COLUMNS)
+        model = BidModel()
+        for chunk in self._read_sheet(CAMPAIGN_SHEET, AI_LABEL):
+            model.partial_fit(enabled_targets(chunk))
+        model.fit(history)
+        print("Bid model: CPC elasticity {0:.2f} from {1} targets, {2} campaigns in history".format(
+            model.elasticity, model.samples, len(history)
+        ))
+
+        target_acos = self.params.acos if self.params.acos is not None else DEFAULT_TARGET_ACOS
+        changed_parts = []
+        for chunk in self._read_sheet(CAMPAIGN_SHEET, AI_LABEL):
+            targets = enabled_targets(chunk, self.params.sku)
+            with stage_timer('predict', AI_LABEL, len(targets)) as timer:
+                new_bid = model.recommend(targets, target_acos)
+                bid = _values(targets, '竞价')
+                changed = ~np.isnan(new_bid) & (np.abs(new_bid - bid) >= 0.01)
+                rows = targets[changed].copy()
+                rows['操作'] = 'Update'
+                rows['竞价'] = new_bid[changed]
+                timer.rows_out = len(rows)
+            changed_parts.append(rows)
+
+        data = pd.concat(changed_parts) if changed_parts else pd.DataFrame()
+        print("Bid model changed {0} bids".format(len(data)))
+        return self._save_results(data, AI_LABEL)
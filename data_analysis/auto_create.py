@@ -1,11 +1,26 @@
 from auto_create.keyword import KeywordModule
 from auto_create.asin import ASINModule
+from auto_adjust.executor import DEFAULT_BACKEND
+from auto_adjust.writer import DEFAULT_OUTPUT_FORMAT
 
 class AutomatedCreation:
-    def __init__(self):
-        self.keyword_module = KeywordModule()
-        self.asin_module = ASINModule()
+    def __init__(self, file_path, params=None, backend=DEFAULT_BACKEND, output_format=DEFAULT_OUTPUT_FORMAT,
+                 progress=None):
+        self.keyword_module = KeywordModule(file_path, params, backend, output_format, progress)
+        self.asin_module = ASINModule(file_path, params, backend, output_format, progress)
 
-    def create_ads(self):
-        self.keyword_module.generate_keywords()
-        self.asin_module.create_asin_ads()
+    def create_ads(self, create_function=None):
+        """Run the selected creation function
+
+        Args:
+            create_function (str, optional): generate_keywords or create_asin_ads, None to
+                create nothing
+
+        Returns:
+            str: Path to the file of Create rows, None if nothing was written
+        """
+        if create_function == 'generate_keywords':
+            return self.keyword_module.generate_keywords()
+        if create_function == 'create_asin_ads':
+            return self.asin_module.create_asin_ads()
+        return None
@@ -1,19 +1,39 @@
 from .ai_opt import AIOptimization
 from .auto_create import AutomatedCreation
+from auto_adjust.executor import DEFAULT_BACKEND
+from auto_adjust.writer import DEFAULT_OUTPUT_FORMAT
 
 class DataAnalysis:
     """Main class for handling data analysis and optimization tasks"""
     
-    def __init__(self):
-        """Initialize analysis modules"""
-        self.automated_creation = AutomatedCreation()
-        self.ai_optimization = AIOptimization()
+    def __init__(self, file_path, params=None, backend=DEFAULT_BACKEND, output_format=DEFAULT_OUTPUT_FORMAT,
+                 progress=None):
+        """Initialize analysis modules
+        
+        Args:
+            file_path (str): Path to the input file for processing
+            params (config.ScreenParams, optional): Thresholds and SKU list of this run
+            backend (str): Chunk execution backend: thread, process or inline
+            output_format (str): Result file format: xlsx, csv or parquet
+            progress (callable, optional): Stage progress callback, see SPModule
+        """
+        self.automated_creation = AutomatedCreation(file_path, params, backend, output_format, progress)
+        self.ai_optimization = AIOptimization(file_path, params, backend, output_format, progress)
 
-    def analyze_all(self):
+    def analyze_all(self, create_function=None, ai_function=None):
         """Execute all analysis and optimization tasks
         
         This method runs both automated ad creation and AI-based optimization
         in sequence to ensure comprehensive analysis of the advertising data.
+        
+        Args:
+            create_function (str, optional): Creation function to run, see AutomatedCreation
+            ai_function (str, optional): AIOptimization method to run, None to skip it
+            
+        Returns:
+            list: Paths of the written result files
         """
-        self.automated_creation.create_ads()
-        self.ai_optimization.optimize_ads()
+        result_paths = [self.automated_creation.create_ads(create_function)]
+        if ai_function:
+            result_paths.append(self.ai_optimization.call_function(ai_function))
+        return [path for path in result_paths if path]
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import time
+import uuid
+import queue
+import threading
+
+JOB_WORKERS = 2  # Jobs running at the same time
+MAX_QUEUED_JOBS = 20  # Jobs allowed to wait; further submissions are rejected
+JOB_RETENTION_SECONDS = 1800  # Finished jobs are forgotten after this long
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+class QueueFullError(Exception):
+    """Raised when the job queue cannot accept more jobs"""
+
+class Job:
+    """State of one background optimization run"""
+
+    def __init__(self, func, args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.stage = None
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.files = {}  # Extra downloadable files of the job, e.g. its profile
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def report(self, stage, **info):
+        """Record progress of a stage, e.g. report('filter', sheet=..., rows=...)
+
+        Args:
+            stage (str): Stage name such as parse, filter or write
+            **info: Counters describing the progress of the stage
+        """
+        with self._lock:
+            self.stage = stage
+            self.progress.setdefault(stage, {}).update(info)
+
+    def to_dict(self):
+        """JSON-serializable snapshot of the job state"""
+        with self._lock:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'stage': self.stage,
+                'progress': {stage: dict(info) for stage, info in self.progress.items()},
+                'error': self.error,
+                'files': sorted(self.files),
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+            }
+
+class JobQueue:
+    """Bounded queue of optimization jobs executed by a fixed pool of worker threads
+
+    At most JOB_WORKERS jobs run at once; up to MAX_QUEUED_JOBS wait in
+    line, so a burst of uploads queues up instead of exhausting memory.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_queued=MAX_QUEUED_JOBS):
+        """Initialize queue
+
+        Args:
+            workers (int): Number of worker threads
+            max_queued (int): Maximum number of waiting jobs
+        """
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._work, name="job-worker-{0}".format(number))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(job, *args, **kwargs) for background execution
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            QueueFullError: If MAX_QUEUED_JOBS jobs are already waiting
+        """
+        self._start_workers()
+        self._forget_finished()
+        job = Job(func, args, kwargs)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise QueueFullError("Too many queued jobs, please retry later")
+        return job
+
+    def get(self, job_id):
+        """Return the job with the given id, or None if unknown"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _forget_finished(self):
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at and now - job.finished_at > JOB_RETENTION_SECONDS
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with job._lock:
+                job.status = RUNNING
+                job.started_at = time.time()
+            try:
+                result = job.func(job, *job.args, **job.kwargs)
+                with job._lock:
+                    job.result = result
+                    job.status = DONE
+            except Exception as e:
+                print("Job {0} failed: {1}".format(job.id, e))
+                with job._lock:
+                    job.error = str(e)
+                    job.status = FAILED
+            finally:
+                with job._lock:
+                    job.finished_at = time.time()
+                self._queue.task_done()
@@ -2,17 +2,29 @@
 import os
 import time
 import config
+import cProfile
 import asyncio
 import threading
-from datetime import datetime, timedelta
-from flask import Flask, render_template, request, send_file, Response
-from werkzeug.utils import secure_filename
-from auto_adjust.auto_adjust import AutomationAdjustment
-from data_analysis.data_analysis import DataAnalysis
+from datetime import datetime
+from flask import Flask, render_template, request, send_file, Response, jsonify, url_for
+from auto_adjust.sheet_cache import SHEET_CACHE_DIR, add_entry_listener
+from auto_adjust.executor import EXECUTION_BACKENDS, DEFAULT_BACKEND
+from auto_adjust.writer import OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT
+from auto_adjust.metrics import stage_timer, render_metrics
+from optimization import AmazonAdOptimizationSystem
+from jobs import JobQueue, QueueFullError, DONE, FAILED
+from uploads import UploadStore, UploadError
+from storage import StorageIndex, DEFAULT_QUOTA_BYTES, remove_path
 
 # File cleanup configuration
 UPLOAD_FOLDER = 'uploads'  # Directory for saving uploaded files
 FILE_RETENTION_HOURS = 0.5  # File retention time in hours
+UPLOAD_QUOTA_BYTES = int(os.environ.get('UPLOAD_QUOTA_BYTES', DEFAULT_QUOTA_BYTES))  # Disk quota of UPLOAD_FOLDER
+CLEANUP_MAX_SLEEP = 60  # Longest wait of the cleanup thread between expiry checks, in seconds
+
+# Profiling configuration
+PROFILE_ALL_RUNS = os.environ.get('PROFILE_ALL_RUNS') == '1'  # Admin toggle: profile every run, not only flagged ones
+PROFILE_FLAG_VALUES = ('1', 'on', 'true')  # Values of the profile form field or query argument enabling profiling
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
@@ -24,31 +36,26 @@ if not os.path.exists(UPLOAD_FOLDER):
 # Create async lock for file operations
 file_lock = asyncio.Lock()
 
-# Function name mapping for different optimization tasks
-FUNCTION_MAPPING = {
-    "SP商品筛选": "sp_product_screen",
-    "SP投放商品筛选": "sp_advertise_screen",
-    "SP投放关键词筛选": "sp_keyword_screen",
-    "SP竞价调整": "sp_pos_screen",
-    "SP搜索词筛选": "sp_word_screen",
-    "SP无效筛选": "sp_invalid_screen",
-    "SP花费下降": "sp_descent_screen"
-}
-
-class AmazonAdOptimizationSystem:
-    """Main system class for Amazon ad optimization"""
-    
-    def __init__(self, file_path):
-        self.file_path = file_path
-        self.automation_adjustment = AutomationAdjustment(self.file_path)
-        self.data_analysis = DataAnalysis()
-
-    def run_optimization(self, sp_function=None, file_path_old=None, file_path_new=None):
-        """Run optimization process with specified function"""
-        actual_function_name = FUNCTION_MAPPING.get(sp_function)
-        if actual_function_name:
-            self.automation_adjustment.adjust_all(actual_function_name, file_path_old, file_path_new)
-            self.data_analysis.analyze_all()
+# Optimization runs are executed in the background by a bounded worker pool
+job_queue = JobQueue()
+
+# Uploads are stored once per content and linked into UPLOAD_FOLDER
+upload_store = UploadStore(UPLOAD_FOLDER)
+
+# Uploads, results and sheet cache entries, ordered by expiry and by last use
+storage_index = StorageIndex(FILE_RETENTION_HOURS * 3600, UPLOAD_QUOTA_BYTES)
+
+# One profiled run at a time; newer Pythons allow a single active profiler per process
+profile_lock = threading.Lock()
+
+def track_cache_entry(entry, created):
+    """Register new sheet cache entries with the storage index and refresh used ones"""
+    if created:
+        storage_index.track(entry, time.time())
+    else:
+        storage_index.touch(entry, time.time())
+
+add_entry_listener(track_cache_entry)
 
 def validate_threshold(value, value_type, min_val=None, max_val=None):
     """Validate input threshold values
@@ -76,21 +83,155 @@ def validate_threshold(value, value_type, min_val=None, max_val=None):
         print("Threshold validation error: {0}".format(e))
         return None
 
+def validate_date(value):
+    """Validate an ISO date (YYYY-MM-DD) from the form
+
+    Returns:
+        str: The date, or None if empty or invalid
+    """
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date().isoformat()
+    except ValueError as e:
+        print("Date validation error: {0}".format(e))
+        return None
+
+def run_profiled(job, profile_path, func, *args):
+    """Call func under cProfile and save the stats as the job's profile, also when it fails
+
+    The profile covers the job thread; chunks filtered by thread or process
+    workers show up as time spent waiting on the executor, so profile with
+    the inline backend to see the filters themselves.
+
+    Args:
+        job (Job): The running job, gets the profile in job.files
+        profile_path (str): Where to save the stats in pstats format
+        func (callable): Function to profile
+        *args: Arguments for func
+
+    Returns:
+        The return value of func
+    """
+    with profile_lock:
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args)
+        finally:
+            profiler.dump_stats(profile_path)
+            storage_index.track(profile_path, time.time())
+            job.files['profile'] = profile_path
+
+def run_optimization_job(job, params, file_path_new, file_path_old, backend, output_format, sp_function_name_cn,
+                         profile=False, sb_function_name_cn=None, sd_function_name_cn=None,
+                         create_function_name_cn=None, ai_function_name_cn=None):
+    """Run one optimization in a job worker
+
+    The inputs are staged under the job's id, so the results, written next
+    to the input, are named after the job and concurrent jobs on files of
+    the same name never overwrite each other.
+
+    Args:
+        job (Job): The running job, receives stage progress
+        params (config.ScreenParams): Thresholds and SKU list from the form
+        file_path_new (str): Path of the uploaded bulk file
+        file_path_old (str): Path of the comparison file, or None
+        backend (str): Chunk execution backend
+        output_format (str): Result file format
+        sp_function_name_cn (str): Selected SP function
+        profile (bool): Save a cProfile profile of the run next to the result
+        sb_function_name_cn (str, optional): Selected SB screen, None to skip SB
+        sd_function_name_cn (str, optional): Selected SD screen, None to skip SD
+        create_function_name_cn (str, optional): Selected creation function, None to create nothing
+        ai_function_name_cn (str, optional): Selected AI optimization, None to skip it
+
+    Returns:
+        str: Path to the result file, None if nothing was written
+    """
+    staged = []
+    try:
+        staged_new = upload_store.stage(file_path_new, job.id)
+        staged.append(staged_new)
+        staged_old = None
+        if file_path_old:
+            staged_old = upload_store.stage(file_path_old, job.id)
+            staged.append(staged_old)
+        optimization_system = AmazonAdOptimizationSystem(staged_new, params, backend, output_format, job.report)
+        run_args = (
+            sp_function_name_cn, staged_old, staged_new,
+            sb_function_name_cn, sd_function_name_cn, create_function_name_cn, ai_function_name_cn
+        )
+        if profile:
+            profile_path = "{0}.pstats".format(os.path.splitext(staged_new)[0])
+            result_path = run_profiled(job, profile_path, optimization_system.run_optimization, *run_args)
+        else:
+            result_path = optimization_system.run_optimization(*run_args)
+        if result_path:
+            storage_index.track(result_path, time.time())
+        return result_path
+    finally:
+        for path in staged:
+            upload_store.remove(path)
+        storage_index.unpin([file_path_new, file_path_old])
+
+def track_upload(file_path):
+    """Register a saved upload with the storage index"""
+    if file_path:
+        storage_index.track(file_path, time.time(), upload_store.remove)
+    return file_path
+
+def index_existing_files():
+    """Register files left in UPLOAD_FOLDER by a previous run, once at startup
+
+    Their retention period counts from their modification time, as before
+    the storage index existed. Uploads are removed through the upload
+    store, so their blobs are released with their last link.
+    """
+    upload_store.remove_leftovers()
+    uploads = set(upload_store.restore_links())
+    cache_root = os.path.join(UPLOAD_FOLDER, SHEET_CACHE_DIR)
+    now = time.time()
+    for folder in (UPLOAD_FOLDER, cache_root):
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if os.path.isfile(path) or folder == cache_root:
+                remove = upload_store.remove if path in uploads else remove_path
+                storage_index.track(path, now, remove, last_used=os.path.getmtime(path))
+
 def start_file_cleanup():
-    """Background thread for cleaning up old files"""
+    """Background thread deleting files as soon as their retention period ends"""
     while True:
+        wait = CLEANUP_MAX_SLEEP
         try:
-            now = datetime.now()
-            for filename in os.listdir(UPLOAD_FOLDER):
-                file_path = os.path.join(UPLOAD_FOLDER, filename)
-                if os.path.isfile(file_path):
-                    file_mtime = datetime.fromtimestamp(os.path.getmtime(file_path))
-                    if now - file_mtime > timedelta(hours=FILE_RETENTION_HOURS):
-                        os.remove(file_path)
-                        print("Deleted expired file: {0}".format(file_path))
+            now = time.time()
+            storage_index.remove_expired(now)
+            upload_store.remove_expired(FILE_RETENTION_HOURS * 3600, now)
+            next_expiry = storage_index.seconds_until_next_expiry(now)
+            if next_expiry is not None:
+                wait = min(max(next_expiry, 1), CLEANUP_MAX_SLEEP)
         except Exception as e:
             print("Error during file cleanup: {0}".format(e))
-        time.sleep(600)  # Check every 10 minutes
+        time.sleep(wait)
+
+def uploaded_file_path(file_field, upload_field):
+    """Save the file posted in file_field, or find the chunked upload named by upload_field
+
+    Returns:
+        str: Path of the upload, None if neither field holds a file
+    """
+    upload_id = request.form.get(upload_field)
+    if upload_id:
+        session = upload_store.get(upload_id)
+        return session.path if session is not None else None
+
+    file = request.files.get(file_field)
+    if file and file.filename:
+        with stage_timer('upload'):
+            path = upload_store.save(file)
+        return track_upload(path)
+    return None
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -110,62 +251,156 @@ def index():
             "roas_threshold": ("roas", float, 0.0, None),
         }
 
-        # Update configuration with validated threshold values
+        # Collect validated thresholds and SKU list as parameters of this run
+        threshold_values = {}
         for field, (config_attr, value_type, min_val, max_val) in thresholds.items():
             field_value = validate_threshold(request.form.get(field), value_type, min_val, max_val)
             if field_value:
-                setattr(config, config_attr, field_value)
-
-        # Update SKU if provided
+                threshold_values[config_attr] = field_value
         sku = request.form.get('sku')
-        if sku:
-            config.sku = str(sku)
+        params = config.screen_params(
+            sku=str(sku) if sku else None,
+            account=request.form.get('account', '').strip() or None,
+            snapshot_date=validate_date(request.form.get('snapshot_date')),
+            **threshold_values
+        )
 
-        # Handle file uploads
-        if 'file' not in request.files:
+        # Handle file uploads, either posted with the form or finished through /uploads
+        file_path_new = uploaded_file_path('file', 'upload_id')
+        if not file_path_new:
             return "Please select a file!"
 
-        file_new = request.files['file']
-        file_old = request.files.get('file_old')
+        # Old file is optional
+        file_path_old = uploaded_file_path('file_old', 'upload_id_old')
 
-        if not file_new.filename:
-            return "Please select a file!"
+        # Queue optimization
+        backend = request.form.get('backend', DEFAULT_BACKEND)
+        if backend not in EXECUTION_BACKENDS:
+            backend = DEFAULT_BACKEND
+        output_format = request.form.get('output_format', DEFAULT_OUTPUT_FORMAT)
+        if output_format not in OUTPUT_FORMATS:
+            output_format = DEFAULT_OUTPUT_FORMAT
+        sp_function_name_cn = request.form.get('sp_function')
+        sb_function_name_cn = request.form.get('sb_function') or None
+        sd_function_name_cn = request.form.get('sd_function') or None
+        create_function_name_cn = request.form.get('create_function') or None
+        ai_function_name_cn = request.form.get('ai_function') or None
+        profile = PROFILE_ALL_RUNS or request.values.get('profile', '').lower() in PROFILE_FLAG_VALUES
+        # Inputs stay on disk until the job is done; run_optimization_job unpins them
+        storage_index.pin([file_path_new, file_path_old], time.time(), upload_store.remove)
+        try:
+            job = job_queue.submit(
+                run_optimization_job, params, file_path_new, file_path_old,
+                backend, output_format, sp_function_name_cn, profile,
+                sb_function_name_cn, sd_function_name_cn, create_function_name_cn, ai_function_name_cn
+            )
+        except QueueFullError:
+            storage_index.unpin([file_path_new, file_path_old])
+            return render_template('index.html', message="任务队列已满，请稍后再试"), 503
 
-        # Save new file
-        filename_new = secure_filename(file_new.filename)
-        file_path_new = os.path.join(UPLOAD_FOLDER, filename_new)
-        file_new.save(file_path_new)
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify(job_id=job.id, status_url=url_for('job_status', job_id=job.id)), 202
+        return render_template('index.html', job_id=job.id)
 
-        # Save old file if provided
-        file_path_old = None
-        if file_old and file_old.filename:
-            filename_old = secure_filename(file_old.filename)
-            file_path_old = os.path.join(UPLOAD_FOLDER, filename_old)
-            file_old.save(file_path_old)
+    return render_template('index.html')
 
-        # Run optimization
-        optimization_system = AmazonAdOptimizationSystem(file_path_new)
-        sp_function_name_cn = request.form.get('sp_function')
-        optimization_system.run_optimization(sp_function_name_cn, file_path_old, file_path_new)
+@app.route('/uploads', methods=['POST'])
+def start_upload():
+    """Start a chunked upload
 
-        # Generate download link
-        base_name = file_path_new.rsplit('.', 1)[0]
-        new_file_path = "{0}_{1}.xlsx".format(base_name, sp_function_name_cn)
-        return render_template('index.html', download_link=new_file_path)
+    Expects filename, size and optionally sha256 as form fields. The
+    sha256 is checked against the uploaded data once all chunks arrived.
+    """
+    try:
+        session = upload_store.start(
+            request.form.get('filename'), int(request.form.get('size', -1)), request.form.get('sha256')
+        )
+    except (UploadError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(session.to_dict()), 201
 
-    return render_template('index.html')
+@app.route('/uploads/<upload_id>', methods=['GET', 'PUT'])
+def upload_chunk(upload_id):
+    """Report the offset of a chunked upload, or append the request body at ?offset=
+
+    The body is streamed to disk; after a failed chunk the client asks for
+    the current offset with GET and resends from there.
+    """
+    session = upload_store.get(upload_id)
+    if session is None:
+        return jsonify(error="Unknown upload"), 404
+    if request.method == 'PUT':
+        try:
+            if upload_store.append(session, int(request.args.get('offset', -1)), request.stream).path:
+                track_upload(session.path)
+        except (UploadError, ValueError) as e:
+            status = session.to_dict()
+            status['error'] = str(e)
+            return jsonify(status), 409
+    return jsonify(session.to_dict())
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report status, stage progress and download link of a queued optimization"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error="Unknown job"), 404
+    status = job.to_dict()
+    if job.status == DONE:
+        if job.result:
+            status['download_link'] = url_for('job_result', job_id=job_id)
+        else:
+            status['message'] = "没有符合条件的数据"
+    if 'profile' in job.files:
+        status['profile_link'] = url_for('job_profile', job_id=job_id)
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Download the result file of a finished optimization"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error="Unknown job"), 404
+    if job.status != DONE:
+        return jsonify(job.to_dict()), 409
+    if not job.result:
+        return jsonify(message="没有符合条件的数据"), 404
+    return download_file(os.path.basename(job.result))
+
+@app.route('/jobs/<job_id>/profile', methods=['GET'])
+def job_profile(job_id):
+    """Download the cProfile stats of a profiled optimization
+
+    The file is in pstats format, readable with pstats.Stats, snakeviz or
+    flameprof.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error="Unknown job"), 404
+    if 'profile' not in job.files:
+        if job.status in (DONE, FAILED):
+            return jsonify(error="Job was not profiled"), 404
+        return jsonify(job.to_dict()), 409
+    return download_file(os.path.basename(job.files['profile']))
 
 @app.route('/download/<path:filename>', methods=['GET'])
 def download_file(filename):
     """Handle file downloads"""
     file_path = os.path.join(UPLOAD_FOLDER, os.path.basename(filename))
+    storage_index.touch(file_path, time.time())
     try:
         return send_file(file_path, as_attachment=True)
     except Exception as e:
         return "Download failed: {0}".format(e), 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage durations, row counts, RSS growth per stage and peak RSS in the Prometheus text format"""
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 if __name__ == '__main__':
     # Start background cleanup thread
+    index_existing_files()
     cleanup_thread = threading.Thread(target=start_file_cleanup)
     cleanup_thread.daemon = True
     cleanup_thread.start()
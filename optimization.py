@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import os
+from auto_adjust.auto_adjust import AutomationAdjustment
+from auto_adjust.executor import DEFAULT_BACKEND
+from auto_adjust.writer import DEFAULT_OUTPUT_FORMAT, bundle_results
+from data_analysis.data_analysis import DataAnalysis
+
+# Function name mapping for different optimization tasks
+FUNCTION_MAPPING = {
+    "SP商品筛选": "sp_product_screen",
+    "SP投放商品筛选": "sp_advertise_screen",
+    "SP投放关键词筛选": "sp_keyword_screen",
+    "SP竞价调整": "sp_pos_screen",
+    "SP搜索词筛选": "sp_word_screen",
+    "SP无效筛选": "sp_invalid_screen",
+    "SP花费下降": "sp_descent_screen",
+    "SP全部筛选": "sp_all_screen"
+}
+
+# SB screens run over the Sponsored Brands sheet of the same bulk file
+SB_FUNCTION_MAPPING = {
+    "SB无单暂停": "sb_pause_screen",
+    "SB高ACOS降价": "sb_bid_down_screen",
+    "SB优胜提价": "sb_promote_screen",
+    "SB全部筛选": "sb_all_screen"
+}
+
+# SD screens run over the Sponsored Display sheet of the same bulk file
+SD_FUNCTION_MAPPING = {
+    "SD无单暂停": "sd_pause_screen",
+    "SD受众降价": "sd_audience_bid_down_screen",
+    "SD可见展示浪费": "sd_viewable_waste_screen",
+    "SD全部筛选": "sd_all_screen"
+}
+
+# Creation functions writing bulk Create rows
+CREATE_FUNCTION_MAPPING = {
+    "关键词收割": "generate_keywords",
+    "ASIN投放": "create_asin_ads"
+}
+
+# Model-based optimizations writing Update rows
+AI_FUNCTION_MAPPING = {
+    "AI竞价优化": "optimize_ads"
+}
+
+class AmazonAdOptimizationSystem:
+    """Main system class for Amazon ad optimization"""
+    
+    def __init__(self, file_path, params=None, backend=DEFAULT_BACKEND, output_format=DEFAULT_OUTPUT_FORMAT,
+                 progress=None):
+        self.file_path = file_path
+        self.automation_adjustment = AutomationAdjustment(self.file_path, params, backend, output_format, progress)
+        self.data_analysis = DataAnalysis(self.file_path, params, backend, output_format, progress)
+
+    def run_optimization(self, sp_function=None, file_path_old=None, file_path_new=None, sb_function=None,
+                         sd_function=None, create_function=None, ai_function=None):
+        """Run optimization process with specified functions
+        
+        Returns:
+            str: Path to the result file, a zip archive when several modules
+                wrote results, None if nothing was written
+        """
+        actual_function_name = FUNCTION_MAPPING.get(sp_function)
+        sb_function_name = SB_FUNCTION_MAPPING.get(sb_function)
+        sd_function_name = SD_FUNCTION_MAPPING.get(sd_function)
+        create_function_name = CREATE_FUNCTION_MAPPING.get(create_function)
+        ai_function_name = AI_FUNCTION_MAPPING.get(ai_function)
+        if not any((actual_function_name, sb_function_name, sd_function_name, create_function_name, ai_function_name)):
+            return None
+        result_paths = self.automation_adjustment.adjust_all(
+            actual_function_name, file_path_old, file_path_new, sb_function_name, sd_function_name
+        )
+        result_paths += self.data_analysis.analyze_all(create_function_name, ai_function_name)
+        if len(result_paths) > 1:
+            base_name = os.path.splitext(self.file_path)[0]
+            names = [name for name in (sp_function, sb_function, sd_function, create_function, ai_function) if name]
+            return bundle_results(result_paths, "{0}_{1}.zip".format(base_name, "_".join(names)))
+        return result_paths[0] if result_paths else None
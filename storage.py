@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+import os
+import heapq
+import shutil
+import threading
+from collections import OrderedDict
+
+DEFAULT_QUOTA_BYTES = 20 * 1024 ** 3  # Upload folder size before least recently used files are evicted
+
+def disk_size(path):
+    """Size in bytes of a file, or of all files below a directory"""
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(dir_path, name))
+            for dir_path, _, names in os.walk(path) for name in names
+        )
+    return os.path.getsize(path)
+
+def remove_path(path):
+    """Delete a file or a directory tree"""
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+class _Entry:
+    __slots__ = ('path', 'size', 'deadline', 'pins', 'remove')
+
+    def __init__(self, path, size, deadline, remove):
+        self.path = path
+        self.size = size
+        self.deadline = deadline
+        self.pins = 0
+        self.remove = remove
+
+class StorageIndex:
+    """Expiry and quota bookkeeping for uploads, results and sheet cache entries
+
+    Files are registered when they are created and touched when they are
+    used, so cleanup never has to list the upload folder:
+
+    - A heap ordered by deadline finds expired files in O(log n) each.
+      Touching a file pushes a new heap item; outdated items are skipped
+      when they reach the top.
+    - An ordered dict keeps files from least to most recently used; when
+      the tracked bytes exceed the quota, files are evicted from its front.
+    - Pinned files (inputs of queued or running jobs) are neither expired
+      nor evicted until they are unpinned.
+
+    Hardlinked uploads are counted once per link, so the quota errs on the
+    safe side.
+    """
+
+    def __init__(self, retention_seconds, quota_bytes=DEFAULT_QUOTA_BYTES):
+        """Initialize index
+
+        Args:
+            retention_seconds (float): Time a file is kept after its last use
+            quota_bytes (int): Maximum bytes kept before evicting by least recent use
+        """
+        self.retention_seconds = retention_seconds
+        self.quota_bytes = quota_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._deadlines = []
+        self._lock = threading.RLock()
+
+    def track(self, path, now, remove=remove_path, last_used=None):
+        """Register a new or rewritten file and restart its retention period
+
+        Args:
+            path (str): File or directory to track
+            now (float): Current timestamp
+            remove (callable): Called with path to delete it
+            last_used (float, optional): Time of last use, defaults to now
+        """
+        with self._lock:
+            self._track(path, remove, last_used if last_used is not None else now)
+            self._enforce_quota()
+
+    def _track(self, path, remove, last_used):
+        try:
+            size = disk_size(path)
+        except OSError:
+            return None
+        entry = self._entries.get(path)
+        if entry is None:
+            entry = _Entry(path, 0, None, remove)
+            self._entries[path] = entry
+        self.total_bytes += size - entry.size
+        entry.size = size
+        entry.remove = remove
+        self._refresh(entry, last_used)
+        return entry
+
+    def touch(self, path, now):
+        """Mark a tracked file as used, restarting its retention period"""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                self._refresh(entry, now)
+
+    def _refresh(self, entry, now):
+        entry.deadline = now + self.retention_seconds
+        self._entries.move_to_end(entry.path)
+        heapq.heappush(self._deadlines, (entry.deadline, entry.path))
+
+    def pin(self, paths, now, remove=remove_path):
+        """Keep files from expiring or being evicted while a job uses them
+
+        Args:
+            paths (list): Paths used by the job; None values are ignored
+            now (float): Current timestamp
+            remove (callable): Called with path to delete a file that was not tracked yet
+        """
+        with self._lock:
+            for path in paths:
+                if path is None:
+                    continue
+                entry = self._entries.get(path) or self._track(path, remove, now)
+                if entry is not None:
+                    entry.pins += 1
+            self._enforce_quota()
+
+    def unpin(self, paths):
+        """Release pins taken with pin"""
+        with self._lock:
+            for path in paths:
+                entry = self._entries.get(path) if path is not None else None
+                if entry is None or entry.pins == 0:
+                    continue
+                entry.pins -= 1
+                if entry.pins == 0:
+                    # Expiry skipped the file while it was pinned; reschedule it
+                    heapq.heappush(self._deadlines, (entry.deadline, entry.path))
+            self._enforce_quota()
+
+    def remove_expired(self, now):
+        """Delete every unpinned file whose retention period has passed"""
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                deadline, path = heapq.heappop(self._deadlines)
+                entry = self._entries.get(path)
+                if entry is None or entry.deadline != deadline or entry.pins:
+                    continue  # Outdated heap item, or pinned and rescheduled on unpin
+                self._remove(entry)
+                print("Deleted expired file: {0}".format(path))
+
+    def seconds_until_next_expiry(self, now):
+        """Time until the earliest deadline, None when nothing is tracked"""
+        with self._lock:
+            while self._deadlines:
+                deadline, path = self._deadlines[0]
+                entry = self._entries.get(path)
+                if entry is not None and entry.deadline == deadline and not entry.pins:
+                    return max(deadline - now, 0)
+                heapq.heappop(self._deadlines)
+            return None
+
+    def _enforce_quota(self):
+        """Evict least recently used unpinned files until the quota is met"""
+        if self.total_bytes <= self.quota_bytes:
+            return
+        for entry in list(self._entries.values()):
+            if self.total_bytes <= self.quota_bytes:
+                break
+            if entry.pins:
+                continue
+            self._remove(entry)
+            print("Evicted file over storage quota: {0}".format(entry.path))
+
+    def _remove(self, entry):
+        del self._entries[entry.path]
+        self.total_bytes -= entry.size
+        try:
+            entry.remove(entry.path)
+        except OSError as e:
+            print("Error removing {0}: {1}".format(entry.path, e))
@@ -39,7 +39,7 @@ def test_main_app_structure():
         print("✓ main.py syntax is correct")
         
         # Check for required functions
-        required_functions = ['validate_threshold', 'start_file_cleanup']
+        required_functions = ['validate_threshold', 'start_file_cleanup', 'run_optimization_job', 'job_status']
         for func in required_functions:
             if func in content:
                 print("✓ Function '{}' found".format(func))
@@ -66,6 +66,15 @@ def test_auto_adjust_module():
             'auto_adjust/auto_adjust.py',
             'auto_adjust/sp.py',
             'auto_adjust/filters.py',
+            'auto_adjust/sheet_cache.py',
+            'auto_adjust/sheet_index.py',
+            'auto_adjust/executor.py',
+            'auto_adjust/rules.py',
+            'auto_adjust/schema.py',
+            'auto_adjust/writer.py',
+            'auto_adjust/snapshots.py',
+            'auto_adjust/metrics.py',
+            'auto_adjust/dask_engine.py',
             'auto_adjust/sb.py',
             'auto_adjust/sd.py'
         ]
@@ -132,7 +141,8 @@ def test_function_mapping():
             "SP竞价调整": "sp_pos_screen",
             "SP搜索词筛选": "sp_word_screen",
             "SP无效筛选": "sp_invalid_screen",
-            "SP花费下降": "sp_descent_screen"
+            "SP花费下降": "sp_descent_screen",
+            "SP全部筛选": "sp_all_screen"
         }
         
         print("✓ Function mapping contains {} functions".format(len(function_mapping)))
@@ -171,6 +181,1467 @@ def test_directory_structure():
         print("✗ Error testing directory structure:", e)
         return False
 
+# Test 7: Vectorized bid adjustment matches row-by-row rules
+def _synthetic_bulk_rows(n_rows, seed=0):
+    """Build a synthetic 商品推广活动 sheet with mixed entity levels"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    enabled = np.array(["已启用", "已暂停"])
+    return pd.DataFrame({
+        "实体层级": np.array(["广告活动", "商品广告", "关键词", "商品定向", "竞价调整"])[rng.integers(0, 5, n_rows)],
+        "操作": None,
+        "状态": enabled[(rng.random(n_rows) < 0.1).astype(int)],
+        "广告活动状态（仅供参考）": enabled[(rng.random(n_rows) < 0.1).astype(int)],
+        "广告组状态（仅供参考）": enabled[(rng.random(n_rows) < 0.1).astype(int)],
+        "广告组合名称（仅供参考）": np.array(["SKU{0}".format(i) for i in range(50)])[rng.integers(0, 50, n_rows)],
+        "竞价": np.round(rng.uniform(0.1, 3.0, n_rows), 2),
+        "百分比": rng.integers(0, 400, n_rows).astype(float),
+        "花费": np.round(rng.uniform(0, 80, n_rows), 2),
+        "订单数量": rng.integers(0, 6, n_rows),
+        "转化率": np.round(rng.random(n_rows) * 0.4, 4),
+        "ACOS": np.round(rng.random(n_rows) * 0.8, 4),
+    })
+
+def test_vectorized_bid_adjustment():
+    """Check sp_ad/sp_pos against a row-by-row reference on 500k rows"""
+    try:
+        import numpy as np
+        import auto_adjust.filters as filters
+    except ImportError as e:
+        print("! Skipping vectorized bid adjustment test:", e)
+        return True
+
+    print("Testing vectorized bid adjustment...")
+    spend, order, acos, conversion = 20.0, 2, 0.4, 0.1
+    data = _synthetic_bulk_rows(500000)
+
+    # Reference: the original per-row if/elif rules of sp_ad
+    expected_ad = data.copy()
+    enabled = ((data["广告活动状态（仅供参考）"] == "已启用") & (data["广告组状态（仅供参考）"] == "已启用") &
+               (data["状态"] == "已启用")).to_numpy()
+    levels = data["实体层级"].to_numpy()
+    spends, orders = data["花费"].to_numpy(), data["订单数量"].to_numpy()
+    conversions, acoses = data["转化率"].to_numpy(), data["ACOS"].to_numpy()
+    bids, percentages = data["竞价"].to_numpy(), data["百分比"].to_numpy()
+    ad_rows, operations, states, new_bids = [], [], [], bids.copy()
+    for i in range(len(data)):
+        if not enabled[i] or levels[i] != "商品定向":
+            continue
+        if spends[i] > spend and orders[i] == 0:
+            states.append(i)
+        elif conversions[i] < conversion and spends[i] > spend and acoses[i] > acos:
+            new_bids[i] = bids[i] - 0.02
+        elif conversions[i] > conversion and acoses[i] < 0.30:
+            new_bids[i] = bids[i] + 0.03
+        else:
+            continue
+        ad_rows.append(i)
+    expected_ad.loc[ad_rows, "操作"] = "Update"
+    expected_ad.loc[states, "状态"] = "已暂停"
+    expected_ad["竞价"] = new_bids
+
+    result = filters.sp_ad(data.copy(), spend, order, acos, conversion, None)
+    assert list(result.index) == ad_rows, "sp_ad selected different rows"
+    assert result.equals(expected_ad.loc[ad_rows]), "sp_ad adjusted rows differently"
+    print("✓ sp_ad matches reference on {0} adjusted rows".format(len(ad_rows)))
+
+    # Reference: the original per-row if/elif rules of sp_pos
+    expected_pos = data.copy()
+    pos_rows, new_percentages = [], percentages.copy()
+    for i in range(len(data)):
+        if levels[i] != "竞价调整" or not spends[i] > spend:
+            continue
+        if conversions[i] < conversion and acoses[i] > acos:
+            new_percentages[i] = max(percentages[i] - 5.00, 0)
+        elif conversions[i] > conversion and acoses[i] < 0.25:
+            new_percentages[i] = percentages[i] + 10.00
+        else:
+            continue
+        pos_rows.append(i)
+    expected_pos.loc[pos_rows, "操作"] = "Update"
+    expected_pos["百分比"] = new_percentages
+
+    result = filters.sp_pos(data.copy(), spend, order, acos, conversion, None)
+    assert list(result.index) == pos_rows, "sp_pos selected different rows"
+    assert result.equals(expected_pos.loc[pos_rows]), "sp_pos adjusted rows differently"
+    print("✓ sp_pos matches reference on {0} adjusted rows".format(len(pos_rows)))
+    return True
+
+# Test 8: Rule masks are shared per frame and released with it
+def test_rule_compiler_cache():
+    """Check that equal rules share one mask and the frame cache dies with its frame"""
+    try:
+        import gc
+        import weakref
+        import numpy as np
+        from auto_adjust.rules import Predicate, equals, compiler_for
+        from auto_adjust.sheet_index import _frame_caches, entity_rows
+    except ImportError as e:
+        print("! Skipping rule compiler test:", e)
+        return True
+
+    print("Testing rule compiler cache...")
+    data = _synthetic_bulk_rows(1000)
+    rule = equals("状态", "已启用") & Predicate("ACOS", ">", 0.3)
+    mask = compiler_for(data).mask(rule)
+    expected = ((data["状态"] == "已启用") & (data["ACOS"] > 0.3)).to_numpy()
+    assert np.array_equal(mask, expected), "rule mask differs from pandas"
+    assert compiler_for(data).mask(equals("状态", "已启用") & Predicate("ACOS", ">", 0.3)) is mask, \
+        "equal rules were evaluated twice"
+    assert not mask.flags.writeable, "cached mask is writeable"
+    print("✓ Equal rules share one read-only mask")
+
+    keywords = entity_rows(data, "关键词")
+    compiler_for(keywords).mask(equals("状态", "已启用"))
+    frame_ref, partition_ref = weakref.ref(data), weakref.ref(keywords)
+    keys = (id(data), id(keywords))
+    del data, keywords
+    gc.collect()
+    assert frame_ref() is None and partition_ref() is None, "frame kept alive by its cache"
+    assert not any(key in _frame_caches for key in keys), "frame cache entries left after release"
+    print("✓ Frame caches are released with their frames")
+    return True
+
+# Test 9: Compact schema keeps currency exact and restores ratios for output
+def test_schema_downcast():
+    """Check apply_schema dtypes and restore_output_types"""
+    try:
+        import numpy as np
+        import pandas as pd
+        from auto_adjust.schema import apply_schema, restore_output_types
+    except ImportError as e:
+        print("! Skipping schema test:", e)
+        return True
+
+    print("Testing compact schema...")
+    chunk = pd.DataFrame({
+        "实体层级": ["关键词", "广告活动", "新层级"],
+        "状态": ["已启用", "已启用", "已启用"],
+        "花费": [16777217.0, 123456789.12, 0.5],
+        "销量": [98765432.1, 0.0, 20000001.0],
+        "ACOS": [0.0395, 0.5, None],
+        "点击量": [1, 200, 30000],
+        "展示量": [1.0, None, 33554433.0],
+        "订单数量": [0.0, None, 2.0],
+        "竞价": [1, 2, 3],
+    })
+    compact = apply_schema(chunk)
+    assert compact["竞价"].dtype == np.float64, "integer bids are not float64, so edited bids would not fit"
+    assert compact["花费"].dtype == np.float64 and compact["销量"].dtype == np.float64, "currency was downcast"
+    assert compact["花费"].tolist() == chunk["花费"].tolist(), "currency values changed"
+    assert compact["ACOS"].dtype == np.float32, "ratio was not downcast"
+    assert compact["点击量"].dtype == np.int16, "count was not downcast to int16"
+    assert compact["订单数量"].dtype == np.float32, "count with missing values is not float32"
+    assert compact["展示量"].iloc[2] == 33554433, "large count with missing values was rounded"
+    assert list(compact["状态"].cat.categories[:3]) == ["已启用", "已暂停", "已归档"], "declared categories missing"
+    assert "新层级" in compact["实体层级"].cat.categories, "observed category missing"
+    print("✓ Currency stays float64, ratios and counts are downcast")
+
+    restored = restore_output_types(compact)
+    assert restored["ACOS"].dtype == np.float64, "ratio was not widened"
+    assert restored["ACOS"].iloc[0] == 0.0395, "widened ratio is not its shortest decimal"
+    assert restored["花费"].tolist() == chunk["花费"].tolist(), "currency changed on output"
+    print("✓ restore_output_types widens ratios to their parsed decimals")
+    return True
+
+# Test 10: Result writers round-trip every output format
+def test_result_writers():
+    """Check write_results for xlsx, CSV and Parquet and bundle_results"""
+    try:
+        import zipfile
+        import tempfile
+        import pandas as pd
+        from auto_adjust.schema import apply_schema
+        from auto_adjust.writer import write_results, bundle_results, output_extension
+    except ImportError as e:
+        print("! Skipping result writer test:", e)
+        return True
+
+    print("Testing result writers...")
+    frame = apply_schema(pd.DataFrame({
+        "实体层级": ["关键词", "商品定向"] * 6000,
+        "操作": ["Update"] * 12000,
+        "竞价": [0.57, 1.2] * 6000,
+        "ACOS": [0.0395, None] * 6000,
+    }))
+    other = frame.head(3)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "result.xlsx")
+        write_results({"关键词": frame, "商品": other}, path, "xlsx")
+        workbook = pd.read_excel(path, sheet_name=None)
+        assert list(workbook) == ["关键词", "商品"], "xlsx sheets differ"
+        assert workbook["关键词"]["ACOS"].iloc[0] == 0.0395, "xlsx ratio not written as parsed"
+        assert len(workbook["关键词"]) == len(frame), "xlsx rows lost between batches"
+        print("✓ xlsx writes one sheet per result")
+
+        path = os.path.join(folder, "result.csv")
+        write_results({"关键词": frame}, path, "csv")
+        written = pd.read_csv(path, encoding="utf-8-sig")
+        assert len(written) == len(frame) and list(written.columns) == list(frame.columns), "CSV differs"
+        assert written["ACOS"].iloc[0] == 0.0395 and written["ACOS"].isna().iloc[1], "CSV values differ"
+
+        assert output_extension("csv", 2) == "zip" and output_extension("xlsx", 2) == "xlsx"
+        path = os.path.join(folder, "result.zip")
+        write_results({"关键词": frame, "商品": other}, path, "parquet")
+        with zipfile.ZipFile(path) as archive:
+            assert sorted(archive.namelist()) == ["关键词.parquet", "商品.parquet"], "zip members differ"
+            archive.extractall(folder)
+        written = pd.read_parquet(os.path.join(folder, "关键词.parquet"))
+        assert written["竞价"].tolist() == frame["竞价"].tolist(), "Parquet values differ"
+        assert sorted(os.listdir(folder)) == ["result.csv", "result.xlsx", "result.zip", "关键词.parquet", "商品.parquet"], \
+            "temporary part files left behind"
+        print("✓ CSV and Parquet write single files or a zip of sheets")
+
+        bundle = bundle_results([os.path.join(folder, "result.csv"), os.path.join(folder, "result.xlsx")],
+                                os.path.join(folder, "bundle.zip"))
+        with zipfile.ZipFile(bundle) as archive:
+            assert sorted(archive.namelist()) == ["result.csv", "result.xlsx"], "bundle members differ"
+        assert not os.path.exists(os.path.join(folder, "result.csv")), "bundled file not removed"
+        print("✓ bundle_results zips and removes module results")
+    return True
+
+# Test 11: Uploads and job inputs of the same file name get their own namespace
+def test_upload_namespaces():
+    """Check that uploads and staged job inputs never replace each other"""
+    try:
+        import io
+        import tempfile
+        from werkzeug.datastructures import FileStorage
+        from uploads import UploadStore
+    except ImportError as e:
+        print("! Skipping upload namespace test:", e)
+        return True
+
+    print("Testing upload namespaces...")
+    with tempfile.TemporaryDirectory() as folder:
+        store = UploadStore(folder)
+        first = store.save(FileStorage(io.BytesIO(b"first"), filename="bulk.xlsx"))
+        second = store.save(FileStorage(io.BytesIO(b"second"), filename="bulk.xlsx"))
+        assert first != second, "uploads of the same file name share a path"
+        assert os.path.basename(first).endswith("_bulk.xlsx"), "upload link lost its file name"
+        with open(first, "rb") as f:
+            assert f.read() == b"first", "second upload replaced the first"
+        print("✓ Uploads of the same file name keep separate files")
+
+        job_a = store.stage(first, "joba")
+        job_b = store.stage(first, "jobb")
+        assert os.path.basename(job_a) == "joba_bulk.xlsx" and job_a != job_b, "job inputs not namespaced"
+        assert os.path.samefile(job_a, first), "staged input is not a link to the upload"
+        store.remove(job_a)
+        store.remove(job_b)
+        assert os.path.exists(first) and os.path.exists(store.blob_path(_sha256(b"first"))), \
+            "removing staged inputs deleted the upload"
+        print("✓ Jobs stage their own links of an upload")
+    return True
+
+def _sha256(content):
+    import hashlib
+    return hashlib.sha256(content).hexdigest()
+
+# Test 12: Uploads are deduplicated by content and never trust a client hash
+def test_upload_dedup():
+    """Check UploadStore dedup, chunked uploads, digest checks and blob release"""
+    try:
+        import io
+        import tempfile
+        import threading
+        from werkzeug.datastructures import FileStorage
+        from uploads import UploadStore, UploadError
+    except ImportError as e:
+        print("! Skipping upload dedup test:", e)
+        return True
+
+    print("Testing upload deduplication...")
+    with tempfile.TemporaryDirectory() as root:
+        folder = os.path.join(root, "uploads")
+        with open(os.path.join(root, "secret.txt"), "wb") as f:
+            f.write(b"secret")
+        store = UploadStore(folder)
+        content = b"bulk file content" * 1000
+        saved = store.save(FileStorage(io.BytesIO(content), filename="bulk.xlsx"))
+
+        for digest in ("../../../secret.txt", "../" + "0" * 61, "g" * 64):
+            try:
+                store.start("x.txt", 6, digest)
+                assert False, "invalid digest {0} accepted".format(digest)
+            except UploadError:
+                pass
+        session = store.start("copy.xlsx", len(content), _sha256(content).upper())
+        assert session.path is None and session.offset == 0, "claimed hash completed the upload"
+        print("✓ Invalid digests are rejected and a claimed hash transfers the data")
+
+        store.append(session, 0, io.BytesIO(content[:5000]))
+        store.append(session, 5000, io.BytesIO(content[5000:]))
+        assert session.path is not None and os.path.samefile(session.path, saved), "chunked upload was not deduplicated"
+        assert os.listdir(store.partial_dir) == [], "partial upload left behind"
+
+        wrong = store.start("wrong.xlsx", 4, _sha256(b"abcd"))
+        try:
+            store.append(wrong, 0, io.BytesIO(b"abce"))
+            assert False, "upload not matching its hash was accepted"
+        except UploadError:
+            assert wrong.path is None and wrong.offset == 0, "mismatching upload did not start over"
+        store.append(wrong, 0, io.BytesIO(b"abcd"))
+        assert wrong.path is not None, "resent upload did not complete"
+        print("✓ Chunked uploads link to stored blobs and are checked against their hash")
+
+        blob = store.blob_path(_sha256(content))
+        store.remove(saved)
+        assert os.path.exists(blob), "blob deleted while another upload links to it"
+        store.remove(session.path)
+        assert not os.path.exists(blob), "unreferenced blob kept"
+        assert os.path.exists(os.path.join(root, "secret.txt")), "file outside the store deleted"
+        print("✓ Blobs are released with their last link")
+
+        # Remove the last link of a blob after a re-upload of it found the blob
+        first = store.save(FileStorage(io.BytesIO(content), filename="bulk.xlsx"))
+        has_blob = store.has_blob
+        remover = threading.Thread(target=store.remove, args=(first,))
+        def has_blob_then_remove(digest):
+            found = has_blob(digest)
+            remover.start()
+            remover.join(0.2)
+            return found
+        store.has_blob = has_blob_then_remove
+        second = store.save(FileStorage(io.BytesIO(content), filename="bulk.xlsx"))
+        remover.join()
+        assert os.path.exists(second) and os.path.exists(blob), "blob released while a re-upload linked it"
+        print("✓ A blob found by a re-upload keeps its content until linked")
+    return True
+
+# Test 13: Storage index expires, evicts and pins files
+def test_storage_index():
+    """Check StorageIndex expiry, LRU quota eviction, pinning and restored uploads"""
+    try:
+        import io
+        import tempfile
+        from werkzeug.datastructures import FileStorage
+        from storage import StorageIndex
+        from uploads import UploadStore
+    except ImportError as e:
+        print("! Skipping storage index test:", e)
+        return True
+
+    print("Testing storage index...")
+    with tempfile.TemporaryDirectory() as folder:
+        paths = []
+        for number in range(4):
+            paths.append(os.path.join(folder, "file{0}".format(number)))
+            with open(paths[-1], "wb") as f:
+                f.write(b"x" * 100)
+
+        index = StorageIndex(retention_seconds=10, quota_bytes=250)
+        index.track(paths[0], 0)
+        index.track(paths[1], 1)
+        index.pin([paths[0], None], 2)
+        index.touch(paths[1], 3)
+        index.track(paths[2], 4)
+        assert os.path.exists(paths[0]) and not os.path.exists(paths[1]), "quota did not evict the LRU unpinned file"
+        assert index.total_bytes == 200, "tracked bytes are off after eviction"
+        print("✓ Quota evicts least recently used unpinned files")
+
+        assert index.seconds_until_next_expiry(5) == 9, "next expiry ignores pinned files"
+        index.remove_expired(20)
+        assert os.path.exists(paths[0]) and not os.path.exists(paths[2]), "pinned file expired or other file kept"
+        index.unpin([paths[0]])
+        index.remove_expired(20)
+        assert not os.path.exists(paths[0]), "unpinned file did not expire"
+        assert index.seconds_until_next_expiry(20) is None and index.total_bytes == 0, "index not empty"
+        print("✓ Expiry skips pinned files until they are unpinned")
+
+        # Uploads left by an earlier run release their blob when evicted
+        uploads = os.path.join(folder, "uploads")
+        saved = UploadStore(uploads).save(FileStorage(io.BytesIO(b"bulk"), filename="bulk.xlsx"))
+        store = UploadStore(uploads)
+        store.remove_leftovers()
+        assert store.restore_links() == [saved], "earlier upload not restored"
+        index = StorageIndex(retention_seconds=10, quota_bytes=0)
+        index.track(saved, 0, store.remove)
+        assert not os.path.exists(saved), "upload over quota not evicted"
+        assert os.listdir(store.blob_dir) == ["partial"], "blob of evicted upload leaked"
+        print("✓ Restored uploads release their blob when evicted")
+
+        # An upload pinned before it was tracked is still removed through the store
+        saved = store.save(FileStorage(io.BytesIO(b"pinned"), filename="bulk.xlsx"))
+        index = StorageIndex(retention_seconds=10)
+        index.pin([saved], 0, store.remove)
+        index.unpin([saved])
+        index.remove_expired(20)
+        assert not os.path.exists(saved), "pinned upload did not expire"
+        assert os.listdir(store.blob_dir) == ["partial"], "blob of pinned upload leaked"
+        print("✓ Uploads pinned before tracking release their blob")
+    return True
+
+# Test 14: Campaign snapshots are stored per named account only
+def test_snapshot_store():
+    """Check SnapshotStore queries and that unnamed accounts store no snapshots"""
+    try:
+        import tempfile
+        import pandas as pd
+        import config
+        from auto_adjust.snapshots import SnapshotStore
+        from auto_adjust.sp import SPModule
+        from benchmarks.generator import write_bulk_workbook
+    except ImportError as e:
+        print("! Skipping snapshot store test:", e)
+        return True
+
+    print("Testing snapshot store...")
+    with tempfile.TemporaryDirectory() as folder:
+        store = SnapshotStore(os.path.join(folder, "snapshots.sqlite3"))
+        first = pd.DataFrame({"广告活动名称": ["A", "B"], "花费": [16777217.01, 5.0],
+                              "点击量": [10, 4], "订单数量": [2, 0], "销量": [40.0, 0.0]})
+        second = pd.DataFrame({"广告活动名称": ["A", "B", "C"], "花费": [8.0, 6.0, 1.0],
+                               "点击量": [20, 2, 1], "订单数量": [1, 1, 0], "销量": [30.0, 9.0, 0.0]})
+        assert store.save("shop", "2026-01-01", first) == 2
+        store.save("shop", "2026-02-01", second)
+        store.save("other", "2026-01-15", second)
+        assert store.previous_date("shop", "2026-02-01") == "2026-01-01", "previous date crosses accounts"
+        assert store.previous_date("shop", "2026-01-01") is None
+        merged = store.compare("shop", "2026-01-01", "2026-02-01", "spend")
+        assert merged["广告活动名称"].tolist() == ["A", "B"], "compare did not join on campaign"
+        assert merged["花费_old"].tolist() == [16777217.01, 5.0], "stored spend lost precision"
+        totals = store.campaign_totals("shop", "2026-03-01").set_index("广告活动名称")
+        assert totals.loc["A", "点击量"] == 30 and totals.loc["C", "订单数量"] == 0, "campaign totals differ"
+        print("✓ Snapshots are compared and summed per account")
+
+        path = os.path.join(folder, "bulk.xlsx")
+        write_bulk_workbook(path, 300, seed=3)
+        module = SPModule(path, config.screen_params(snapshot_date="2026-02-01"), "inline")
+        module.sp_invalid_screen()
+        try:
+            module.sp_descent_screen()
+            assert False, "descent without old file or account did not fail"
+        except ValueError:
+            pass
+        assert module._snapshots is None, "snapshot store opened without an account"
+
+        module = SPModule(path, config.screen_params(account="shop", snapshot_date="2026-03-01"), "inline")
+        module.snapshots = store
+        module.sp_invalid_screen()
+        assert store.previous_date("shop", "2026-03-02") == "2026-03-01", "account run stored no snapshot"
+        print("✓ Runs without an account store and read no snapshots")
+    return True
+
+# Test 15: Chunks cross to worker processes through shared memory
+def test_shared_memory_executor():
+    """Check shared memory pack/unpack and ordered results of every backend"""
+    try:
+        import numpy as np
+        import pandas as pd
+        from auto_adjust.executor import ChunkExecutor, _pack_frame, _unpack_frame
+    except ImportError as e:
+        print("! Skipping executor test:", e)
+        return True
+
+    print("Testing chunk executor...")
+    chunk = pd.DataFrame({
+        "实体层级": pd.Categorical(["关键词", "广告组", None, "关键词"]),
+        "关键词文本": ["shoe", None, "bag", "shoe"],
+        "竞价": [0.5, np.nan, 1.25, 2.0],
+        "点击量": np.array([1, 2, 3, 4], dtype=np.int16),
+        "启用": [True, False, True, True],
+        "日期": pd.to_datetime(["2026-01-01", "2026-01-02", None, "2026-01-04"]),
+    }, index=pd.RangeIndex(100, 104))
+    block, layout = _pack_frame(chunk)
+    try:
+        unpacked = _unpack_frame(layout)
+    finally:
+        block.close()
+        block.unlink()
+    pd.testing.assert_frame_equal(unpacked, chunk)
+    print("✓ Chunks survive the shared memory round trip")
+
+    chunks = [chunk.iloc[:size] for size in (4, 1, 3, 2, 0, 4)]
+    for backend in ("inline", "thread", "process"):
+        results = list(ChunkExecutor(backend, max_workers=2).map(len, iter(chunks)))
+        assert results == [4, 1, 3, 2, 0, 4], "{0} backend returned {1}".format(backend, results)
+    print("✓ Every backend returns results in chunk order")
+
+    # Chunks drawn but not yet returned must fit in the byte budget
+    drawn = []
+    def stream():
+        for number in range(20):
+            drawn.append(number)
+            yield chunk
+    budget = 2 * int(chunk.memory_usage(index=False).sum())
+    in_flight = [len(drawn) - returned for returned, _ in
+                 enumerate(ChunkExecutor("thread", max_workers=4, max_pending_bytes=budget).map(len, stream()))]
+    assert max(in_flight) <= 3, "{0} chunks in flight for a budget of two".format(max(in_flight))
+    print("✓ Chunks in flight stay within the byte budget")
+    return True
+
+# Test 16: SD screens and the SD sheet parsed ahead in another process
+def _target_rows(rows):
+    """Build an SB/SD sheet from (实体层级, 状态, 花费, 点击量, 订单数量, ACOS, 展示量, 可见展示量) tuples"""
+    import pandas as pd
+    from auto_adjust.schema import apply_schema
+
+    frame = pd.DataFrame(rows, columns=["实体层级", "状态", "花费", "点击量", "订单数量", "ACOS", "展示量", "可见展示量"])
+    frame.insert(1, "操作", None)
+    frame["广告活动状态（仅供参考）"] = "已启用"
+    frame["广告组状态（仅供参考）"] = "已启用"
+    frame["广告组合名称（仅供参考）"] = ["SKU{0}".format(number % 2) for number in range(len(frame))]
+    frame["竞价"] = 1.0
+    frame["转化率"] = frame["订单数量"] / frame["点击量"].where(frame["点击量"] > 0)
+    return apply_schema(frame)
+
+def test_sd_screens():
+    """Check the SD filters and that start_prefetch caches the SD sheet"""
+    try:
+        import tempfile
+        import threading
+        import config
+        import auto_adjust.filters as filters
+        from auto_adjust.sd import SDModule, SD_SHEET
+        from auto_adjust.writer import write_results
+    except ImportError as e:
+        print("! Skipping SD screen test:", e)
+        return True
+
+    print("Testing SD screens...")
+    rows = [
+        ("受众定向", "已启用", 20.0, 12, 0, 0.0, 800, 700),
+        ("上下文定向", "已启用", 15.0, 10, 0, 0.0, 900, 800),
+        ("受众定向", "已启用", 30.0, 8, 2, 0.8, 600, 500),
+        ("上下文定向", "已启用", 30.0, 8, 2, 0.8, 600, 500),
+        ("受众定向", "已暂停", 50.0, 20, 0, 0.0, 900, 900),
+        ("受众定向", "已启用", 20.0, 9, 1, 0.2, 5000, 1000),
+        ("广告活动", "已启用", 99.0, 50, 0, 0.0, 9000, 100),
+    ]
+    paused = filters.sd_pause(_target_rows(rows), 10, 10, None)
+    assert list(paused.index) == [0, 1] and set(paused["状态"]) == {"已暂停"}, "sd_pause picked the wrong rows"
+    lowered = filters.sd_audience_bid_down(_target_rows(rows), 10, 0.5, None)
+    assert list(lowered.index) == [2] and lowered["竞价"].tolist() == [0.9], "sd_audience_bid_down differs"
+    wasted = filters.sd_viewable_waste(_target_rows(rows), 1000, 10, None)
+    assert list(wasted.index) == [5] and wasted["操作"].isna().all(), "sd_viewable_waste differs"
+    assert list(filters.sd_pause(_target_rows(rows), 10, 10, "SKU1").index) == [1], "SKU filter ignored"
+    print("✓ SD filters pause, lower bids and report viewable waste")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bulk.xlsx")
+        write_results({SD_SHEET: _target_rows(rows)}, path)
+        module = SDModule(path, config.screen_params(spend=10, click=10, acos=0.5, impress=1000), "thread")
+        # Jobs run in worker threads, where the prefetch must not fork
+        worker = threading.Thread(target=module.start_prefetch)
+        worker.start()
+        worker.join()
+        assert module.prefetch is not None, "prefetch was not started"
+        module._finish_prefetch()
+        assert module.sheet_cache.read_entry(path, SD_SHEET) is not None, "prefetch did not cache the SD sheet"
+        result = module.adjust_sd("sd_all_screen")
+        assert os.path.basename(result) == "bulk_SD全部筛选.xlsx", "SD results not written"
+    print("✓ The SD sheet is parsed into the sheet cache ahead of the screens")
+    return True
+
+# Test 17: SB screens edit keyword and product target rows only
+def test_sb_screens():
+    """Check the SB filters and that SBModule saves all screens in one workbook"""
+    try:
+        import tempfile
+        import config
+        import auto_adjust.filters as filters
+        from auto_adjust.sb import SBModule, SB_SHEET
+        from auto_adjust.writer import write_results
+    except ImportError as e:
+        print("! Skipping SB screen test:", e)
+        return True
+
+    print("Testing SB screens...")
+    rows = [
+        ("关键词", "已启用", 20.0, 12, 0, 0.0, 800, 0),
+        ("商品定向", "已启用", 15.0, 10, 0, 0.0, 900, 0),
+        ("关键词", "已启用", 30.0, 8, 2, 0.8, 600, 0),
+        ("商品定向", "已启用", 5.0, 10, 3, 0.2, 700, 0),
+        ("关键词", "已暂停", 50.0, 20, 0, 0.0, 900, 0),
+        ("广告活动", "已启用", 99.0, 50, 0, 0.0, 9000, 0),
+    ]
+    paused = filters.sb_pause(_target_rows(rows), 10, None)
+    assert list(paused.index) == [0, 1] and set(paused["状态"]) == {"已暂停"}, "sb_pause picked the wrong rows"
+    lowered = filters.sb_bid_down(_target_rows(rows), 10, 0.5, None)
+    assert list(lowered.index) == [2] and lowered["竞价"].tolist() == [0.9], "sb_bid_down differs"
+    raised = filters.sb_promote(_target_rows(rows), 2, 0.5, 0.1, None)
+    assert list(raised.index) == [3] and raised["竞价"].tolist() == [1.1], "sb_promote differs"
+    assert set(raised["实体层级"]) <= set(filters.SB_TARGET_LEVELS), "non-target rows screened"
+    assert list(filters.sb_pause(_target_rows(rows), 10, "SKU1").index) == [1], "SKU filter ignored"
+    print("✓ SB filters pause, lower and raise bids of enabled targets")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bulk.xlsx")
+        write_results({SB_SHEET: _target_rows(rows)}, path)
+        params = config.screen_params(spend=10, acos=0.5, order=2, conversion=0.1)
+        result = SBModule(path, params, "thread").adjust_sb("sb_all_screen")
+        assert os.path.basename(result) == "bulk_SB全部筛选.xlsx", "SB results not written"
+    print("✓ SBModule writes every SB screen to one workbook")
+    return True
+
+# Test 18: Converting search terms become keywords their ad group lacks
+def _keyword_sheets():
+    """Build a small 商品推广活动 sheet with keywords and its search term report chunks"""
+    import pandas as pd
+
+    campaign = pd.DataFrame({
+        "产品": "商品推广",
+        "实体层级": ["广告活动", "关键词", "关键词", "商品定向"],
+        "操作": None,
+        "广告活动编号": ["1", "1", "1", "1"],
+        "广告组编号": ["", "11", "12", "12"],
+        "广告活动名称": ["C1", "C1", "C1", "C1"],
+        "广告组名称": ["", "G1", "G2", "G2"],
+        "状态": "已启用",
+        "关键词文本": [None, "Red Shoe", "bag", None],
+        "匹配类型": [None, "精准", "精准", None],
+        "竞价": [None, 0.8, 0.6, 0.7],
+        "广告组合名称（仅供参考）": ["SKU0", "SKU0", "SKU1", "SKU1"],
+    })
+    columns = ["广告组合名称（仅供参考）", "广告活动名称", "广告组名称", "客户搜索词", "点击量", "订单数量", "花费", "销量"]
+    report = [
+        pd.DataFrame([
+            ("SKU0", "C1", "G1", "Red  Shoe ", 10, 2, 5.0, 50.0),
+            ("SKU1", "C1", "G2", "blue bag", 4, 2, 2.0, 40.0),
+            ("SKU1", "C1", "G2", "cheap bag", 20, 0, 9.0, 0.0),
+        ], columns=columns),
+        pd.DataFrame([
+            ("SKU0", "C1", "G1", "red shoe", 10, 1, 5.0, 50.0),
+            ("SKU0", "C1", "G1", "B0ABCDEFGH", 5, 3, 1.0, 60.0),
+            ("SKU2", "C2", "G9", "green hat", 10, 5, 2.0, 90.0),
+        ], columns=columns, index=pd.RangeIndex(3, 6)),
+    ]
+    return campaign, report
+
+def test_keyword_harvest():
+    """Check normalization, term aggregation and harvested keyword rows"""
+    try:
+        import tempfile
+        import pandas as pd
+        import config
+        from auto_adjust.sp import CAMPAIGN_SHEET
+        from auto_adjust.writer import write_results
+        from auto_create.keyword import (
+            KeywordModule, SEARCH_TERM_SHEET, normalize_terms, existing_keywords, aggregate_search_terms,
+            harvest_keywords
+        )
+    except ImportError as e:
+        print("! Skipping keyword harvest test:", e)
+        return True
+
+    print("Testing keyword harvesting...")
+    normalized = normalize_terms(pd.Series(["  Red   Shoe ", None, "BAG"], index=[5, 6, 7]))
+    assert normalized.tolist() == ["red shoe", "", "bag"], "normalize_terms gave {0}".format(normalized.tolist())
+    assert list(normalized.index) == [5, 6, 7], "normalize_terms dropped the index"
+
+    campaign, report = _keyword_sheets()
+    terms = aggregate_search_terms(iter(report))
+    red_shoe = terms[terms["客户搜索词"] == "red shoe"]
+    assert len(red_shoe) == 1 and red_shoe["点击量"].iloc[0] == 20 and red_shoe["订单数量"].iloc[0] == 3, \
+        "search terms not summed across spellings and chunks"
+    assert "b0abcdefgh" not in set(terms["客户搜索词"]), "ASIN search term harvested as keyword"
+    asins = aggregate_search_terms(iter(report), asin_terms=True)
+    assert asins["客户搜索词"].tolist() == ["B0ABCDEFGH"], "ASIN search terms not kept upper-cased"
+    print("✓ Search terms are normalized and summed per ad group")
+
+    keys, ad_groups = existing_keywords(iter([campaign]))
+    assert len(keys) == 2 and sorted(ad_groups["广告组名称"]) == ["G1", "G2"], "existing keywords not indexed"
+    created = harvest_keywords(terms, keys, ad_groups, 2, 0.1, 0.3, None)
+    rows = set(zip(created["广告组名称"], created["关键词文本"], created["匹配类型"], created["竞价"]))
+    expected = {("G1", "red shoe", "词组", 0.5), ("G2", "blue bag", "精准", 0.5), ("G2", "blue bag", "词组", 0.5)}
+    assert rows == expected, "harvested {0}".format(sorted(rows))
+    assert set(created["操作"]) == {"Create"} and set(created["广告组编号"]) == {"11", "12"}, "Create rows incomplete"
+    only_sku1 = harvest_keywords(terms, keys, ad_groups, 2, 0.1, 0.3, "SKU1")
+    assert set(only_sku1["关键词文本"]) == {"blue bag"}, "SKU filter ignored"
+    print("✓ Existing keywords are skipped and new ones created as exact and phrase")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bulk.xlsx")
+        write_results({CAMPAIGN_SHEET: campaign, SEARCH_TERM_SHEET: pd.concat(report)}, path)
+        params = config.screen_params(order=2, conversion=0.1, acos=0.3)
+        result = KeywordModule(path, params, "thread").generate_keywords()
+        assert result is not None and len(pd.read_excel(result)) == 3, "KeywordModule did not save the keywords"
+    print("✓ KeywordModule saves the harvested keywords")
+    return True
+
+# Test 19: ASIN search terms become product targets and negative targets
+def test_asin_targets():
+    """Check targeted_asins and that asin_targets only creates missing targets"""
+    try:
+        import tempfile
+        import numpy as np
+        import pandas as pd
+        import config
+        from auto_adjust.sp import CAMPAIGN_SHEET
+        from auto_adjust.writer import write_results
+        from auto_create.keyword import SEARCH_TERM_SHEET, aggregate_search_terms
+        from auto_create.asin import ASINModule, targeted_asins, asin_targets
+    except ImportError as e:
+        print("! Skipping ASIN target test:", e)
+        return True
+
+    print("Testing ASIN targets...")
+    campaign = pd.DataFrame({
+        "产品": "商品推广",
+        "实体层级": ["广告活动", "广告活动", "广告组", "广告组", "商品定向", "否定商品定向"],
+        "操作": None,
+        "广告活动编号": ["1", "2", "1", "2", "1", "1"],
+        "广告组编号": ["", "", "11", "21", "11", "11"],
+        "广告活动名称": ["C1", "C2", "C1", "C2", "C1", "C1"],
+        "广告组名称": ["", "", "G1", "G2", "G1", "G1"],
+        "状态": "已启用",
+        "投放类型": ["手动", "自动", None, None, None, None],
+        "竞价": [None, None, 0.5, 0.5, 0.7, None],
+        "商品投放表达式": [None, None, None, None, 'asin="B0EXIST123"', 'asin="B0NEGATED1"'],
+        "广告组合名称（仅供参考）": "SKU0",
+    })
+    report = pd.DataFrame([
+        ("SKU0", "C1", "G1", "B0GOOD0001", 6, 3, 3.0, 60.0),
+        ("SKU0", "C1", "G1", "b0exist123", 6, 3, 3.0, 60.0),
+        ("SKU0", "C1", "G1", "b0waste001", 12, 0, 6.0, 0.0),
+        ("SKU0", "C1", "G1", "b0negated1", 15, 0, 7.0, 0.0),
+        ("SKU0", "C1", "G1", "red shoe", 15, 0, 7.0, 0.0),
+        ("SKU0", "C2", "G2", "b0good0002", 6, 3, 3.0, 60.0),
+        ("SKU0", "C2", "G2", "b0waste002", 11, 0, 5.0, 0.0),
+    ], columns=["广告组合名称（仅供参考）", "广告活动名称", "广告组名称", "客户搜索词", "点击量", "订单数量", "花费", "销量"])
+
+    keys, ad_groups = targeted_asins(iter([campaign]))
+    assert sorted(keys) == ["C1\x1fG1\x1fB0EXIST123", "C1\x1fG1\x1fB0NEGATED1"], "targets not indexed: {0}".format(list(keys))
+    manual = dict(zip(ad_groups["广告组名称"], ad_groups["手动"]))
+    assert manual == {"G1": True, "G2": False}, "manual campaigns not detected"
+    print("✓ Existing ASIN targets and manual ad groups are indexed")
+
+    created = asin_targets(aggregate_search_terms(iter([report]), asin_terms=True), keys, ad_groups, 2, 0.3, 10, None)
+    rows = set(zip(created["广告组名称"], created["实体层级"], created["商品投放表达式"]))
+    expected = {
+        ("G1", "商品定向", 'asin="B0GOOD0001"'),
+        ("G1", "否定商品定向", 'asin="B0WASTE001"'),
+        ("G2", "否定商品定向", 'asin="B0WASTE002"'),
+    }
+    assert rows == expected, "created {0}".format(sorted(rows))
+    bids = dict(zip(created["商品投放表达式"], created["竞价"]))
+    assert bids['asin="B0GOOD0001"'] == 0.5 and np.isnan(bids['asin="B0WASTE001"']), "target bids differ"
+    print("✓ Converting ASINs are targeted in manual campaigns and wasted clicks negated")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bulk.xlsx")
+        write_results({CAMPAIGN_SHEET: campaign, SEARCH_TERM_SHEET: report}, path)
+        params = config.screen_params(order=2, acos=0.3, click=10)
+        result = ASINModule(path, params, "thread").create_asin_ads()
+        assert result is not None and len(pd.read_excel(result)) == 3, "ASINModule did not save the targets"
+    print("✓ ASINModule saves the new product targets")
+    return True
+
+# Test 20: Bid model recovers the CPC elasticity and bounds its bid changes
+def _bid_targets(n_rows, elasticity, seed=0):
+    """Build enabled keyword rows whose CPC grows as bid ** elasticity"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    bid = np.round(rng.uniform(0.2, 3.0, n_rows), 2)
+    clicks = rng.integers(20, 200, n_rows)
+    cpc = 0.4 * bid ** elasticity * np.exp(rng.normal(0, 0.05, n_rows))
+    orders = rng.binomial(clicks, 0.1)
+    return pd.DataFrame({
+        "实体层级": "关键词",
+        "操作": None,
+        "状态": "已启用",
+        "广告活动状态（仅供参考）": "已启用",
+        "广告组状态（仅供参考）": "已启用",
+        "广告组合名称（仅供参考）": ["SKU{0}".format(number % 2) for number in range(n_rows)],
+        "广告活动名称": ["C{0}".format(number % 10) for number in range(n_rows)],
+        "竞价": bid,
+        "点击量": clicks,
+        "订单数量": orders,
+        "花费": np.round(cpc * clicks, 2),
+        "销量": orders * 25.0,
+    })
+
+def test_bid_model():
+    """Check the fitted elasticity, bounded recommendations and enabled_targets"""
+    try:
+        import tempfile
+        import numpy as np
+        import pandas as pd
+        import config
+        from auto_adjust.sp import CAMPAIGN_SHEET
+        from auto_adjust.writer import write_results
+        from data_analysis.ai_opt import (
+            AIOptimization, BidModel, enabled_targets, MAX_BID_CHANGE, MIN_CLICKS, PRIOR_ELASTICITY,
+            ELASTICITY_RANGE
+        )
+    except ImportError as e:
+        print("! Skipping bid model test:", e)
+        return True
+
+    print("Testing bid model...")
+    targets = _bid_targets(2000, 0.6)
+    model = BidModel()
+    model.partial_fit(targets.iloc[:1000])
+    model.partial_fit(targets.iloc[1000:])
+    model.fit()
+    assert abs(model.elasticity - 0.6) < 0.02, "fitted elasticity {0}".format(model.elasticity)
+    assert model.samples == 2000, "samples not counted across batches"
+    steep = BidModel()
+    steep.partial_fit(_bid_targets(500, 0.1, seed=1))
+    assert steep.fit().elasticity == ELASTICITY_RANGE[0], "elasticity not clipped"
+    assert abs(BidModel().fit().elasticity - PRIOR_ELASTICITY) < 1e-6, "empty model left its prior"
+    print("✓ The CPC elasticity is recovered and clipped")
+
+    history = pd.DataFrame({"广告活动名称": ["OLD"], "点击量": [100], "订单数量": [50], "销量": [1000.0]})
+    model.fit(history)
+    assert "OLD" in model.campaign_rate.index, "snapshot campaigns missing from the priors"
+    scored = pd.DataFrame({
+        "广告活动名称": ["C0", "C0", "C0", "NEW"],
+        "竞价": [1.0, 1.0, 1.0, 1.0],
+        "点击量": [100, 100, MIN_CLICKS - 1, 100],
+        "订单数量": [0, 50, 0, 10],
+        "花费": [100.0, 10.0, 5.0, 30.0],
+        "销量": [0.0, 5000.0, 0.0, 250.0],
+    })
+    new_bid = model.recommend(scored, 0.3)
+    assert new_bid[0] == round(1 - MAX_BID_CHANGE, 2) and new_bid[1] == round(1 + MAX_BID_CHANGE, 2), \
+        "bid changes not bounded: {0}".format(new_bid)
+    assert np.isnan(new_bid[2]), "target with too few clicks was changed"
+    assert np.isfinite(new_bid[3]), "campaign without history got no bid"
+    print("✓ Bid changes are bounded and need MIN_CLICKS clicks")
+
+    rows = _target_rows([
+        ("关键词", "已启用", 1.0, 10, 0, 0.0, 0, 0),
+        ("商品定向", "已启用", 1.0, 10, 0, 0.0, 0, 0),
+        ("关键词", "已暂停", 1.0, 10, 0, 0.0, 0, 0),
+        ("广告组", "已启用", 1.0, 10, 0, 0.0, 0, 0),
+    ])
+    assert list(enabled_targets(rows).index) == [0, 1], "enabled_targets picked the wrong rows"
+    assert list(enabled_targets(rows, "SKU1").index) == [1], "SKU filter ignored"
+    print("✓ enabled_targets keeps enabled keywords and product targets")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bulk.xlsx")
+        write_results({CAMPAIGN_SHEET: _bid_targets(300, 0.6)}, path)
+        result = AIOptimization(path, config.screen_params(acos=0.3), "thread").optimize_ads()
+        assert result is not None and set(pd.read_excel(result)["操作"]) == {"Update"}, "no bid updates written"
+    print("✓ AIOptimization writes the changed bids as Update rows")
+    return True
+
+# Test 21: Portfolio index selects the same rows as isin
+def test_portfolio_index():
+    """Check GroupIndex.mask_for against isin for text and categorical portfolios"""
+    try:
+        import numpy as np
+        import auto_adjust.filters as filters
+        from auto_adjust.sheet_index import portfolio_index, GroupIndex, PORTFOLIO_COLUMN
+    except ImportError as e:
+        print("! Skipping portfolio index test:", e)
+        return True
+
+    print("Testing portfolio index...")
+    data = _synthetic_bulk_rows(20000, seed=3)
+    data.loc[data.index[::97], PORTFOLIO_COLUMN] = None
+    skus = ["SKU1", "SKU7", "SKU7", "SKU49", "missing"]
+    expected = data[PORTFOLIO_COLUMN].isin(skus).to_numpy()
+    assert np.array_equal(portfolio_index(data).mask_for(skus), expected), "text portfolio mask differs"
+    assert portfolio_index(data) is portfolio_index(data), "portfolio index rebuilt for the same frame"
+    categorical = data[PORTFOLIO_COLUMN].astype("category")
+    assert np.array_equal(GroupIndex(categorical).mask_for(skus), expected), "categorical portfolio mask differs"
+    assert not GroupIndex(categorical).mask_for(["missing"]).any(), "unknown SKU matched rows"
+    print("✓ Portfolio masks match isin")
+
+    rows = filters.enabled_rows(data, "关键词")
+    matched = filters.apply_filters(rows, filters.Predicate("花费", ">", 10), "SKU1, SKU7", "关键词")
+    reference = rows[(rows["花费"] > 10) & rows[PORTFOLIO_COLUMN].isin(["SKU1", "SKU7"])]
+    assert len(reference) and list(matched.index) == list(reference.index), "SKU screening differs from isin"
+    print("✓ Screens filter SKUs through the portfolio index")
+    return True
+
+# Test 22: Entity-level partitions match a boolean filter and live with their frame
+def test_entity_partitions():
+    """Check entity_rows and enabled_rows against boolean filters and their caching"""
+    try:
+        import gc
+        import auto_adjust.filters as filters
+        from auto_adjust.sheet_index import entity_rows, _frame_caches
+    except ImportError as e:
+        print("! Skipping entity partition test:", e)
+        return True
+
+    print("Testing entity partitions...")
+    data = _synthetic_bulk_rows(20000, seed=4)
+    data.index = data.index + 1000
+    for entity_level in ("广告活动", "商品广告", "关键词", "商品定向", "竞价调整", "否定关键词"):
+        rows = entity_rows(data, entity_level)
+        reference = data[data["实体层级"] == entity_level]
+        assert list(rows.index) == list(reference.index), "{0} partition differs".format(entity_level)
+        assert rows.equals(reference), "{0} partition values differ".format(entity_level)
+        assert entity_rows(data, entity_level) is rows, "{0} partition rebuilt".format(entity_level)
+
+    enabled = filters.enabled_rows(data, "关键词")
+    reference = data[
+        (data["实体层级"] == "关键词") & (data["状态"] == "已启用") &
+        (data["广告活动状态（仅供参考）"] == "已启用") & (data["广告组状态（仅供参考）"] == "已启用")
+    ]
+    assert len(reference) and list(enabled.index) == list(reference.index), "enabled_rows differs"
+    print("✓ Partitions keep the sheet labels and are built once per frame")
+
+    key = id(data)
+    assert key in _frame_caches, "frame cache not created"
+    del data, rows, reference, enabled
+    gc.collect()
+    assert key not in _frame_caches, "partitions outlived their frame"
+    print("✓ Partitions are released with their frame")
+    return True
+
+# Test 23: Background jobs report progress, record failures and bound the queue
+def test_job_queue():
+    """Check JobQueue status transitions, progress reports and QueueFullError"""
+    try:
+        import threading
+        from jobs import JobQueue, QueueFullError, QUEUED, RUNNING, DONE, FAILED
+    except ImportError as e:
+        print("! Skipping job queue test:", e)
+        return True
+
+    print("Testing job queue...")
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking(job, rows):
+        job.report('filter', sheet="商品推广活动", rows=rows)
+        started.set()
+        release.wait(10)
+        job.report('filter', rows=rows * 2)
+        return "result.xlsx"
+
+    def failing(job):
+        raise ValueError("bad thresholds")
+
+    job_queue = JobQueue(workers=1, max_queued=1)
+    first = job_queue.submit(blocking, 10)
+    assert started.wait(10), "job did not start"
+    assert first.to_dict()['status'] == RUNNING, "started job not running"
+    second = job_queue.submit(failing)
+    assert second.status == QUEUED, "waiting job not queued"
+    try:
+        job_queue.submit(failing)
+        assert False, "full queue accepted a job"
+    except QueueFullError:
+        pass
+    print("✓ A full queue rejects jobs with QueueFullError")
+
+    release.set()
+    job_queue._queue.join()
+    state = first.to_dict()
+    assert state['status'] == DONE and first.result == "result.xlsx", "job did not finish"
+    assert state['progress'] == {'filter': {'sheet': "商品推广活动", 'rows': 20}}, "progress not recorded"
+    assert second.status == FAILED and second.error == "bad thresholds", "failure not recorded"
+    assert job_queue.get(first.id) is first and job_queue.get("unknown") is None, "jobs not looked up by id"
+    print("✓ Jobs finish as done or failed with their progress")
+    return True
+
+# Test 24: Sheet cache round-trips chunks and follows the file content
+def test_sheet_cache():
+    """Check the sheet cache round trip, content-hash invalidation and expiry"""
+    try:
+        import time
+        import datetime
+        import tempfile
+        import numpy as np
+        import pandas as pd
+        from auto_adjust.sheet_cache import SheetCache, load_chunk, remove_expired_entries
+    except ImportError as e:
+        print("! Skipping sheet cache test:", e)
+        return True
+
+    print("Testing sheet cache...")
+    chunk = pd.DataFrame({
+        "实体层级": pd.Categorical(["关键词", "广告组", None, "关键词"]),
+        "关键词文本": ["shoe", None, "bag", "shoe"],
+        "竞价": [0.5, np.nan, 1.25, 2.0],
+        "点击量": np.array([1, 2, 3, 4], dtype=np.int16),
+        "启用": [True, False, True, True],
+        "日期": pd.to_datetime(["2026-01-01", "2026-01-02", None, "2026-01-04"]),
+    })
+    chunks = [chunk, chunk.set_axis(pd.RangeIndex(4, 8))]
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bulk.xlsx")
+        with open(path, 'wb') as f:
+            f.write(b"first upload")
+        cache = SheetCache(os.path.join(folder, "cache"))
+        assert cache.read_chunks(path, "商品推广活动") is None, "empty cache returned chunks"
+        stored = cache.store_chunks(path, "商品推广活动", iter(chunks))
+        next(stored)
+        assert cache.read_chunks(path, "商品推广活动") is None, "partially parsed sheet was served"
+        list(stored)
+
+        cached_chunks = list(cache.read_chunks(path, "商品推广活动"))
+        assert len(cached_chunks) == 2, "cached chunk count differs"
+        for original, cached_chunk in zip(chunks, cached_chunks):
+            pd.testing.assert_frame_equal(cached_chunk, original)
+        for name in ("竞价", "点击量", "日期"):
+            base = cached_chunks[0][name].to_numpy()
+            while base is not None and not isinstance(base, np.memmap):
+                base = base.base
+            assert base is not None, "{0} copied into memory".format(name)
+        entry, meta = cache.read_entry(path, "商品推广活动")
+        pd.testing.assert_frame_equal(load_chunk(entry, meta['columns'], 1, meta['chunks'][1]), chunks[1])
+        assert cache.read_chunks(path, "品牌推广活动") is None, "other sheet served from the cache"
+        print("✓ Cached chunks match the parsed chunks and stay memory-mapped")
+
+        time.sleep(0.01)
+        with open(path, 'wb') as f:
+            f.write(b"second upload")
+        assert cache.read_chunks(path, "商品推广活动") is None, "changed file served stale chunks"
+        uncachable = pd.DataFrame({"竞价": [1.0], "开始时间": [datetime.time(9, 30)]})
+        assert len(list(cache.store_chunks(path, "商品推广活动", iter([uncachable])))) == 1, "chunk not passed through"
+        assert cache.read_chunks(path, "商品推广活动") is None, "uncachable sheet was published"
+        print("✓ A changed file or uncachable column misses the cache")
+
+        remove_expired_entries(cache.cache_root, 3600, time.time() + 7200)
+        assert os.listdir(cache.cache_root) == [], "expired entries kept"
+    print("✓ Expired entries are removed")
+    return True
+
+# Test 25: Screens never edit the shared chunk or its cached partitions
+def test_screens_repeatable():
+    """Check that running a screen twice on one chunk gives identical output"""
+    try:
+        import numpy as np
+        import pandas as pd
+        import auto_adjust.filters as filters
+    except ImportError as e:
+        print("! Skipping repeatable screen test:", e)
+        return True
+
+    print("Testing repeated screens...")
+    data = _synthetic_bulk_rows(20000, seed=5)
+    data["点击量"] = np.random.default_rng(5).integers(0, 30, len(data))
+    parsed = data.copy()
+    enabled = filters.enabled_rows(data, "商品定向").copy()
+    screens = [
+        (filters.sp_product, (10, 2, 0.5, 0.1, None)),
+        (filters.sp_ad, (20, 2, 0.5, 0.1, None)),
+        (filters.sp_pos, (20, 2, 0.5, 0.1, None)),
+    ]
+    for screen, args in screens:
+        first = screen(data, *args)
+        second = screen(data, *args)
+        assert first is not None and len(first), "{0} matched nothing".format(screen.__name__)
+        pd.testing.assert_frame_equal(first, second)
+    pd.testing.assert_frame_equal(filters.enabled_rows(data, "商品定向"), enabled)
+    pd.testing.assert_frame_equal(data, parsed)
+    print("✓ SP screens repeat identically and leave the chunk as parsed")
+
+    rows = _target_rows([
+        ("关键词", "已启用", 30.0, 8, 2, 0.8, 600, 0),
+        ("商品定向", "已启用", 5.0, 10, 3, 0.2, 700, 0),
+        ("关键词", "已启用", 20.0, 12, 0, 0.0, 800, 0),
+    ])
+    for screen, args in ((filters.sb_bid_down, (10, 0.5, None)), (filters.sb_promote, (2, 0.5, 0.1, None)),
+                         (filters.sb_pause, (10, None))):
+        pd.testing.assert_frame_equal(screen(rows, *args), screen(rows, *args))
+    assert filters.sb_bid_down(rows, 10, 0.5, None)["竞价"].tolist() == [0.9], "SB bid changes compounded"
+    assert list(filters.enabled_rows(rows, "关键词").index) == [0, 2], "paused row left the enabled partition"
+    print("✓ SB bid changes do not compound across runs")
+    return True
+
+# Test 26: SP无效筛选 lowers bids in enabled campaigns with too few clicks
+def test_sp_invalid():
+    """Check the keywords and targets SP无效筛选 returns for low-click campaigns"""
+    try:
+        import pandas as pd
+        import auto_adjust.filters as filters
+    except ImportError as e:
+        print("! Skipping SP无效筛选 test:", e)
+        return True
+
+    print("Testing SP无效筛选...")
+    today = pd.Timestamp.now().normalize()
+    old, new = today - pd.Timedelta(days=30), today - pd.Timedelta(days=3)
+    data = pd.DataFrame([
+        ("广告活动", "C1", "已启用", old, 3, None),
+        ("广告活动", "C2", "已启用", new, 3, None),
+        ("广告活动", "C3", "已启用", new, 6, None),
+        ("广告活动", "C4", "已启用", old, 50, None),
+        ("广告活动", "C5", "已暂停", old, 1, None),
+        ("关键词", "C1", "已启用", None, 0, 1.0),
+        ("商品定向", "C2", "已启用", None, 0, 0.5),
+        ("关键词", "C3", "已启用", None, 0, 1.0),
+        ("商品广告", "C1", "已启用", None, 0, None),
+        ("关键词", "C5", "已暂停", None, 0, 1.0),
+    ], columns=["实体层级", "广告活动名称", "广告活动状态（仅供参考）", "开始日期", "点击量", "竞价"])
+    data["广告组合名称（仅供参考）"] = ["SKU{0}".format(number % 2) for number in range(len(data))]
+
+    result = filters.sp_invalid(data, 10, None)
+    assert list(result.index) == [5, 6], "SP无效筛选 returned rows {0}".format(list(result.index))
+    assert result["竞价"].tolist() == [0.8, 0.4], "bids not lowered by 20%"
+    assert data.loc[[5, 6], "竞价"].tolist() == [1.0, 0.5], "sheet bids edited"
+    assert list(filters.sp_invalid(data, 10, "SKU1").index) == [6], "SKU filter ignored"
+    print("✓ Keywords and targets of enabled low-click campaigns get lower bids")
+    return True
+
+# Test 27: SP全部筛选 returns the same rows as each SP screen run on its own
+def test_sp_all_screen():
+    """Check every sheet of the SP全部筛选 workbook against the single screen output"""
+    try:
+        import tempfile
+        import pandas as pd
+        import config
+        from auto_adjust.sp import SPModule, SP_SCREENS
+        from benchmarks.generator import write_bulk_workbook
+    except ImportError as e:
+        print("! Skipping SP全部筛选 test:", e)
+        return True
+
+    print("Testing SP全部筛选 against the single screens...")
+    params = config.screen_params(impress=1000, click=5, click_rate=0.002, spend=30, sales=100,
+                                  order=3, conversion=0.05, acos=0.5)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_bulk_workbook(os.path.join(tmp, 'bulk.xlsx'), 3000, seed=7)
+        module = SPModule(path, params, 'inline')
+        combined = pd.read_excel(module.sp_all_screen(), sheet_name=None)
+        assert len(combined) > 1, "SP全部筛选 matched fewer than two screens"
+        for screen_name in SP_SCREENS:
+            single_path = module._run_screen(screen_name)
+            if single_path is None:
+                assert screen_name not in combined, "{0} only matched in SP全部筛选".format(screen_name)
+                continue
+            single = pd.read_excel(single_path, sheet_name='Sheet1')
+            pd.testing.assert_frame_equal(combined[screen_name], single)
+    print("✓ {0} SP全部筛选 sheets match their single screens".format(len(combined)))
+    return True
+
+# Test 28: The streaming openpyxl reader parses sheets like pd.read_excel
+def test_reader_equivalence():
+    """Check read_excel_in_chunks against pd.read_excel on generated and irregular sheets"""
+    try:
+        import datetime
+        import tempfile
+        import openpyxl
+        import pandas as pd
+        from auto_adjust.sp import read_excel_in_chunks
+        from benchmarks.generator import write_bulk_workbook
+    except ImportError as e:
+        print("! Skipping reader equivalence test:", e)
+        return True
+
+    print("Testing streaming reader against pd.read_excel...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_bulk_workbook(os.path.join(tmp, 'bulk.xlsx'), 3000, seed=3)
+        for sheet_name in ('商品推广活动', '商品推广搜索词报告'):
+            chunks = list(read_excel_in_chunks(path, sheet_name, 700))
+            assert len(chunks) > 1, "{0} was read in one chunk".format(sheet_name)
+            pd.testing.assert_frame_equal(pd.concat(chunks), pd.read_excel(path, sheet_name=sheet_name))
+        print("✓ Generated bulk sheets match in values, dtypes and index")
+
+        # Blank and repeated headers, empty cells, a blank row and short rows
+        irregular = os.path.join(tmp, 'irregular.xlsx')
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = 'Sheet'
+        sheet.append(['名称', '数量', None, '数量', '日期', '比例', '文本'])
+        sheet.append(['a', 1, None, 2, datetime.datetime(2024, 1, 2), 0.5, None])
+        sheet.append(['b', None, None, 3, datetime.datetime(2024, 1, 3), None, 'x'])
+        sheet.append([None] * 7)
+        sheet.append([None, 4, None, None, datetime.datetime(2024, 3, 2), 1.5, 'y'])
+        sheet.append(['c', 5, 'extra', 4, datetime.datetime(2024, 3, 3)])
+        sheet.append([None] * 7)
+        workbook.save(irregular)
+
+        expected = pd.read_excel(irregular, sheet_name='Sheet')
+        pd.testing.assert_frame_equal(pd.concat(read_excel_in_chunks(irregular, 'Sheet', 100)), expected)
+        for chunk in read_excel_in_chunks(irregular, 'Sheet', 3):
+            pd.testing.assert_frame_equal(chunk, expected.loc[chunk.index], check_dtype=False)
+    print("✓ Headers, empty cells and blank rows match pd.read_excel")
+    return True
+
+# Test 29: A result file that cannot be written fails the screen
+def test_save_failure():
+    """Check that write errors propagate instead of returning the unwritten path"""
+    try:
+        import tempfile
+        import config
+        from auto_adjust.sp import SPModule
+        from benchmarks.generator import write_bulk_workbook
+    except ImportError as e:
+        print("! Skipping save failure test:", e)
+        return True
+
+    print("Testing failed result writes...")
+    with tempfile.TemporaryDirectory() as folder:
+        path = write_bulk_workbook(os.path.join(folder, "bulk.xlsx"), 300, seed=3)
+        os.mkdir(os.path.join(folder, "bulk_SP无效筛选.xlsx"))  # Occupies the result path
+        module = SPModule(path, config.screen_params(), "inline")
+        try:
+            result = module.sp_invalid_screen()
+            assert False, "unwritable result returned {0}".format(result)
+        except OSError:
+            pass
+    print("✓ Write errors reach the caller")
+    return True
+
+# Test 30: /metrics exports stage metrics and the process peak RSS
+def test_metrics_endpoint():
+    """Check the Prometheus text of /metrics, with RSS growth recorded per stage"""
+    try:
+        import mmap
+        import tempfile
+        import numpy as np
+        from auto_adjust.metrics import stage_timer, current_rss_bytes
+    except ImportError as e:
+        print("! Skipping metrics test:", e)
+        return True
+
+    print("Testing /metrics...")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)  # main creates its upload folder in the working directory
+        try:
+            import main
+            # A fresh anonymous mapping, as malloc may reuse pages freed by earlier tests
+            block = mmap.mmap(-1, 64 * 1024 * 1024)
+            with stage_timer('metrics test', 'grow', rows_in=3) as timer:
+                np.frombuffer(block, dtype=np.uint8)[:] = 1
+                timer.rows_out = 2
+            with stage_timer('metrics test', 'idle', rows_in=3) as timer:
+                timer.rows_out = 3
+            block.close()
+            response = main.app.test_client().get('/metrics')
+        except ImportError as e:
+            print("! Skipping metrics test:", e)
+            return True
+        finally:
+            os.chdir(cwd)
+
+    assert response.status_code == 200 and response.content_type.startswith('text/plain'), "bad /metrics response"
+    lines = response.get_data(as_text=True).splitlines()
+    values = {line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1]) for line in lines if not line.startswith('#')}
+    for name in ('sp_stage_duration_seconds', 'sp_stage_rss_growth_bytes', 'process_peak_rss_bytes'):
+        assert any(line.startswith("# TYPE {0} ".format(name)) for line in lines), "{0} not exported".format(name)
+    labels = '{stage="metrics test",screen="grow"}'
+    assert values['sp_stage_duration_seconds_count' + labels] == 1, "stage duration not counted"
+    assert values['sp_stage_rows_in_total' + labels] == 3 and values['sp_stage_rows_out_total' + labels] == 2
+    if current_rss_bytes() is not None:
+        grown = values['sp_stage_rss_growth_bytes' + labels]
+        idle = values['sp_stage_rss_growth_bytes{stage="metrics test",screen="idle"}']
+        assert grown >= 32 * 1024 * 1024, "allocating stage grew the RSS by {0} bytes".format(grown)
+        assert idle < grown, "idle stage reported the growth of the stage before it"
+        assert values['process_peak_rss_bytes'] >= grown, "process peak below a stage's growth"
+    print("✓ /metrics reports RSS growth per stage and the process peak once")
+    return True
+
+# Test 31: Profiled jobs serve their cProfile stats, also when they fail
+def test_profile_route():
+    """Check /jobs/<id>/profile returns pstats data and that failures release profile_lock"""
+    try:
+        import pstats
+        import tempfile
+    except ImportError as e:
+        print("! Skipping profile route test:", e)
+        return True
+
+    print("Testing profiled jobs...")
+
+    def failing_screen():
+        raise ValueError("bad thresholds")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)  # main creates its upload folder in the working directory
+        try:
+            import main
+        except ImportError as e:
+            os.chdir(cwd)
+            print("! Skipping profile route test:", e)
+            return True
+        upload_folder = main.UPLOAD_FOLDER
+        main.UPLOAD_FOLDER = folder  # Downloads are served from the upload folder
+        try:
+            failed = main.job_queue.submit(main.run_profiled, os.path.join(folder, "failed.pstats"), failing_screen)
+            main.job_queue._queue.join()
+            assert failed.status == main.FAILED and failed.error == "bad thresholds", "profiled failure not recorded"
+            assert main.profile_lock.acquire(blocking=False), "failed profiled run kept profile_lock"
+            main.profile_lock.release()
+
+            client = main.app.test_client()
+            response = client.get('/jobs/{0}/profile'.format(failed.id))
+            assert response.status_code == 200, "profile of failed job not served"
+            downloaded = os.path.join(folder, "downloaded.pstats")
+            with open(downloaded, 'wb') as f:
+                f.write(response.get_data())
+            response.close()
+            functions = {name for _, _, name in pstats.Stats(downloaded).stats}
+            assert "failing_screen" in functions, "profile does not cover the profiled run"
+
+            done = main.job_queue.submit(main.run_profiled, os.path.join(folder, "done.pstats"), sorted, [2, 1])
+            main.job_queue._queue.join()
+            assert done.status == main.DONE and done.result == [1, 2], "profiled run after a failure did not run"
+            assert client.get('/jobs/unknown/profile').status_code == 404, "unknown job answered"
+        finally:
+            main.UPLOAD_FOLDER = upload_folder
+            os.chdir(cwd)
+    print("✓ Profiles of failed and finished jobs are served and profile_lock is released")
+    return True
+
+# Test 32: batch.py finds bulk files, checks thresholds and writes a summary
+def test_batch_runner():
+    """Check find_bulk_files, load_thresholds, duplicate names and summary.json"""
+    try:
+        import json
+        import shutil
+        import tempfile
+        import batch
+        from benchmarks.generator import write_bulk_workbook
+    except ImportError as e:
+        print("! Skipping batch runner test:", e)
+        return True
+
+    print("Testing batch runner...")
+    with tempfile.TemporaryDirectory() as folder:
+        bulk = os.path.join(folder, "bulk")
+        more = os.path.join(folder, "more")
+        os.makedirs(bulk)
+        os.makedirs(more)
+        first = write_bulk_workbook(os.path.join(bulk, "shop.xlsx"), 300, seed=3)
+        shutil.copyfile(first, os.path.join(bulk, "~$shop.xlsx"))  # Excel lock file
+        open(os.path.join(bulk, "notes.txt"), "w").close()
+        second = write_bulk_workbook(os.path.join(more, "other.xlsm"), 300, seed=4)
+        assert batch.find_bulk_files([bulk]) == [first], "lock file or text file picked up"
+        pattern = os.path.join(folder, "*", "*.xls[xm]")
+        assert batch.find_bulk_files([pattern, second]) == [first, second], "glob not expanded once per file"
+        print("✓ Directories and globs expand to bulk files without lock files")
+
+        thresholds = os.path.join(folder, "thresholds.json")
+        with open(thresholds, "w", encoding="utf-8") as f:
+            json.dump({"click": 5, "colour": "red"}, f)
+        try:
+            batch.load_thresholds(thresholds)
+            assert False, "unknown threshold accepted"
+        except ValueError as e:
+            assert "colour" in str(e), "unknown key not named"
+        with open(thresholds, "w", encoding="utf-8") as f:
+            json.dump({"click": 5, "acos": 0.5}, f)
+        assert batch.load_thresholds(thresholds) == {"click": 5, "acos": 0.5}
+        print("✓ Threshold files with unknown keys are rejected")
+
+        output_dir = os.path.join(folder, "results")
+        shutil.copyfile(first, os.path.join(more, "shop.xlsx"))
+        assert batch.main([bulk, more, "--output-dir", output_dir]) == 1, "duplicate file names accepted"
+        assert not os.path.exists(output_dir), "duplicate file names still ran"
+        print("✓ Files with the same name are refused")
+
+        code = batch.main([first, "--thresholds", thresholds, "--screens", "SP无效筛选", "SP花费下降",
+                           "--jobs", "1", "--output-dir", output_dir])
+        with open(os.path.join(output_dir, batch.SUMMARY_FILE), encoding="utf-8") as f:
+            summary = json.load(f)
+        assert code == 1, "failed run did not fail the batch"
+        assert summary["files"] == 1 and summary["counts"] == {"ok": 1, "failed": 1}, summary["counts"]
+        invalid, descent = summary["results"]
+        assert invalid["file"] == first and invalid["screen"] == "SP无效筛选" and invalid["error"] is None
+        assert os.path.dirname(invalid["result"]) == output_dir and os.path.exists(invalid["result"])
+        assert descent["status"] == "failed" and descent["error"].startswith("ValueError"), "no account was set"
+        assert not os.path.exists(os.path.join(output_dir, "shop.xlsx")), "staged input left behind"
+    print("✓ summary.json records every run and failures set the exit code")
+    return True
+
+# Test 33: The dask engine returns the same rows as the chunk executor
+def test_dask_engine():
+    """Check that use_dask filters the cached partitions to the executor's results"""
+    try:
+        import tempfile
+        import pandas as pd
+        import config
+        import dask  # noqa: F401, optional engine
+        from auto_adjust.sp import SPModule, SP_SCREENS
+        from benchmarks.generator import write_bulk_workbook
+    except ImportError as e:
+        print("! Skipping dask engine test:", e)
+        return True
+
+    print("Testing dask engine...")
+    params = config.screen_params(impress=1000, click=5, click_rate=0.002, spend=30, sales=100,
+                                  order=3, conversion=0.05, acos=0.5)
+    with tempfile.TemporaryDirectory() as folder:
+        path = write_bulk_workbook(os.path.join(folder, "bulk.xlsx"), 3000, seed=7)
+        # Dask runs first, so it converts the uncached sheet and then reads the cache
+        modules = [SPModule(path, params, "thread", engine="dask"),
+                   SPModule(path, params, "thread", engine="pandas"),
+                   SPModule(path, params, "inline", engine="dask")]
+        by_sheet = {}
+        for name, (sheet_name, filter_func, threshold_names) in SP_SCREENS.items():
+            by_sheet.setdefault(sheet_name, []).append((name, filter_func, modules[0]._screen_args(threshold_names)))
+        for sheet_name, screens in by_sheet.items():
+            dask_results, pandas_results, inline_results = [
+                module._process_chunks_multi(sheet_name, screens, chunk_size=700) for module in modules
+            ]
+            for name, _, _ in screens:
+                pd.testing.assert_frame_equal(dask_results[name], pandas_results[name])
+                pd.testing.assert_frame_equal(inline_results[name], pandas_results[name])
+        assert any(len(result) for result in pandas_results.values()), "no screen matched"
+    print("✓ Dask partitions give the executor's rows for every SP screen")
+    return True
+
+# Test 34: The benchmark generator builds consistent, reproducible bulk files
+def test_bulk_generator():
+    """Check row order, entity levels, metric ratios and seeds of benchmarks.generator"""
+    try:
+        import tempfile
+        import numpy as np
+        import pandas as pd
+        from benchmarks.generator import (
+            generate_bulk, generate_search_terms, write_bulk_workbook, CAMPAIGN_SHEET, SEARCH_TERM_SHEET
+        )
+    except ImportError as e:
+        print("! Skipping bulk generator test:", e)
+        return True
+
+    print("Testing bulk generator...")
+    bulk = generate_bulk(5000, seed=1)
+    assert len(bulk) == 5000, "generated {0} rows".format(len(bulk))
+    pd.testing.assert_frame_equal(bulk, generate_bulk(5000, seed=1))
+    other = generate_bulk(5000, seed=2)
+    assert not bulk["花费"].equals(other["花费"]), "seed did not change the metrics"
+    assert other["广告活动名称"].iloc[0] == bulk["广告活动名称"].iloc[0] == "SP-000000", "campaign names depend on the seed"
+    print("✓ Row count and seeds are reproducible")
+
+    # Bulk-file order: campaign row, bid adjustments, then ad groups with their ads and targets
+    rank = {"广告活动": 0, "竞价调整": 1, "广告组": 2}
+    for name, rows in bulk.groupby("广告活动名称", sort=False):
+        levels = rows["实体层级"].tolist()
+        assert levels[0] == "广告活动" and levels.count("广告活动") == 1, "{0} does not start with its campaign".format(name)
+        heads = [rank.get(level, 3) for level in levels]
+        first_group = heads.index(2) if 2 in heads else len(heads)  # The last campaign may be cut short
+        assert 2 not in heads[:first_group] and 1 not in heads[first_group:], "bid adjustments after ad groups"
+        for _, group in rows[rows["广告组编号"].notna()].groupby("广告组编号", sort=False):
+            assert group["实体层级"].iloc[0] == "广告组", "ad group rows before the ad group"
+            targets = set(group["实体层级"].iloc[1:]) - {"商品广告"}
+            assert len(targets) <= 1, "{0} mixes keywords and product targets".format(name)
+    names = bulk["广告活动名称"].to_numpy()
+    assert (names[1:] >= names[:-1]).all(), "campaign rows are not contiguous"
+    is_target = bulk["实体层级"].isin(["关键词", "商品定向"])
+    assert bulk["竞价"].notna().equals(is_target), "bids outside keywords and targets"
+    assert bulk["每日预算"].notna().equals(bulk["实体层级"] == "广告活动"), "budget outside campaign rows"
+    assert bulk["关键词文本"].notna().equals(bulk["实体层级"] == "关键词"), "keyword text outside keywords"
+    print("✓ Rows follow bulk-file order with level-specific columns")
+
+    for frame in (bulk, generate_search_terms(2000, 150, seed=1)):
+        assert (frame["点击量"] <= frame["展示量"]).all() and (frame["订单数量"] <= frame["点击量"]).all()
+        sold = frame["销量"] > 0
+        assert np.allclose(frame.loc[sold, "ACOS"], (frame["花费"] / frame["销量"])[sold], atol=1e-4), "ACOS differs"
+        assert (frame.loc[~sold, "ACOS"] == 0).all(), "ACOS without sales"
+    terms = generate_search_terms(2000, 150, seed=1)
+    assert terms["广告活动名称"].between("SP-000000", "SP-000149").all(), "search terms of unknown campaigns"
+    print("✓ Metrics are consistent and search terms belong to the generated campaigns")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = write_bulk_workbook(os.path.join(folder, "bulk.xlsx"), 600, seed=1, search_term_rows=250)
+        sheets = pd.read_excel(path, sheet_name=None)
+        assert list(sheets) == [CAMPAIGN_SHEET, SEARCH_TERM_SHEET], list(sheets)
+        rows = [len(frame) for frame in sheets.values()]
+        assert rows == [600, 250], "workbook rows {0}".format(rows)
+        assert list(sheets[CAMPAIGN_SHEET].columns) == list(bulk.columns), "bulk columns not written"
+    print("✓ Workbooks hold both SP sheets with the requested rows")
+    return True
+
 def main():
     """Run all tests"""
     print("="*50)
@@ -183,7 +1654,35 @@ def main():
         ("Auto Adjust Module", test_auto_adjust_module),
         ("Data Analysis Module", test_data_analysis_module),
         ("Function Mapping", test_function_mapping),
-        ("Directory Structure", test_directory_structure)
+        ("Directory Structure", test_directory_structure),
+        ("Vectorized Bid Adjustment", test_vectorized_bid_adjustment),
+        ("Rule Compiler Cache", test_rule_compiler_cache),
+        ("Schema Downcast", test_schema_downcast),
+        ("Result Writers", test_result_writers),
+        ("Upload Namespaces", test_upload_namespaces),
+        ("Upload Dedup", test_upload_dedup),
+        ("Storage Index", test_storage_index),
+        ("Snapshot Store", test_snapshot_store),
+        ("Shared Memory Executor", test_shared_memory_executor),
+        ("SD Screens", test_sd_screens),
+        ("SB Screens", test_sb_screens),
+        ("Keyword Harvest", test_keyword_harvest),
+        ("ASIN Targets", test_asin_targets),
+        ("Bid Model", test_bid_model),
+        ("Portfolio Index", test_portfolio_index),
+        ("Entity Partitions", test_entity_partitions),
+        ("Job Queue", test_job_queue),
+        ("Sheet Cache", test_sheet_cache),
+        ("Repeatable Screens", test_screens_repeatable),
+        ("SP Invalid", test_sp_invalid),
+        ("SP All Screen", test_sp_all_screen),
+        ("Reader Equivalence", test_reader_equivalence),
+        ("Save Failure", test_save_failure),
+        ("Metrics Endpoint", test_metrics_endpoint),
+        ("Profile Route", test_profile_route),
+        ("Batch Runner", test_batch_runner),
+        ("Dask Engine", test_dask_engine),
+        ("Bulk Generator", test_bulk_generator)
     ]
     
     passed = 0
@@ -194,7 +1693,13 @@ def main():
         print("Running test: {}".format(test_name))
         print("-"*30)
         
-        if test_func():
+        try:
+            passed_test = test_func()
+        except AssertionError as e:
+            print("✗ Assertion failed:", e)
+            passed_test = False
+
+        if passed_test:
             print("✓ Test '{}' PASSED".format(test_name))
             passed += 1
         else:
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from werkzeug.utils import secure_filename
+from auto_adjust.sheet_cache import record_content_hash
+from storage import remove_path
+
+BLOB_DIR = '.blobs'  # Content-addressed copies of uploads inside the upload folder
+PARTIAL_DIR = 'partial'  # Unfinished chunked uploads, inside BLOB_DIR
+UPLOAD_BLOCK_SIZE = 1024 * 1024  # Bytes streamed to disk at once
+DIGEST_PATTERN = re.compile(r'[0-9a-f]{64}')  # Lower-case hex SHA-256, the only accepted blob name
+
+class UploadError(Exception):
+    """Raised when an upload request cannot be applied"""
+
+def check_digest(digest):
+    """Raise UploadError unless digest is a lower-case hex SHA-256
+
+    Digests name files in the blob store, so anything else could point
+    outside of it.
+    """
+    if not isinstance(digest, str) or not DIGEST_PATTERN.fullmatch(digest):
+        raise UploadError("Invalid SHA-256 digest")
+
+class UploadSession:
+    """State of one chunked upload
+
+    The digest is updated block by block as data is appended, so the
+    content hash is known as soon as the last byte arrives.
+    """
+
+    def __init__(self, filename, size, partial_path, expected_digest=None):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.size = size
+        self.partial_path = partial_path
+        self.expected_digest = expected_digest
+        self.offset = 0
+        self.digest = hashlib.sha256()
+        self.path = None
+        self.updated_at = time.time()
+        self.lock = threading.Lock()
+
+    def to_dict(self):
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': self.offset,
+            'complete': self.path is not None,
+        }
+
+class UploadStore:
+    """Deduplicating store for uploaded bulk files
+
+    Every upload is kept once under BLOB_DIR, named by its SHA-256. The
+    file the optimization reads is a hardlink to that blob, so uploading
+    the same content again costs no extra disk space and no copy. A blob
+    whose links were all removed by the file cleanup is deleted by
+    remove_expired.
+
+    Links are named <namespace>_<file name>, with a namespace of their own
+    for every upload and every job, so uploads and jobs using the same
+    file name never replace each other's files.
+    """
+
+    def __init__(self, upload_folder):
+        """Initialize store
+
+        Args:
+            upload_folder (str): Directory holding uploads and results
+        """
+        self.upload_folder = upload_folder
+        self.blob_dir = os.path.join(upload_folder, BLOB_DIR)
+        self.partial_dir = os.path.join(self.blob_dir, PARTIAL_DIR)
+        os.makedirs(self.partial_dir, exist_ok=True)
+        self._sessions = {}
+        self._links = {}  # Upload path -> digest of the blob it links to
+        self._lock = threading.Lock()
+        # Held while blobs are published, linked or released, so a blob found
+        # by _publish cannot lose its last link before link() adds one
+        self._blob_lock = threading.RLock()
+
+    def blob_path(self, digest):
+        check_digest(digest)
+        return os.path.join(self.blob_dir, digest)
+
+    def has_blob(self, digest):
+        return os.path.isfile(self.blob_path(digest))
+
+    def link(self, digest, filename, namespace):
+        """Expose a stored blob under an upload file name
+
+        Args:
+            digest (str): SHA-256 of the content
+            filename (str): Name of the uploaded file
+            namespace (str): Upload or job id the link belongs to
+
+        Returns:
+            str: Path of the linked upload inside the upload folder
+        """
+        path = os.path.join(self.upload_folder, "{0}_{1}".format(namespace, secure_filename(filename)))
+        blob = self.blob_path(digest)
+        with self._blob_lock:
+            if not (os.path.exists(path) and os.path.samefile(path, blob)):
+                # rename() between two links of one file is a no-op that would leave tmp_path behind
+                tmp_path = "{0}.link{1}".format(path, threading.get_ident())
+                try:
+                    os.link(blob, tmp_path)
+                except OSError:
+                    shutil.copyfile(blob, tmp_path)  # File system without hardlinks
+                os.replace(tmp_path, path)
+            os.utime(path)  # Restart the retention period of a re-uploaded file
+            record_content_hash(path, digest)
+            with self._lock:
+                replaced = self._links.get(path)
+                self._links[path] = digest
+            if replaced is not None and replaced != digest:
+                self._release(replaced)
+        return path
+
+    def stage(self, path, namespace):
+        """Link an upload once more under the namespace of a job
+
+        The job reads its input and writes its results under its own
+        namespace; remove the staged link when the job is done.
+
+        Args:
+            path (str): Path returned by save, start or append
+            namespace (str): Id of the job
+
+        Returns:
+            str: Path of the staged input
+        """
+        with self._lock:
+            digest = self._links.get(path)
+        if digest is None:
+            raise UploadError("Unknown upload: {0}".format(os.path.basename(path)))
+        # Upload links are named <id>_<file name> and ids contain no underscore
+        filename = os.path.basename(path).split('_', 1)[1]
+        return self.link(digest, filename, namespace)
+
+    def remove(self, path):
+        """Delete an upload and its blob once no other upload links to it
+
+        Args:
+            path (str): Path returned by save, start or append
+        """
+        if os.path.exists(path):
+            os.remove(path)
+        with self._lock:
+            digest = self._links.pop(path, None)
+        if digest is not None:
+            self._release(digest)
+
+    def _release(self, digest):
+        """Delete a blob that has no remaining upload links"""
+        blob = self.blob_path(digest)
+        with self._blob_lock:
+            try:
+                if os.stat(blob).st_nlink <= 1:
+                    os.remove(blob)
+                    print("Deleted unreferenced upload: {0}".format(blob))
+            except OSError:
+                pass
+
+    def _publish(self, tmp_path, digest, filename, namespace):
+        """Move a fully written temporary file into the blob store and link it
+
+        Returns:
+            str: Path of the linked upload, as returned by link
+        """
+        with self._blob_lock:
+            if self.has_blob(digest):
+                os.remove(tmp_path)
+                print("Upload already stored: {0}".format(digest))
+            else:
+                os.replace(tmp_path, self.blob_path(digest))
+            return self.link(digest, filename, namespace)
+
+    def save(self, file_storage):
+        """Save a file posted with a regular form, deduplicated by content
+
+        The stream is hashed while it is written, so the file is read once.
+
+        Args:
+            file_storage (FileStorage): Uploaded file from request.files
+
+        Returns:
+            str: Path of the saved upload
+        """
+        upload_id = uuid.uuid4().hex
+        tmp_path = os.path.join(self.partial_dir, upload_id)
+        digest = hashlib.sha256()
+        try:
+            with open(tmp_path, 'wb') as f:
+                for block in iter(lambda: file_storage.stream.read(UPLOAD_BLOCK_SIZE), b''):
+                    digest.update(block)
+                    f.write(block)
+            return self._publish(tmp_path, digest.hexdigest(), file_storage.filename, upload_id)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def start(self, filename, size, sha256=None):
+        """Start a chunked upload
+
+        The data is always transferred: a hash claimed by the client does
+        not prove it holds the content, so it only serves to verify the
+        upload once complete. Content that is already stored is still kept
+        once, as the finished upload is linked to the existing blob.
+
+        Args:
+            filename (str): Name of the file being uploaded
+            size (int): Total size in bytes
+            sha256 (str, optional): Hex SHA-256 computed by the client
+
+        Returns:
+            UploadSession: The new session
+        """
+        if not secure_filename(filename or ''):
+            raise UploadError("Invalid file name")
+        if size <= 0:
+            raise UploadError("Invalid file size")
+        expected_digest = sha256.strip().lower() if sha256 else None
+        if expected_digest is not None:
+            check_digest(expected_digest)
+        session = UploadSession(filename, size, None, expected_digest)
+        session.partial_path = os.path.join(self.partial_dir, session.id)
+        open(session.partial_path, 'wb').close()
+        with self._lock:
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, upload_id):
+        """Return the upload session with the given id, or None if unknown"""
+        with self._lock:
+            return self._sessions.get(upload_id)
+
+    def append(self, session, offset, stream):
+        """Append a chunk read from a stream at the given offset
+
+        The chunk is streamed to disk block by block; if the connection
+        drops midway, the bytes received so far are kept and the client
+        resumes from the offset reported by the session.
+
+        Args:
+            session (UploadSession): Session to append to
+            offset (int): Position of the chunk in the file
+            stream: File-like object with the chunk data
+
+        Returns:
+            UploadSession: The session, complete once all bytes arrived
+        """
+        with session.lock:
+            if session.path is not None:
+                return session
+            if offset != session.offset:
+                raise UploadError("Expected offset {0}, got {1}".format(session.offset, offset))
+            try:
+                with open(session.partial_path, 'ab') as f:
+                    for block in iter(lambda: stream.read(UPLOAD_BLOCK_SIZE), b''):
+                        if session.offset + len(block) > session.size:
+                            raise UploadError("Upload exceeds declared size {0}".format(session.size))
+                        f.write(block)
+                        session.digest.update(block)
+                        session.offset += len(block)
+            finally:
+                session.updated_at = time.time()
+
+            if session.offset == session.size:
+                digest = session.digest.hexdigest()
+                if session.expected_digest is not None and digest != session.expected_digest:
+                    # Start over, so the client can resend the file
+                    open(session.partial_path, 'wb').close()
+                    session.offset = 0
+                    session.digest = hashlib.sha256()
+                    raise UploadError("Upload does not match SHA-256 {0}".format(session.expected_digest))
+                session.path = self._publish(session.partial_path, digest, session.filename, session.id)
+        return session
+
+    def remove_expired(self, max_age_seconds, now):
+        """Forget chunked uploads without activity within the retention period
+
+        Args:
+            max_age_seconds (float): Retention period in seconds
+            now (float): Current timestamp
+        """
+        with self._lock:
+            expired = [
+                session for session in self._sessions.values()
+                if now - session.updated_at > max_age_seconds
+            ]
+            for session in expired:
+                del self._sessions[session.id]
+
+        for session in expired:
+            with session.lock:
+                if session.path is None and os.path.exists(session.partial_path):
+                    os.remove(session.partial_path)
+                    print("Deleted abandoned upload: {0}".format(session.partial_path))
+
+    def restore_links(self):
+        """Register the upload links a previous run left in the upload folder
+
+        Links are matched to their blob by inode, so removing them later
+        releases the blob as for uploads of this run. Files that link to
+        no blob, like results, are not registered.
+
+        Returns:
+            list: Paths of the restored upload links
+        """
+        blobs = {}
+        for name in os.listdir(self.blob_dir):
+            blob = os.path.join(self.blob_dir, name)
+            if DIGEST_PATTERN.fullmatch(name) and os.path.isfile(blob):
+                stat = os.stat(blob)
+                blobs[(stat.st_dev, stat.st_ino)] = name
+        restored = []
+        for name in os.listdir(self.upload_folder):
+            path = os.path.join(self.upload_folder, name)
+            if not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            digest = blobs.get((stat.st_dev, stat.st_ino))
+            if digest is None:
+                continue
+            record_content_hash(path, digest)
+            with self._lock:
+                self._links[path] = digest
+            restored.append(path)
+        return restored
+
+    def remove_leftovers(self):
+        """Delete partial uploads and unlinked blobs left behind by a previous run
+
+        Called once at startup, before any upload is accepted.
+        """
+        for name in os.listdir(self.partial_dir):
+            remove_path(os.path.join(self.partial_dir, name))
+        for name in os.listdir(self.blob_dir):
+            blob = os.path.join(self.blob_dir, name)
+            if os.path.isfile(blob) and os.stat(blob).st_nlink <= 1:
+                os.remove(blob)
+                print("Deleted unreferenced upload: {0}".format(blob))